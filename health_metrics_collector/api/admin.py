@@ -1,3 +1,12 @@
 from django.contrib import admin
 
+from .models import CaregiverLink
+
 # Register your models here.
+
+
+@admin.register(CaregiverLink)
+class CaregiverLinkAdmin(admin.ModelAdmin):
+    list_display = ('caregiver', 'patient', 'created_at')
+    search_fields = ('caregiver__phone_number', 'patient__phone_number')
+    raw_id_fields = ('caregiver', 'patient')
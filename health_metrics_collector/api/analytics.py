@@ -0,0 +1,151 @@
+"""Vectorized summaries computed over the compact series from ``api.series``."""
+import numpy as np
+
+from .downsampling import downsample
+from .series import MEALS
+
+# Ngưỡng time-in-range theo đồng thuận quốc tế về CGM (mg/dL)
+GLUCOSE_RANGES = (
+    ('very_low', None, 54),
+    ('low', 54, 70),
+    ('in_range', 70, 181),
+    ('high', 181, 251),
+    ('very_high', 251, None),
+)
+
+# Phân loại huyết áp theo ACC/AHA 2017: (tên, systolic tối thiểu, diastolic tối thiểu)
+PRESSURE_STAGES = (
+    ('hypertensive_crisis', 181, 121),
+    ('stage_2', 140, 90),
+    ('stage_1', 130, 80),
+    ('elevated', 120, None),
+)
+
+
+def window(columns, start_ms=None, end_ms=None):
+    """Cắt các cột theo khoảng thời gian [start_ms, end_ms) bằng searchsorted, không copy dữ liệu."""
+    timestamps = columns['timestamps']
+    lo = 0 if start_ms is None else np.searchsorted(timestamps, start_ms, side='left')
+    hi = len(timestamps) if end_ms is None else np.searchsorted(timestamps, end_ms, side='left')
+    return {name: column[lo:hi] for name, column in columns.items()}
+
+
+def _stats(values):
+    return {
+        'mean': round(float(values.mean()), 1),
+        'min': round(float(values.min()), 1),
+        'max': round(float(values.max()), 1),
+    }
+
+
+def glucose_range_masks(values):
+    """Mask của từng khoảng trong GLUCOSE_RANGES (cận dưới tính vào khoảng, cận trên không)."""
+    masks = {}
+    for name, low, high in GLUCOSE_RANGES:
+        mask = np.ones(len(values), dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values < high
+        masks[name] = mask
+    return masks
+
+
+def glucose_summary(columns):
+    """
+    Summarize a glucose series window.
+
+    Returns:
+        dict: count, mean/min/max/std (mg/dL), coefficient of variation, GMI, the
+        percentage of readings in each range of GLUCOSE_RANGES, and the mean per meal.
+    """
+    values = columns['values']
+    count = len(values)
+    if not count:
+        return {'count': 0}
+
+    mean = float(values.mean())
+    std = float(values.std())
+    summary = {'count': count, 'unit': 'mg/dL', **_stats(values)}
+    summary['std'] = round(std, 1)
+    summary['cv'] = round(std / mean * 100, 1) if mean else None
+    summary['gmi'] = round(3.31 + 0.02392 * mean, 2)
+
+    summary['time_in_ranges'] = {
+        name: round(float(mask.mean()) * 100, 1) for name, mask in glucose_range_masks(values).items()
+    }
+
+    meals = columns['meals']
+    summary['by_meal'] = {}
+    for code, meal in enumerate(MEALS):
+        selected = values[meals == code]
+        if len(selected):
+            summary['by_meal'][meal] = {'count': len(selected), 'mean': round(float(selected.mean()), 1)}
+    return summary
+
+
+def pressure_stages(systolic, diastolic):
+    """Giai đoạn huyết áp cho từng bản ghi (mảng chuỗi), ưu tiên giai đoạn nặng nhất."""
+    stages = np.full(len(systolic), 'normal', dtype=object)
+    assigned = np.zeros(len(systolic), dtype=bool)
+    for name, systolic_min, diastolic_min in PRESSURE_STAGES:
+        mask = systolic >= systolic_min
+        if diastolic_min is not None:
+            mask |= diastolic >= diastolic_min
+        mask &= ~assigned
+        stages[mask] = name
+        assigned |= mask
+    return stages
+
+
+def pressure_summary(columns):
+    """
+    Summarize a blood pressure series window.
+
+    Returns:
+        dict: count, mean/min/max of systolic and diastolic, and the percentage of readings
+        in each ACC/AHA stage.
+    """
+    systolic = columns['systolic']
+    diastolic = columns['diastolic']
+    count = len(systolic)
+    if not count:
+        return {'count': 0}
+
+    stages = pressure_stages(systolic, diastolic)
+    names, counts = np.unique(stages, return_counts=True)
+    return {
+        'count': count,
+        'unit': 'mm Hg',
+        'systolic': _stats(systolic),
+        'diastolic': _stats(diastolic),
+        'stages': {name: round(float(c) / count * 100, 1) for name, c in zip(names, counts)},
+    }
+
+
+def chart_series(columns, value_columns, points, method='lttb'):
+    """
+    Downsample each value column of a series window for plotting.
+
+    Args:
+        columns (dict): Series window, see ``window``.
+        value_columns (dict): Output name to series column, e.g. ``{'blood_glucose': 'values'}``.
+        points (int): Maximum number of points per column.
+        method (str): 'lttb' or 'minmax'.
+
+    Every column is downsampled on its own, so e.g. systolic and diastolic each keep their
+    own peaks.
+
+    Returns:
+        dict: Output name to ``{'timestamps': [...ms], 'values': [...]}``.
+    """
+    timestamps = columns['timestamps']
+    series = {}
+    for name, column in value_columns.items():
+        values = columns[column]
+        selected = downsample(timestamps, values, points, method)
+        series[name] = {
+            'timestamps': timestamps[selected].tolist(),
+            'values': values[selected].tolist(),
+        }
+    return series
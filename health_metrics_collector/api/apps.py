@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from health_metrics_collector import mongo
+
+        from . import caching  # noqa: F401 (đăng ký system check của cache)
+
+        # Chỉ đăng ký cấu hình, chưa mở kết nối tới MongoDB
+        mongo.register()
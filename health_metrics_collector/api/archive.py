@@ -0,0 +1,216 @@
+"""
+Cold-tier archive for old readings.
+
+Readings older than ``READINGS_ARCHIVE_AFTER_DAYS`` are moved out of MongoDB into one
+zstd-compressed Parquet file per user and month::
+
+    <READINGS_ARCHIVE_ROOT>/<collection>/<user_id>/<YYYY-MM>.parquet
+
+The root can be a local disk or a mounted object-storage bucket. Files are opened with
+memory mapping, and list/export/analytics reads and sync snapshots merge them back in (see
+``api.readers`` and ``api.sync``).
+Archived readings are read-only: they can't be updated or deleted through the API.
+"""
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from .models import BloodGlucose, BloodPressure
+from .storage import storage_for
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow là tùy chọn, chỉ cần khi bật lưu trữ lạnh
+    pa = pc = pq = None
+
+
+def _schemas():
+    common = [
+        ('_id', pa.string()),
+        ('timestamp', pa.timestamp('ms')),
+        ('unit', pa.string()),
+        ('client_id', pa.string()),
+        ('updated_at', pa.timestamp('ms')),
+    ]
+    return {
+        BloodGlucose: pa.schema([*common, ('blood_glucose', pa.float64()), ('meal', pa.string())]),
+        BloodPressure: pa.schema([*common, ('systolic', pa.int32()), ('diastolic', pa.int32())]),
+    }
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImproperlyConfigured("The readings archive requires pyarrow (pip install pyarrow).")
+
+
+def _user_dir(document_cls, user_id):
+    return os.path.join(settings.READINGS_ARCHIVE_ROOT, document_cls._get_collection_name(), str(user_id))
+
+
+def _month_path(document_cls, user_id, month):
+    return os.path.join(_user_dir(document_cls, user_id), f"{month:%Y-%m}.parquet")
+
+
+def _month_range(month):
+    next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return month, next_month
+
+
+def archived_months(document_cls, user_id, start=None, end=None):
+    """Các tháng đã được lưu trữ của user, bỏ qua những tháng nằm ngoài khoảng [start, end)."""
+    try:
+        names = sorted(os.listdir(_user_dir(document_cls, user_id)))
+    except FileNotFoundError:
+        return []
+
+    months = []
+    for name in names:
+        if not name.endswith('.parquet'):
+            continue
+        month = datetime.strptime(name[:-len('.parquet')], '%Y-%m')
+        month_start, month_end = _month_range(month)
+        if (start is not None and month_end <= start) or (end is not None and month_start >= end):
+            continue
+        months.append(month)
+    return months
+
+
+def read_table(document_cls, user_id, start=None, end=None, columns=None):
+    """
+    Read a user's archived readings as one Arrow table sorted by timestamp.
+
+    Args:
+        document_cls (Document): BloodGlucose or BloodPressure.
+        user_id (int): Owner of the readings.
+        start, end (datetime, optional): Naive UTC bounds, ``start <= timestamp < end``.
+        columns (list, optional): Columns to read. All columns by default.
+
+    Returns:
+        pyarrow.Table or None: None when nothing is archived for the range.
+    """
+    months = archived_months(document_cls, user_id, start, end)
+    if not months:
+        return None
+    _require_pyarrow()
+
+    if columns is not None and 'timestamp' not in columns and (start is not None or end is not None):
+        columns = [*columns, 'timestamp']
+    tables = [
+        pq.read_table(_month_path(document_cls, user_id, month), columns=columns, memory_map=True)
+        for month in months
+    ]
+    table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+    if start is not None:
+        table = table.filter(pc.greater_equal(table['timestamp'], pa.scalar(start, pa.timestamp('ms'))))
+    if end is not None:
+        table = table.filter(pc.less(table['timestamp'], pa.scalar(end, pa.timestamp('ms'))))
+    return table
+
+
+def read_documents(document_cls, user_id, start=None, end=None, columns=None):
+    """Archived readings as raw dicts, shaped like the documents pymongo returns."""
+    table = read_table(document_cls, user_id, start, end, columns)
+    return table.to_pylist() if table is not None else []
+
+
+def iter_documents(document_cls, user_id, start=None, columns=None):
+    """Archived readings from ``start`` in timestamp order, reading one month file at a time."""
+    for month in archived_months(document_cls, user_id, start):
+        month_start, month_end = _month_range(month)
+        yield from read_documents(document_cls, user_id, max(month_start, start or month_start), month_end, columns)
+
+
+def _write_month(document_cls, user_id, month, docs):
+    """Ghi (gộp với file đã có) dữ liệu một tháng, ghi ra file tạm rồi os.replace để không hỏng file."""
+    schema = _schemas()[document_cls]
+    path = _month_path(document_cls, user_id, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    rows = {}
+    if os.path.exists(path):
+        for row in pq.read_table(path, memory_map=True).to_pylist():
+            rows[row['_id']] = row
+    for doc in docs:
+        rows[str(doc['_id'])] = {name: (str(doc['_id']) if name == '_id' else doc.get(name)) for name in schema.names}
+
+    table = pa.Table.from_pylist(sorted(rows.values(), key=lambda row: row['timestamp']), schema=schema)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression='zstd')
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def cold_cutoff(days=None, now=None):
+    """Đầu tháng chứa mốc (now - days): chỉ lưu trữ những tháng đã trọn vẹn."""
+    days = settings.READINGS_ARCHIVE_AFTER_DAYS if days is None else days
+    now = timezone.now() if now is None else now
+    cutoff = (now - timedelta(days=days)).replace(tzinfo=None)
+    return cutoff.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def archive_cold_readings(document_cls, cutoff=None, user_id=None):
+    """
+    Move every full month of readings older than ``cutoff`` from MongoDB into the archive.
+
+    Each (user, month) group is written to its Parquet file before its documents are
+    deleted. If the job dies in between, the next run rewrites the file (deduplicated by
+    ``_id``) and finishes the deletion.
+
+    Returns:
+        int: Number of readings moved.
+    """
+    _require_pyarrow()
+    cutoff = cold_cutoff() if cutoff is None else cutoff
+    storage = storage_for(document_cls)
+    moved = 0
+    # Với bố cục theo tháng chỉ những partition cũ hơn cutoff được đọc, và được xóa khi đã rỗng
+    for collection in storage.collections(end=cutoff):
+        moved += _archive_collection(document_cls, storage, collection, cutoff, user_id)
+        storage.discard_if_empty(collection)
+    return moved
+
+
+def _archive_collection(document_cls, storage, collection, cutoff, user_id=None):
+    match = {'timestamp': {'$lt': cutoff}}
+    if user_id is not None:
+        match['user_id'] = user_id
+    groups = collection.aggregate([
+        {'$match': storage.translate_filter(match)},
+        {'$group': {'_id': {
+            'user_id': f"${storage.field('user_id')}",
+            'year': {'$year': '$timestamp'},
+            'month': {'$month': '$timestamp'},
+        }}},
+    ], allowDiskUse=True)
+
+    moved = 0
+    for group in groups:
+        key = group['_id']
+        month_start, month_end = _month_range(datetime(key['year'], key['month'], 1))
+        docs = [storage.from_storage(doc) for doc in collection.find(storage.translate_filter({
+            'user_id': key['user_id'],
+            'timestamp': {'$gte': month_start, '$lt': month_end},
+        }))]
+        if not docs:
+            continue
+        _write_month(document_cls, key['user_id'], month_start, docs)
+        ids = [doc['_id'] for doc in docs]
+        collection.delete_many({'_id': {'$in': ids}})
+        storage.release_claims(ids=ids)
+        moved += len(docs)
+        logging.info(f"Archived {len(docs)} {document_cls.__name__} readings of user {key['user_id']} for {month_start:%Y-%m}")
+    return moved
+
+
+def delete_user_archive(user_id):
+    """Xóa toàn bộ dữ liệu lưu trữ của user (dùng khi xóa cứng user)."""
+    for document_cls in (BloodGlucose, BloodPressure):
+        shutil.rmtree(_user_dir(document_cls, user_id), ignore_errors=True)
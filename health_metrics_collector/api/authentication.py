@@ -0,0 +1,15 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .routing import pin_to_primary, recently_wrote
+
+
+class ReadRoutingJWTAuthentication(JWTAuthentication):
+    """JWT authentication that keeps a user's reads on the primary right after they wrote."""
+
+    def get_user(self, validated_token):
+        # Ghim trước khi đọc User: user vừa ghi (vd. vừa bị vô hiệu hóa) phải được đọc từ primary
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is not None and recently_wrote(user_id):
+            pin_to_primary()
+        return super().get_user(validated_token)
@@ -0,0 +1,70 @@
+import logging
+
+from django.utils import timezone
+
+from .storage import storage_for
+
+
+def to_mongo_document(document_cls, data):
+    """
+    Build the raw document to store for a reading, filling in field defaults.
+
+    Args:
+        document_cls (Document): BloodGlucose or BloodPressure.
+        data (dict): Validated field values, including ``user_id``.
+
+    Returns:
+        dict: A document ready to be written with pymongo.
+    """
+    doc = {}
+    for name, field in document_cls._fields.items():
+        if name == 'id':
+            continue
+        value = data.get(name)
+        if value is None and field.default is not None:
+            value = field.default() if callable(field.default) else field.default
+        if value is not None:
+            doc[field.db_field] = value
+    return doc
+
+
+def upsert_readings(document_cls, readings):
+    """
+    Write a batch of readings with a single unordered bulk write.
+
+    Readings carrying a ``client_id`` are upserted on the unique ``(user_id, client_id)``
+    index, so a client may resend a whole batch without creating duplicates. Readings
+    without one are plain inserts.
+
+    Readings without a ``timestamp`` are stamped in place with the time of the write, so
+    the caller can append them to the cached series (``api.series.append_readings``).
+
+    Args:
+        document_cls (Document): BloodGlucose or BloodPressure.
+        readings (list): Validated field values for each reading.
+
+    Returns:
+        dict: Number of ``inserted`` documents and of ``duplicates`` that already existed.
+    """
+    now = timezone.now()
+    for data in readings:
+        if data.get('timestamp') is None:
+            data['timestamp'] = now
+    docs = [to_mongo_document(document_cls, data) for data in readings]
+    if not docs:
+        return {'inserted': 0, 'duplicates': 0}
+
+    result = storage_for(document_cls).upsert_many(docs)
+    if result['duplicates']:
+        logging.info(f"Ignored {result['duplicates']} duplicate {document_cls.__name__} readings")
+    return result
+
+
+def upsert_reading(document_cls, data):
+    """
+    Upsert one reading that carries a ``client_id`` and return the stored Document.
+
+    A retried request gets back the document written by the first attempt.
+    """
+    raw = storage_for(document_cls).upsert_one(to_mongo_document(document_cls, data))
+    return document_cls._from_son(raw)
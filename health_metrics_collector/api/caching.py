@@ -0,0 +1,48 @@
+"""
+Checks on the cache backend.
+
+The web processes and the Celery workers share their state through the Django cache: list,
+series and dashboard entries filled by a worker (cache warming, analytics rebuilds, ingestion
+appends) are read by the web processes, and the throttle counters and warming metrics are
+updated by all of them. A process-local backend (LocMem, Dummy) silently breaks all of that,
+so the features that only make sense with a shared cache check ``cache_is_shared`` first.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Warning, register
+from django.utils.connection import ConnectionProxy
+
+# Backend chỉ sống trong một process: entry do worker ghi không tới được process web
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def cache_is_shared(backend=None):
+    """True nếu cache (mặc định: cache 'default') được dùng chung giữa các process, không phải LocMem/Dummy."""
+    if backend is None:
+        backend = caches['default']
+    elif isinstance(backend, ConnectionProxy):
+        # django.core.cache.cache (vd. cache của throttle DRF) là proxy tới backend thật
+        backend = backend._connections[backend._alias]
+    return not isinstance(backend, PROCESS_LOCAL_BACKENDS)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    errors = []
+    if settings.INGEST_THROTTLE_LOCAL_PRECHECK:
+        errors.append(Error(
+            "INGEST_THROTTLE_LOCAL_PRECHECK needs a cache shared between processes: with a "
+            "process-local cache each process counts its own quota.",
+            hint="Set CACHE_BACKEND=redis or CACHE_BACKEND=memcached, or disable the pre-check.",
+            id='api.E001',
+        ))
+    return errors + [Warning(
+        "The default cache is local to each process: cache warming is disabled and the Celery "
+        "workers can't update the series or the throttle counters seen by the web processes.",
+        hint="Set CACHE_BACKEND=redis or CACHE_BACKEND=memcached (and CACHE_LOCATION).",
+        id='api.W001',
+    )]
@@ -0,0 +1,221 @@
+"""
+Batch reads for caregivers and clinicians.
+
+``GET /api/caregiver/patients/`` returns the latest reading and a summary of the last
+``CAREGIVER_SUMMARY_DAYS`` days of each kind for many patients at once. Instead of one query
+per patient and kind, each collection of the layout runs a single aggregation::
+
+    $match  user_id $in [...], timestamp >= start
+    $group  by user_id: $top (latest document), count, sums, min/max, counts per range/stage
+
+The partial results of the collections (one per month with the monthly layout) are merged
+in Python. Every (kind, patient) entry is cached on its own: the entries are read with one
+``get_many``, only the missing patients are aggregated, and the results written back with
+one ``set_many``. The keys follow the version of the patient's list cache (see
+``api.readers.versioned_cache_key``), so a write through the API invalidates them.
+
+``$top`` requires MongoDB 5.2 or later. Readings already moved to the cold tier are older
+than the summary window and are not read.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .analytics import GLUCOSE_RANGES, PRESSURE_STAGES
+from .models import BloodGlucose, BloodPressure
+from .readers import GLUCOSE_FIELDS, LIST_CACHE_PREFIXES, PRESSURE_FIELDS, serialize_rows, versioned_cache_keys
+from .routing import analytics_read_preference
+from .series import MMOL_TO_MGDL
+from .storage import storage_for
+
+CACHE_VARIANT = 'caregiver'
+
+
+def _glucose_values(storage):
+    """Giá trị mg/dL của mỗi bản ghi (mmol/L được quy đổi trong MongoDB)."""
+    unit = f"${storage.field('unit')}"
+    return {'value': {'$cond': [
+        {'$eq': [unit, 'mmol/L']}, {'$multiply': ['$blood_glucose', MMOL_TO_MGDL]}, '$blood_glucose',
+    ]}}
+
+
+def _glucose_accumulators():
+    accumulators = {
+        'sum': {'$sum': '$value'},
+        'sum_squares': {'$sum': {'$multiply': ['$value', '$value']}},
+        'min': {'$min': '$value'},
+        'max': {'$max': '$value'},
+    }
+    for name, low, high in GLUCOSE_RANGES:
+        conditions = []
+        if low is not None:
+            conditions.append({'$gte': ['$value', low]})
+        if high is not None:
+            conditions.append({'$lt': ['$value', high]})
+        accumulators[f'range_{name}'] = {'$sum': {'$cond': [{'$and': conditions}, 1, 0]}}
+    return accumulators
+
+
+def _pressure_stage(storage):
+    """Giai đoạn huyết áp của mỗi bản ghi, cùng thứ tự ưu tiên với analytics.pressure_stages."""
+    branches = []
+    for name, systolic_min, diastolic_min in PRESSURE_STAGES:
+        case = {'$gte': ['$systolic', systolic_min]}
+        if diastolic_min is not None:
+            case = {'$or': [case, {'$gte': ['$diastolic', diastolic_min]}]}
+        branches.append({'case': case, 'then': name})
+    return {'stage': {'$switch': {'branches': branches, 'default': 'normal'}}}
+
+
+def _pressure_accumulators():
+    accumulators = {}
+    for column in ('systolic', 'diastolic'):
+        accumulators[f'{column}_sum'] = {'$sum': f'${column}'}
+        accumulators[f'{column}_min'] = {'$min': f'${column}'}
+        accumulators[f'{column}_max'] = {'$max': f'${column}'}
+    for name in [*(stage for stage, _, _ in PRESSURE_STAGES), 'normal']:
+        accumulators[f'stage_{name}'] = {'$sum': {'$cond': [{'$eq': ['$stage', name]}, 1, 0]}}
+    return accumulators
+
+
+def _round(value):
+    return round(float(value), 1)
+
+
+def _glucose_summary(group):
+    """Thống kê cùng dạng với analytics.glucose_summary (không có by_meal)."""
+    count = group['count']
+    mean = group['sum'] / count
+    std = math.sqrt(max(group['sum_squares'] / count - mean * mean, 0.0))
+    return {
+        'count': count,
+        'unit': 'mg/dL',
+        'mean': _round(mean),
+        'min': _round(group['min']),
+        'max': _round(group['max']),
+        'std': _round(std),
+        'cv': _round(std / mean * 100) if mean else None,
+        'gmi': round(3.31 + 0.02392 * mean, 2),
+        'time_in_ranges': {
+            name: _round(group[f'range_{name}'] / count * 100) for name, _, _ in GLUCOSE_RANGES
+        },
+    }
+
+
+def _pressure_summary(group):
+    """Thống kê cùng dạng với analytics.pressure_summary."""
+    count = group['count']
+    summary = {'count': count, 'unit': 'mm Hg'}
+    for column in ('systolic', 'diastolic'):
+        summary[column] = {
+            'mean': _round(group[f'{column}_sum'] / count),
+            'min': _round(group[f'{column}_min']),
+            'max': _round(group[f'{column}_max']),
+        }
+    # Như pressure_summary: chỉ các giai đoạn có bản ghi, theo thứ tự tên
+    stages = {
+        key[len('stage_'):]: value for key, value in group.items() if key.startswith('stage_') and value
+    }
+    summary['stages'] = {name: _round(stages[name] / count * 100) for name in sorted(stages)}
+    return summary
+
+
+# kind: (Document, field của bản ghi mới nhất, field tính thêm, accumulator, hàm thống kê)
+KINDS = {
+    'glucose': (BloodGlucose, GLUCOSE_FIELDS, _glucose_values, _glucose_accumulators, _glucose_summary),
+    'pressure': (BloodPressure, PRESSURE_FIELDS, _pressure_stage, _pressure_accumulators, _pressure_summary),
+}
+
+
+def _merge(merged, group):
+    """Gộp kết quả của cùng một user từ nhiều collection (layout monthly)."""
+    for key, value in group.items():
+        if key == 'latest':
+            if value['timestamp'] > merged['latest']['timestamp']:
+                merged['latest'] = value
+        elif key.endswith('min'):
+            merged[key] = min(merged[key], value)
+        elif key.endswith('max'):
+            merged[key] = max(merged[key], value)
+        else:
+            merged[key] += value
+
+
+def aggregate_patients(kind, user_ids, start):
+    """
+    Latest reading and summary of ``kind`` for each of ``user_ids``, one aggregation per collection.
+
+    Args:
+        kind (str): 'glucose' or 'pressure'.
+        user_ids (list): Patients to read.
+        start (datetime): Start of the summary window; the latest reading is also taken in it.
+
+    Returns:
+        dict: user_id to ``{'latest': row or None, 'summary': {...}}``, for every user id.
+    """
+    document_cls, fields, add_fields, accumulators, summarize = KINDS[kind]
+    storage = storage_for(document_cls)
+    pipeline = [
+        {'$match': storage.translate_filter({'user_id': {'$in': list(user_ids)}, 'timestamp': {'$gte': start}})},
+        {'$addFields': add_fields(storage)},
+        {'$group': {
+            '_id': f"${storage.field('user_id')}",
+            'latest': {'$top': {'sortBy': {'timestamp': -1}, 'output': '$$ROOT'}},
+            'count': {'$sum': 1},
+            **accumulators(),
+        }},
+    ]
+
+    groups = {}
+    for collection in storage.collections(start, None, analytics_read_preference()):
+        for group in collection.aggregate(pipeline):
+            user_id = group.pop('_id')
+            if user_id in groups:
+                _merge(groups[user_id], group)
+            else:
+                groups[user_id] = group
+
+    results = {}
+    for user_id in user_ids:
+        group = groups.get(user_id)
+        if group is None:
+            results[user_id] = {'latest': None, 'summary': {'count': 0}}
+            continue
+        latest = serialize_rows([storage.from_storage(group.pop('latest'))], fields)[0]
+        results[user_id] = {'latest': latest, 'summary': summarize(group)}
+    return results
+
+
+def patients_overview(user_ids):
+    """
+    Overview of each kind for many patients, through the per-patient cache entries.
+
+    Returns:
+        tuple: ``(patients, cache_stats)``. ``patients`` lists ``{'user_id', 'glucose',
+        'pressure'}`` in the order of ``user_ids``; ``cache_stats`` counts the entries read
+        from the cache and computed.
+    """
+    start = timezone.now() - timedelta(days=settings.CAREGIVER_SUMMARY_DAYS)
+    entries, stats = {}, {'hits': 0, 'misses': 0}
+    for kind in KINDS:
+        keys = versioned_cache_keys(LIST_CACHE_PREFIXES[kind], user_ids, CACHE_VARIANT)
+        cached = cache.get_many(list(keys.values()))
+        missing = [user_id for user_id in user_ids if keys[user_id] not in cached]
+        computed = aggregate_patients(kind, missing, start) if missing else {}
+        if computed:
+            cache.set_many(
+                {keys[user_id]: entry for user_id, entry in computed.items()},
+                timeout=settings.CAREGIVER_CACHE_SECONDS,
+            )
+        for user_id in user_ids:
+            entries[kind, user_id] = cached[keys[user_id]] if keys[user_id] in cached else computed[user_id]
+        stats['hits'] += len(user_ids) - len(missing)
+        stats['misses'] += len(missing)
+
+    patients = [
+        {'user_id': user_id, **{kind: entries[kind, user_id] for kind in KINDS}} for user_id in user_ids
+    ]
+    return patients, stats
@@ -0,0 +1,153 @@
+"""
+Compact binary encoding for broker messages.
+
+``BROKER_MESSAGE_FORMAT = 'msgpack'`` switches the raw RabbitMQ events and the Celery task
+payloads from JSON to msgpack. The codec is registered with kombu as the ``health-msgpack``
+serializer (content type ``application/x-health-msgpack``). Consumers pick the decoder from
+the ``content_type`` of each message, so JSON and msgpack messages can be mixed while
+producers and workers are rolled out.
+
+- A list of at least two dicts with the same keys (a batch of readings) is written column by
+  column, as msgpack extension type 1 holding ``[keys, column_1, column_2, ...]``: field names
+  are stored once per batch instead of once per reading.
+- datetimes are written as ISO 8601 strings, like kombu's JSON encoder does.
+- Payloads larger than ``BROKER_COMPRESSION_THRESHOLD`` bytes are compressed with
+  ``BROKER_COMPRESSION`` (zstd, or zlib when zstandard is not installed).
+
+Every payload starts with one byte telling how the rest is compressed (see ``FRAMES``).
+"""
+import json
+import zlib
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from kombu.serialization import register
+
+try:
+    import msgpack
+except ImportError:  # msgpack là tùy chọn, chỉ cần khi BROKER_MESSAGE_FORMAT = 'msgpack'
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # thiếu zstandard thì nén bằng zlib
+    zstandard = None
+
+SERIALIZER_NAME = 'health-msgpack'
+CONTENT_TYPE = 'application/x-health-msgpack'
+JSON_CONTENT_TYPE = 'application/json'
+COLUMNS_EXT = 1
+# Byte đầu của payload: cách nén phần còn lại
+FRAMES = {'none': b'\x00', 'zlib': b'\x01', 'zstd': b'\x02'}
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+
+def _require_msgpack():
+    if msgpack is None:
+        raise ImproperlyConfigured("BROKER_MESSAGE_FORMAT = 'msgpack' requires msgpack (pip install msgpack).")
+
+
+def _is_table(value):
+    if len(value) < 2 or not isinstance(value[0], dict):
+        return False
+    keys = value[0].keys()
+    return all(isinstance(row, dict) and row.keys() == keys for row in value)
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)) and _is_table(value):
+        keys = list(value[0])
+        columns = [[row[key] for row in value] for key in keys]
+        return msgpack.ExtType(COLUMNS_EXT, _packb([keys, *columns]))
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _packb(value):
+    # Duyệt trước để list các dict (batch) đi qua _default thay vì được ghi thành array thường
+    return msgpack.packb(_tables_to_ext(value), default=_default, use_bin_type=True)
+
+
+def _tables_to_ext(value):
+    if isinstance(value, (list, tuple)):
+        if _is_table(value):
+            return _default(value)
+        return [_tables_to_ext(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _tables_to_ext(item) for key, item in value.items()}
+    return value
+
+
+def _ext_hook(code, data):
+    if code == COLUMNS_EXT:
+        keys, *columns = msgpack.unpackb(data, ext_hook=_ext_hook, raw=False)
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+    return msgpack.ExtType(code, data)
+
+
+def _compression(compression):
+    compression = settings.BROKER_COMPRESSION if compression is None else compression
+    if compression == 'zstd' and zstandard is None:
+        return 'zlib'
+    return compression
+
+
+def dumps(value, compression=None, threshold=None):
+    """
+    Encode ``value`` with msgpack (batches column by column), compressed above ``threshold``.
+
+    ``compression`` ('zstd', 'zlib' or 'none') and ``threshold`` (bytes) default to
+    ``BROKER_COMPRESSION`` and ``BROKER_COMPRESSION_THRESHOLD``.
+    """
+    _require_msgpack()
+    packed = _packb(value)
+    compression = _compression(compression)
+    threshold = settings.BROKER_COMPRESSION_THRESHOLD if threshold is None else threshold
+    if compression == 'none' or len(packed) <= threshold:
+        return FRAMES['none'] + packed
+    if compression == 'zstd':
+        return FRAMES['zstd'] + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(packed)
+    return FRAMES['zlib'] + zlib.compress(packed, ZLIB_LEVEL)
+
+
+def loads(data):
+    _require_msgpack()
+    if isinstance(data, str):
+        data = data.encode('latin-1')
+    frame, payload = data[:1], memoryview(data)[1:]
+    if frame == FRAMES['zstd']:
+        if zstandard is None:
+            raise ImproperlyConfigured("Message is zstd-compressed: install zstandard to decode it.")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif frame == FRAMES['zlib']:
+        payload = zlib.decompress(payload)
+    elif frame != FRAMES['none']:
+        raise ValueError(f"Unknown message frame {frame!r}")
+    return msgpack.unpackb(payload, ext_hook=_ext_hook, raw=False)
+
+
+def encode_message(message):
+    """Mã hóa message cho pika theo BROKER_MESSAGE_FORMAT, trả về (body, content_type)."""
+    if settings.BROKER_MESSAGE_FORMAT == 'msgpack':
+        return dumps(message), CONTENT_TYPE
+    return json.dumps(message, default=_json_default), JSON_CONTENT_TYPE
+
+
+def decode_message(body, content_type=None):
+    """Giải mã message theo content_type của nó (không có content_type: JSON như trước đây)."""
+    if content_type == CONTENT_TYPE:
+        return loads(body)
+    return json.loads(body)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Đăng ký với kombu để Celery dùng được (CELERY_TASK_SERIALIZER = 'health-msgpack')
+register(SERIALIZER_NAME, dumps, loads, content_type=CONTENT_TYPE, content_encoding='binary')
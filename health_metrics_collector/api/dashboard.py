@@ -0,0 +1,166 @@
+"""
+Home screen data in one request.
+
+``GET /api/dashboard/`` replaces the sequential calls the app used to make (recent readings
+and summary of each kind). Each section is read on a shared thread pool, so the MongoDB and
+cache lookups run concurrently, and is cached on its own with its own TTL
+(``DASHBOARD_SECTION_TTLS``). The cache keys follow the version of the user's list cache, so
+a write through the API invalidates them like it does the lists.
+
+The request waits at most ``DASHBOARD_TIMEOUT_SECONDS``. A section that is not ready by then
+is reported as ``timeout`` with ``null`` data instead of holding up the others. If it is
+already running it finishes in the background and fills its cache entry for the next
+request; if it is still queued it is cancelled.
+
+At most ``DASHBOARD_MAX_QUEUED`` sections wait or run on the pool at once, so a slow MongoDB
+cannot pile up work behind it. When the pool is full a section is only read from its cache
+entry and reported as ``busy`` if there is none.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .analytics import glucose_summary, pressure_summary, window
+from .models import BloodGlucose, BloodPressure
+from .readers import GLUCOSE_FIELDS, PRESSURE_FIELDS, serialize_rows, versioned_cache_key
+from .series import load_series, to_epoch_ms
+from .storage import storage_for
+
+# kind: (Document, field của danh sách, tiền tố cache danh sách, hàm thống kê)
+KINDS = {
+    'glucose': (BloodGlucose, GLUCOSE_FIELDS, 'blood_glucose_list', glucose_summary),
+    'pressure': (BloodPressure, PRESSURE_FIELDS, 'blood_pressure_list', pressure_summary),
+}
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    """Thread pool dùng chung, chỉ tạo khi có request dashboard đầu tiên."""
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(settings.DASHBOARD_MAX_QUEUED)
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DASHBOARD_WORKERS, thread_name_prefix='dashboard',
+                )
+    return _executor
+
+
+def _submit(pool, name, user_id):
+    """Đưa section vào pool nếu còn chỗ (DASHBOARD_MAX_QUEUED), None nếu pool đã đầy."""
+    if not _slots.acquire(blocking=False):
+        return None
+    future = pool.submit(_timed, name, user_id)
+    # Gọi cả khi future bị hủy
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def recent_readings(kind, user_id):
+    """Các bản ghi mới nhất (DASHBOARD_RECENT_LIMIT), mới nhất trước."""
+    document_cls, fields, _, _ = KINDS[kind]
+    limit = settings.DASHBOARD_RECENT_LIMIT
+    docs = storage_for(document_cls).find(
+        {'user_id': user_id},
+        {name: 1 for name, _ in fields},
+        sort=[('timestamp', -1)],
+        batch_size=limit,
+    )
+    rows = serialize_rows(islice(docs, limit), fields)
+    return {'latest': rows[0] if rows else None, 'readings': rows}
+
+
+def recent_summary(kind, user_id):
+    """Thống kê trên series đã cache trong DASHBOARD_SUMMARY_DAYS ngày gần nhất."""
+    _, _, _, summarize = KINDS[kind]
+    start_ms = to_epoch_ms(timezone.now() - timedelta(days=settings.DASHBOARD_SUMMARY_DAYS))
+    return summarize(window(load_series(kind, user_id), start_ms=start_ms))
+
+
+# section: (kind, hàm đọc dữ liệu)
+SECTIONS = {
+    'glucose_recent': ('glucose', recent_readings),
+    'pressure_recent': ('pressure', recent_readings),
+    'glucose_summary': ('glucose', recent_summary),
+    'pressure_summary': ('pressure', recent_summary),
+}
+
+
+def section_cache_key(name, user_id):
+    kind, _ = SECTIONS[name]
+    return versioned_cache_key(KINDS[kind][2], user_id, f"dashboard_{name}")
+
+
+def load_section(name, user_id):
+    """
+    Return ``(data, cached)`` for one dashboard section, reading through its cache entry.
+
+    Runs on the dashboard pool, so it must only touch MongoDB and the cache.
+    """
+    kind, build = SECTIONS[name]
+    key = section_cache_key(name, user_id)
+    data = cache.get(key)
+    if data is not None:
+        return data, True
+    data = build(kind, user_id)
+    cache.set(key, data, timeout=settings.DASHBOARD_SECTION_TTLS[name])
+    return data, False
+
+
+def _timed(name, user_id):
+    started = time.perf_counter()
+    data, cached = load_section(name, user_id)
+    return data, cached, round((time.perf_counter() - started) * 1000, 2)
+
+
+def _cached_only(name, user_id):
+    """Section khi pool đã đầy: chỉ đọc cache, không truy vấn MongoDB."""
+    started = time.perf_counter()
+    data = cache.get(section_cache_key(name, user_id))
+    if data is None:
+        return None, {'status': 'busy'}
+    return data, {'status': 'ok', 'cached': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+
+def build_dashboard(user_id, timeout=None):
+    """
+    Load every section concurrently.
+
+    Returns:
+        tuple: ``(data, sections)``. ``data`` maps each section to its payload (``None`` if
+        it failed, timed out or the pool was full); ``sections`` maps it to its status ('ok',
+        'timeout', 'busy' or 'error'), whether it came from the cache and its latency.
+    """
+    timeout = settings.DASHBOARD_TIMEOUT_SECONDS if timeout is None else timeout
+    pool = _pool()
+    futures = {name: _submit(pool, name, user_id) for name in SECTIONS}
+    wait([future for future in futures.values() if future is not None], timeout=timeout)
+
+    data, sections = {}, {}
+    for name, future in futures.items():
+        data[name] = None
+        if future is None:
+            data[name], sections[name] = _cached_only(name, user_id)
+            continue
+        if not future.done():
+            # Section chưa bắt đầu thì bỏ khỏi hàng đợi; đang chạy thì chạy tiếp và ghi cache
+            future.cancel()
+            sections[name] = {'status': 'timeout'}
+            continue
+        try:
+            data[name], cached, latency_ms = future.result()
+        except Exception as e:
+            sections[name] = {'status': 'error', 'message': str(e)}
+            continue
+        sections[name] = {'status': 'ok', 'cached': cached, 'latency_ms': latency_ms}
+    return data, sections
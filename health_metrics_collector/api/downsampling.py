@@ -0,0 +1,95 @@
+"""
+Downsampling of time series for charts.
+
+Both methods return the *indices* of the points to keep, so several columns of a series
+can be sliced with the same selection. Work per call is O(n) numpy operations plus a
+Python loop over the output buckets, so cost and payload are bounded by the target point
+count rather than by the length of the requested range.
+"""
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+
+def lttb(x, y, points):
+    """
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013).
+
+    The first and last points are always kept. Interior points are split into
+    ``points - 2`` buckets; from each bucket the point forming the largest triangle with
+    the previously selected point and the average of the next bucket is kept.
+
+    Args:
+        x (ndarray): Increasing x values (e.g. timestamps in ms).
+        y (ndarray): Values, same length as ``x``.
+        points (int): Number of points to keep (>= 3).
+
+    Returns:
+        ndarray: Sorted indices of the selected points.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    # Trừ x[0] để giữ độ chính xác khi đổi epoch ms sang float
+    x = np.asarray(x, dtype=np.float64) - float(x[0])
+    y = np.asarray(y, dtype=np.float64)
+
+    buckets = points - 2
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.intp)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # Bucket cuối so với điểm cuối cùng
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(buckets):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        # Diện tích (nhân 2) tam giác: điểm đã chọn, điểm trong bucket, trung bình bucket kế tiếp
+        area = np.abs((ax - avg_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y[i] - ay))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(x, y, points):
+    """
+    Keep the minimum and maximum of each of ``points // 2`` equal-count buckets.
+
+    Fully vectorized: ``reduceat`` gives each bucket's min and max, and the first index
+    matching that value is taken per bucket. Spikes are never dropped, which suits
+    glucose lows.
+
+    Returns:
+        ndarray: Sorted, unique indices of the selected points.
+    """
+    n = len(x)
+    buckets = points // 2
+    if points >= n or buckets < 1:
+        return np.arange(n)
+
+    y = np.asarray(y)
+    edges = np.linspace(0, n, buckets + 1).astype(np.intp)
+    counts = np.diff(edges)
+    bucket_ids = np.repeat(np.arange(buckets), counts)
+    selected = []
+    for reduce in (np.minimum, np.maximum):
+        matches = np.flatnonzero(y == np.repeat(reduce.reduceat(y, edges[:-1]), counts))
+        # Giữ index đầu tiên khớp trong mỗi bucket
+        _, first = np.unique(bucket_ids[matches], return_index=True)
+        selected.append(matches[first])
+    return np.unique(np.concatenate(selected))
+
+
+def downsample(x, y, points, method='lttb'):
+    """Indices chọn theo ``method`` ('lttb' hoặc 'minmax')."""
+    if method == 'lttb':
+        return lttb(x, y, points)
+    if method == 'minmax':
+        return minmax(x, y, points)
+    raise ValueError(f"Unknown downsampling method: {method!r}")
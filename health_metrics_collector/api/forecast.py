@@ -0,0 +1,183 @@
+"""
+Short-term glucose forecasting with Holt's linear (double exponential) smoothing.
+
+Each user has one small ``GlucoseForecast`` document: the smoothed level (mg/dL), the smoothed
+trend (mg/dL per minute) and the time of the latest reading. ``update_forecasts`` folds new
+readings into it in O(1) per reading; the forecast endpoint only reads that document.
+
+Readings are not evenly spaced, so the smoothing factors are scaled by the time elapsed since
+the previous reading: ``FORECAST_ALPHA``/``FORECAST_BETA`` are the weights of a new reading
+taken ``FORECAST_STEP_MINUTES`` after the previous one (one CGM interval).
+
+- A reading older than the state is skipped: it can't change the current trend.
+- After a gap of more than ``FORECAST_RESET_MINUTES`` the state restarts from the new reading.
+- Edited or deleted readings are not taken back out of the state; the smoothing forgets them
+  within a few readings.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from pymongo.errors import DuplicateKeyError
+
+from .models import BloodGlucose, GlucoseForecast
+from .series import MMOL_TO_MGDL, to_epoch_ms
+from .storage import storage_for
+
+# Khoảng giá trị máy CGM báo được; dự báo nằm ngoài khoảng này không có ý nghĩa
+MIN_MGDL = 40.0
+MAX_MGDL = 400.0
+# (ngưỡng mg/dL mỗi phút, hướng) theo cách hiển thị mũi tên xu hướng của CGM
+TREND_DIRECTIONS = (
+    (3.0, 'rising_quickly'),
+    (2.0, 'rising'),
+    (1.0, 'rising_slowly'),
+    (-1.0, 'stable'),
+    (-2.0, 'falling_slowly'),
+    (-3.0, 'falling'),
+)
+_UPDATE_ATTEMPTS = 5
+# Số bản ghi gần nhất dùng để dựng lại trạng thái (một ngày CGM): làm mượt đã quên các bản ghi cũ hơn
+REBUILD_READINGS = 288
+
+
+class HoltState:
+    """Holt level/trend of one user; ``timestamp_ms`` is the time of the latest reading."""
+    __slots__ = ('level', 'trend', 'timestamp_ms', 'count')
+
+    def __init__(self, level=0.0, trend=0.0, timestamp_ms=None, count=0):
+        self.level = level
+        self.trend = trend
+        self.timestamp_ms = timestamp_ms
+        self.count = count
+
+    def update(self, timestamp_ms, value):
+        """Gộp một bản ghi (mg/dL) vào trạng thái; trả về False nếu bản ghi cũ hơn trạng thái."""
+        if self.count and timestamp_ms < self.timestamp_ms:
+            return False
+        elapsed = (timestamp_ms - self.timestamp_ms) / 60000 if self.count else None
+        if elapsed is None or elapsed > settings.FORECAST_RESET_MINUTES:
+            self.level, self.trend = value, 0.0
+        elif elapsed == 0:
+            # Cùng thời điểm (vd. một batch bulk): chỉ làm mượt level
+            self.level += settings.FORECAST_ALPHA * (value - self.level)
+        else:
+            steps = elapsed / settings.FORECAST_STEP_MINUTES
+            alpha = 1 - (1 - settings.FORECAST_ALPHA) ** steps
+            beta = 1 - (1 - settings.FORECAST_BETA) ** steps
+            predicted = self.level + self.trend * elapsed
+            level = alpha * value + (1 - alpha) * predicted
+            self.trend = beta * (level - self.level) / elapsed + (1 - beta) * self.trend
+            self.level = level
+        self.timestamp_ms = timestamp_ms
+        self.count += 1
+        return True
+
+    def predict(self, minutes_after_last):
+        value = self.level + self.trend * minutes_after_last
+        return min(max(value, MIN_MGDL), MAX_MGDL)
+
+    @classmethod
+    def from_document(cls, doc):
+        if doc is None:
+            return cls()
+        return cls(doc['level'], doc.get('trend', 0.0), to_epoch_ms(doc['timestamp']), doc.get('count', 0))
+
+    def to_document(self, user_id):
+        return {
+            'user_id': user_id,
+            'level': self.level,
+            'trend': self.trend,
+            'timestamp': datetime(1970, 1, 1) + timedelta(milliseconds=self.timestamp_ms),
+            'count': self.count,
+            'updated_at': datetime.now(dt_timezone.utc).replace(tzinfo=None),
+        }
+
+
+def _mgdl(reading):
+    value = float(reading['blood_glucose'])
+    return value * MMOL_TO_MGDL if reading.get('unit') == 'mmol/L' else value
+
+
+def _update_user(collection, user_id, points):
+    """Gộp ``points`` (timestamp ms, mg/dL) vào trạng thái của user, optimistic locking theo count."""
+    for _ in range(_UPDATE_ATTEMPTS):
+        doc = collection.find_one({'user_id': user_id})
+        state = HoltState.from_document(doc)
+        if not sum(state.update(timestamp_ms, value) for timestamp_ms, value in points):
+            return
+        try:
+            if doc is None:
+                collection.insert_one(state.to_document(user_id))
+                return
+            if collection.replace_one({'_id': doc['_id'], 'count': doc.get('count', 0)}, state.to_document(user_id)).matched_count:
+                return
+        except DuplicateKeyError:
+            pass  # process khác vừa tạo trạng thái: đọc lại rồi gộp lại
+    logging.warning(f"Glucose forecast of user {user_id} not updated: too many concurrent updates")
+
+
+def update_forecasts(readings):
+    """Cập nhật trạng thái dự báo với các bản ghi đường huyết vừa được lưu (dict có user_id, timestamp, blood_glucose, unit)."""
+    by_user = {}
+    for reading in readings:
+        by_user.setdefault(int(reading['user_id']), []).append((to_epoch_ms(reading['timestamp']), _mgdl(reading)))
+    collection = GlucoseForecast._get_collection()
+    for user_id, points in by_user.items():
+        points.sort()
+        try:
+            _update_user(collection, user_id, points)
+        except Exception as e:
+            # Dự báo chỉ là dữ liệu phụ: lỗi ở đây không được làm hỏng việc ghi bản ghi
+            logging.error(f"Error updating glucose forecast of user {user_id}: {e}")
+
+
+def rebuild_forecast(user_id):
+    """Dựng lại trạng thái dự báo từ các bản ghi gần nhất, vd. sau khi import dữ liệu lịch sử."""
+    docs = storage_for(BloodGlucose).find(
+        {'user_id': user_id},
+        {'blood_glucose': 1, 'unit': 1, 'timestamp': 1},
+        sort=[('timestamp', -1)],
+        batch_size=REBUILD_READINGS,
+    )
+    readings = [dict(doc, user_id=user_id) for doc in islice(docs, REBUILD_READINGS)]
+    GlucoseForecast._get_collection().delete_one({'user_id': user_id})
+    update_forecasts(readings)
+    return len(readings)
+
+
+def trend_direction(trend):
+    for threshold, direction in TREND_DIRECTIONS:
+        if trend >= threshold:
+            return direction
+    return 'falling_quickly'
+
+
+def glucose_forecast(user_id, horizons, now=None):
+    """
+    Forecast of a user's glucose ``horizons`` minutes from ``now``, from the stored Holt state.
+
+    Returns:
+        dict or None: ``None`` if the user has no reading yet. ``forecasts`` is ``None`` when
+        the latest reading is older than ``FORECAST_MAX_AGE_MINUTES`` (``stale``).
+    """
+    doc = GlucoseForecast._get_collection().find_one({'user_id': user_id})
+    if doc is None:
+        return None
+    state = HoltState.from_document(doc)
+    now_ms = to_epoch_ms(now or datetime.now(dt_timezone.utc))
+    age = max((now_ms - state.timestamp_ms) / 60000, 0)
+    stale = age > settings.FORECAST_MAX_AGE_MINUTES
+    return {
+        'unit': 'mg/dL',
+        'last_reading_at': doc['timestamp'].replace(tzinfo=dt_timezone.utc),
+        'level': round(state.level, 1),
+        'trend_per_minute': round(state.trend, 2),
+        'direction': trend_direction(state.trend),
+        'readings': state.count,
+        'stale': stale,
+        'forecasts': None if stale else [
+            {'minutes': minutes, 'blood_glucose': round(state.predict(age + minutes), 1)} for minutes in horizons
+        ],
+    }
@@ -0,0 +1,255 @@
+"""
+Bulk import of historical readings exported by other systems.
+
+Files are CSV (with a header row), JSON Lines or a JSON array of objects (``.json``, read
+into memory at once: prefer JSON Lines for large files). Each row carries the owner's
+``phone_number``, the reading ``timestamp`` and the reading fields:
+
+- glucose: ``blood_glucose``, ``unit``, ``meal``
+- pressure: ``systolic``, ``diastolic`` and optionally ``unit``
+
+Rows are validated with the rules of the API serializers and written with unordered ``insert_many``.
+A row without a ``client_id`` gets ``import:<file name>:<row number>``, so importing the
+same file again (or resuming after a crash) skips rows already stored instead of
+duplicating them. A long file name is shortened with a hash of it to keep the ``client_id``
+within its 64 characters. A JSON line that cannot be parsed is an invalid row, like a row
+that fails validation.
+"""
+import csv
+import hashlib
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from .bulk import to_mongo_document
+from .models import BloodGlucose, BloodPressure
+from .serializers import BloodGlucoseSerializer, BloodPressureSerializer
+from .storage import storage_for
+from .validation import validate_batch, validate_timestamps
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, thiếu thì dùng json của thư viện chuẩn
+    orjson = None
+
+IMPORT_KINDS = {
+    'glucose': (BloodGlucose, BloodGlucoseSerializer),
+    'pressure': (BloodPressure, BloodPressureSerializer),
+}
+FORMATS = ('csv', 'jsonl', 'json')
+PHONE_LOOKUP_BATCH = 5000
+# Số lỗi tối đa trả về cho mỗi chunk, tránh gửi cả triệu thông báo lỗi giữa các process
+MAX_ERRORS_PER_CHUNK = 100
+# Độ dài tối đa của tên file trong client_id: "import:" + tên + ":" + số dòng (16 chữ số) <= 64
+MAX_SOURCE_LENGTH = 40
+
+# Map phone_number -> user id, được gán trong từng process worker (xem init_worker)
+_user_ids = {}
+
+
+class ImportFormatError(ValueError):
+    """The file cannot be read in the requested format."""
+
+
+class MalformedRow:
+    """Dòng không đọc được, được tính là không hợp lệ thay vì dừng cả lần import."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        return 'json'
+    return 'jsonl' if extension in ('.jsonl', '.ndjson') else 'csv'
+
+
+def _parse_object(loads, text):
+    try:
+        row = loads(text)
+    except ValueError as e:  # JSONDecodeError, orjson.JSONDecodeError, UnicodeDecodeError
+        return MalformedRow(f"Invalid JSON: {e}")
+    return _as_row(row)
+
+
+def _as_row(row):
+    return row if isinstance(row, dict) else MalformedRow(f"Expected a JSON object, got {type(row).__name__}")
+
+
+def iter_rows(path, file_format):
+    """Đọc lần lượt từng dòng của file (CSV/JSON Lines không nạp cả file vào bộ nhớ)."""
+    if file_format == 'csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+        return
+
+    loads = orjson.loads if orjson is not None else json.loads
+    if file_format == 'json':
+        with open(path, 'rb') as f:
+            try:
+                rows = loads(f.read())
+            except ValueError as e:
+                raise ImportFormatError(f"{path} is not valid JSON: {e}") from e
+        if not isinstance(rows, list):
+            raise ImportFormatError(f"{path} must contain a JSON array of objects (use .jsonl for JSON Lines)")
+        for row in rows:
+            yield _as_row(row)
+        return
+
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield _parse_object(loads, line)
+
+
+def iter_chunks(rows, size, skip=0):
+    """
+    Group rows into chunks of ``size``.
+
+    Yields:
+        tuple: ``(first_row_number, rows)``, row numbers starting at 1. Rows numbered
+        ``skip`` or lower are dropped without being yielded.
+    """
+    chunk, first = [], None
+    for number, row in enumerate(rows, start=1):
+        if number <= skip:
+            continue
+        if first is None:
+            first = number
+        chunk.append(row)
+        if len(chunk) == size:
+            yield first, chunk
+            chunk, first = [], None
+    if chunk:
+        yield first, chunk
+
+
+def collect_phone_numbers(path, file_format):
+    return {
+        str(row.get('phone_number') or '').strip()
+        for row in iter_rows(path, file_format) if not isinstance(row, MalformedRow)
+    } - {''}
+
+
+def client_id_prefix(source):
+    """Tiền tố client_id của các dòng trong file ``source``; tên dài được rút gọn kèm hash để không vượt 64 ký tự."""
+    if len(source) > MAX_SOURCE_LENGTH:
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+        source = f"{source[:MAX_SOURCE_LENGTH - len(digest) - 1]}~{digest}"
+    return f"import:{source}:"
+
+
+def lookup_user_ids(phone_numbers):
+    """Map số điện thoại -> user id, truy vấn MySQL theo lô thay vì từng dòng."""
+    phone_numbers = sorted(phone_numbers)
+    User = get_user_model()
+    user_ids = {}
+    for i in range(0, len(phone_numbers), PHONE_LOOKUP_BATCH):
+        batch = phone_numbers[i:i + PHONE_LOOKUP_BATCH]
+        user_ids.update(User.all_objects.filter(phone_number__in=batch).values_list('phone_number', 'id'))
+    return user_ids
+
+
+def init_worker(user_ids):
+    import django
+    django.setup()
+    _user_ids.clear()
+    _user_ids.update(user_ids)
+
+
+def validate_rows(kind, rows):
+    """
+    Validate a chunk of rows with the rules of the API serializer, column by column
+    (see ``api.validation``).
+
+    ``timestamp`` is read-only in the serializers, so it is parsed and checked separately
+    with the serializer's own ``validate_timestamp``.
+
+    Returns:
+        list: one ``(validated_data, None)`` or ``(None, errors)`` per row.
+    """
+    _, serializer_cls = IMPORT_KINDS[kind]
+    user_ids = [
+        None if isinstance(row, MalformedRow) else _user_ids.get(str(row.get('phone_number') or '').strip())
+        for row in rows
+    ]
+    known = [row for row, user_id in zip(rows, user_ids) if user_id is not None]
+
+    data = [{name: value for name, value in row.items() if value not in (None, '')} for row in known]
+    validated, errors = validate_batch(serializer_cls, data)
+    timestamps, timestamp_errors = validate_timestamps(serializer_cls, [row.get('timestamp') for row in known])
+
+    results, position = [], 0
+    for row, user_id in zip(rows, user_ids):
+        if isinstance(row, MalformedRow):
+            results.append((None, {'non_field_errors': [row.error]}))
+            continue
+        if user_id is None:
+            phone_number = str(row.get('phone_number') or '').strip()
+            results.append((None, {'phone_number': [f"No user with phone number {phone_number!r}"]}))
+            continue
+        row_errors = dict(errors.get(position, {}))
+        if timestamp_errors[position]:
+            row_errors['timestamp'] = timestamp_errors[position]
+        if row_errors:
+            results.append((None, row_errors))
+        else:
+            results.append((dict(validated[position], user_id=user_id, timestamp=timestamps[position]), None))
+        position += 1
+    return results
+
+
+def import_chunk(kind, source, first_row, rows):
+    """
+    Validate and insert one chunk of rows. Runs in a worker process.
+
+    Returns:
+        dict: ``first_row``, ``rows``, ``inserted``, ``duplicates``, ``invalid`` and up to
+        MAX_ERRORS_PER_CHUNK ``errors`` as ``(row_number, errors)``.
+    """
+    document_cls, _ = IMPORT_KINDS[kind]
+    docs, errors, invalid = [], [], 0
+    prefix = client_id_prefix(source)
+    for number, (data, row_errors) in enumerate(validate_rows(kind, rows), start=first_row):
+        if row_errors:
+            invalid += 1
+            if len(errors) < MAX_ERRORS_PER_CHUNK:
+                errors.append((number, row_errors))
+            continue
+        data.setdefault('client_id', f"{prefix}{number}")
+        docs.append(to_mongo_document(document_cls, data))
+
+    # Dòng đã được import ở lần chạy trước (trùng client_id) được bỏ qua
+    inserted, duplicates = storage_for(document_cls).insert_many(docs) if docs else (0, 0)
+
+    return {
+        'first_row': first_row,
+        'rows': len(rows),
+        'inserted': inserted,
+        'duplicates': duplicates,
+        'invalid': invalid,
+        'errors': errors,
+        'user_ids': sorted({doc['user_id'] for doc in docs}),
+    }
+
+
+def load_checkpoint(path, source_path):
+    """Checkpoint của lần import trước, None nếu chưa có hoặc thuộc về file khác."""
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    stat = os.stat(source_path)
+    if checkpoint.get('source') != os.path.abspath(source_path) or checkpoint.get('size') != stat.st_size:
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    """Ghi file tạm rồi os.replace để checkpoint không bao giờ bị ghi dở."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.archive import archive_cold_readings, cold_cutoff
+from api.models import BloodGlucose, BloodPressure
+
+
+class Command(BaseCommand):
+    help = "Move full months of readings older than the cutoff from MongoDB into the Parquet cold tier."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.READINGS_ARCHIVE_AFTER_DAYS,
+            help="Archive months that ended more than this many days ago (default: READINGS_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument("--user", type=int, help="Only archive the readings of this user id.")
+
+    def handle(self, *args, **options):
+        cutoff = cold_cutoff(options["days"])
+        self.stdout.write(f"Archiving readings before {cutoff:%Y-%m-%d} into {settings.READINGS_ARCHIVE_ROOT}")
+
+        for document_cls in (BloodGlucose, BloodPressure):
+            moved = archive_cold_readings(document_cls, cutoff=cutoff, user_id=options["user"])
+            self.stdout.write(self.style.SUCCESS(f"{document_cls.__name__}: archived {moved} readings"))
@@ -0,0 +1,82 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.bench_json import best_per_call
+from api.management.commands.bench_read_path import make_glucose_docs, make_pressure_docs
+from api.serializers import BloodGlucoseSerializer, BloodPressureSerializer
+from api.validation import list_errors, validate_batch
+
+# Các lỗi chèn vào payload: (field, giá trị sai)
+GLUCOSE_FAULTS = [("blood_glucose", -5), ("blood_glucose", "abc"), ("unit", "mg"), ("meal", None), ("client_id", "x" * 80)]
+PRESSURE_FAULTS = [("systolic", 0), ("diastolic", "12.5"), ("unit", "kPa"), ("systolic", None)]
+
+
+def glucose_payload(count, rng):
+    """Payload của POST /api/glucose/bulk/."""
+    return [{
+        "blood_glucose": doc["blood_glucose"],
+        "unit": doc["unit"],
+        "meal": doc["meal"],
+        "client_id": doc["client_id"],
+    } for doc in make_glucose_docs(count, rng)]
+
+
+def pressure_payload(count, rng):
+    return [{
+        "systolic": doc["systolic"],
+        "diastolic": doc["diastolic"],
+        "client_id": f"device-{i}",
+    } for i, doc in enumerate(make_pressure_docs(count, rng))]
+
+
+def inject_faults(rows, faults, ratio, rng):
+    for i in rng.sample(range(len(rows)), int(len(rows) * ratio)):
+        name, value = rng.choice(faults)
+        rows[i][name] = value
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark column-wise batch validation (api.validation) against per-item serializer "
+        "validation (Serializer(many=True)) on bulk payloads, and check both give the same "
+        "validated data and errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--invalid-ratio", type=float, default=0.01, help="Share of rows with one invalid field.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        rows, repeat = options["rows"], options["repeat"]
+        cases = [
+            ("glucose", BloodGlucoseSerializer, glucose_payload, GLUCOSE_FAULTS),
+            ("pressure", BloodPressureSerializer, pressure_payload, PRESSURE_FAULTS),
+        ]
+        for kind, serializer_cls, build, faults in cases:
+            payload = build(rows, rng)
+            inject_faults(payload, faults, options["invalid_ratio"], rng)
+
+            validated, errors = validate_batch(serializer_cls, payload)
+            serializer = serializer_cls(data=payload, many=True)
+            same_errors = serializer.errors == list_errors(errors, rows) if not serializer.is_valid() else not errors
+            # Serializer không trả validated_data khi có lỗi: so sánh trên các dòng hợp lệ
+            valid = serializer_cls(data=[row for i, row in enumerate(payload) if i not in errors], many=True)
+            valid.is_valid()
+            same_data = [dict(item) for item in valid.validated_data] == [item for item in validated if item is not None]
+            if not (same_errors and same_data):
+                raise CommandError(f"{kind}: batch validation does not match the serializer")
+
+            number = max(1, 20000 // rows)
+            serializer_time = best_per_call(
+                repeat, number, lambda: serializer_cls(data=payload, many=True).is_valid(),
+            )
+            batch_time = best_per_call(repeat, number, lambda: validate_batch(serializer_cls, payload))
+            self.stdout.write(
+                f"{kind:<9} {rows:>6} rows  invalid={len(errors):>5}  "
+                f"serializer={serializer_time * 1e3:9.2f} ms  batch={batch_time * 1e3:9.2f} ms  "
+                f"speedup={serializer_time / batch_time:5.1f}x"
+            )
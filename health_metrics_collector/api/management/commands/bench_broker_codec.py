@@ -0,0 +1,86 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import codec
+from api.management.commands.bench_json import best_per_call
+from api.management.commands.bench_read_path import make_glucose_docs, make_pressure_docs
+
+# (tên, compression) của các cách mã hóa msgpack; threshold=0 để luôn nén khi có compression
+VARIANTS = [
+    ("msgpack", "none"),
+    ("msgpack+zlib", "zlib"),
+    ("msgpack+zstd", "zstd"),
+]
+
+
+def glucose_batch(count, rng):
+    """Batch đường huyết giống message của bulk upload."""
+    return [{
+        "user_id": doc["user_id"],
+        "blood_glucose": doc["blood_glucose"],
+        "unit": doc["unit"],
+        "meal": doc["meal"],
+        "client_id": doc["client_id"],
+        "timestamp": doc["timestamp"].isoformat(),
+    } for doc in make_glucose_docs(count, rng)]
+
+
+def pressure_batch(count, rng):
+    return [{
+        "user_id": doc["user_id"],
+        "systolic": doc["systolic"],
+        "diastolic": doc["diastolic"],
+        "client_id": f"device-{i}",
+    } for i, doc in enumerate(make_pressure_docs(count, rng))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark broker message encodings (BROKER_MESSAGE_FORMAT/BROKER_COMPRESSION): size, "
+        "encode and decode time of JSON against msgpack, with and without compression, on "
+        "Celery task bodies carrying batches of readings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="5,100,1000,10000", help="Comma-separated batch sizes.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if codec.msgpack is None:
+            raise CommandError("msgpack is not installed (pip install msgpack)")
+        if codec.zstandard is None:
+            self.stdout.write(self.style.WARNING("zstandard is not installed: msgpack+zstd falls back to zlib."))
+        sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+
+        rng = random.Random(options["seed"])
+        repeat = options["repeat"]
+        for kind, build in (("glucose", glucose_batch), ("pressure", pressure_batch)):
+            self.stdout.write(kind)
+            for size in sizes:
+                # Body của task Celery (protocol 2): (args, kwargs, embed)
+                body = ([build(size, rng)], {}, {"callbacks": None, "errbacks": None, "chain": None, "chord": None})
+                number = max(1, 20000 // size)
+
+                encoded = json.dumps(body).encode()
+                encode_time = best_per_call(repeat, number, lambda: json.dumps(body))
+                decode_time = best_per_call(repeat, number, lambda: json.loads(encoded))
+                self.stdout.write(
+                    f"  {size:>6} rows  {'json':<13} {len(encoded):>10,} B  "
+                    f"encode={encode_time * 1e6:10.1f} us  decode={decode_time * 1e6:10.1f} us"
+                )
+                json_size = len(encoded)
+
+                for name, compression in VARIANTS:
+                    encoded = codec.dumps(body, compression=compression, threshold=0)
+                    encode_time = best_per_call(
+                        repeat, number, lambda: codec.dumps(body, compression=compression, threshold=0),
+                    )
+                    decode_time = best_per_call(repeat, number, lambda: codec.loads(encoded))
+                    self.stdout.write(
+                        f"  {size:>6} rows  {name:<13} {len(encoded):>10,} B  "
+                        f"encode={encode_time * 1e6:10.1f} us  decode={decode_time * 1e6:10.1f} us  "
+                        f"size={len(encoded) / json_size:6.1%} of json"
+                    )
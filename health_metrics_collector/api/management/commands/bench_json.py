@@ -0,0 +1,74 @@
+import io
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.management.commands.bench_read_path import make_glucose_docs, make_pressure_docs
+from api.parsers import FastJSONParser, orjson
+from api.readers import GLUCOSE_FIELDS, PRESSURE_FIELDS, serialize_rows
+from api.renderers import FastJSONRenderer
+
+
+def best_per_call(repeat, number, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = "Benchmark DRF's JSONRenderer/JSONParser against the orjson-backed FastJSONRenderer/FastJSONParser."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed: the fast classes fall back to DRF's."))
+
+        rng = random.Random(options["seed"])
+        glucose = serialize_rows(make_glucose_docs(10000, rng), GLUCOSE_FIELDS)
+        pressure = serialize_rows(make_pressure_docs(10000, rng), PRESSURE_FIELDS)
+
+        def page(rows, size):
+            # Giống response của PageNumberPagination
+            return {"count": len(rows), "next": "http://testserver/api/glucose/?page=2", "previous": None,
+                    "results": rows[:size]}
+
+        cases = [
+            ("glucose page (10)", page(glucose, 10), 2000),
+            ("glucose page (500)", page(glucose, 500), 50),
+            ("glucose export (10k)", glucose, 5),
+            ("pressure page (10)", page(pressure, 10), 2000),
+            ("pressure export (10k)", pressure, 5),
+        ]
+        repeat = options["repeat"]
+        standard, fast = JSONRenderer(), FastJSONRenderer()
+
+        self.stdout.write("Rendering")
+        for name, data, number in cases:
+            std_time = best_per_call(repeat, number, lambda: standard.render(data, "application/json"))
+            fast_time = best_per_call(repeat, number, lambda: fast.render(data, "application/json"))
+            self.stdout.write(
+                f"  {name:<22} json={std_time * 1e6:10.1f} us  fast={fast_time * 1e6:10.1f} us  "
+                f"speedup={std_time / fast_time:5.1f}x"
+            )
+
+        self.stdout.write("Parsing (bulk upload payloads)")
+        for size, number in ((10, 2000), (1000, 50)):
+            body = standard.render([
+                {k: row[k] for k in ("blood_glucose", "unit", "meal", "client_id")} for row in glucose[:size]
+            ])
+            std_time = best_per_call(repeat, number, lambda: JSONParser().parse(io.BytesIO(body)))
+            fast_time = best_per_call(repeat, number, lambda: FastJSONParser().parse(io.BytesIO(body)))
+            self.stdout.write(
+                f"  {f'glucose bulk ({size})':<22} json={std_time * 1e6:10.1f} us  fast={fast_time * 1e6:10.1f} us  "
+                f"speedup={std_time / fast_time:5.1f}x"
+            )
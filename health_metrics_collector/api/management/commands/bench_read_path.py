@@ -0,0 +1,78 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+
+from api.models import BloodGlucose, BloodPressure
+from api.readers import GLUCOSE_FIELDS, PRESSURE_FIELDS, serialize_rows
+from api.serializers import BloodGlucoseSerializer, BloodPressureSerializer
+
+
+def make_glucose_docs(count, rng):
+    start = datetime(2024, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "user_id": 1,
+        "blood_glucose": round(rng.uniform(60, 250), 1),
+        "unit": "mg/dL",
+        "timestamp": start + timedelta(minutes=5 * i),
+        "meal": rng.choice(["pre-meal", "post-meal", "fasting", "before bed"]),
+        "client_id": f"device-{i}",
+        "updated_at": start + timedelta(minutes=5 * i, seconds=3),
+    } for i in range(count)]
+
+
+def make_pressure_docs(count, rng):
+    start = datetime(2024, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "user_id": 1,
+        "systolic": rng.randint(95, 170),
+        "diastolic": rng.randint(55, 105),
+        "timestamp": start + timedelta(hours=12 * i),
+        "unit": "mm Hg",
+        "updated_at": start + timedelta(hours=12 * i),
+    } for i in range(count)]
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: Document hydration + DRF serializer vs. the lean raw-dict read path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        rows, repeat = options["rows"], options["repeat"]
+        cases = [
+            ("glucose", BloodGlucose, BloodGlucoseSerializer, GLUCOSE_FIELDS, make_glucose_docs(rows, rng)),
+            ("pressure", BloodPressure, BloodPressureSerializer, PRESSURE_FIELDS, make_pressure_docs(rows, rng)),
+        ]
+
+        # Dữ liệu nằm sẵn trong bộ nhớ để chỉ đo chi phí CPU, không tính thời gian truy vấn MongoDB
+        for name, document_cls, serializer_cls, fields, docs in cases:
+            current, expected = best_of(repeat, lambda: serializer_cls(
+                [document_cls._from_son(doc) for doc in docs], many=True
+            ).data)
+            lean, actual = best_of(repeat, lambda: serialize_rows(docs, fields))
+
+            if [dict(row) for row in expected] != actual:
+                self.stderr.write(self.style.ERROR(f"{name}: lean output differs from the serializer output"))
+
+            self.stdout.write(
+                f"{name:<9} rows={rows:<7} document+serializer={current * 1000:8.1f} ms  "
+                f"lean={lean * 1000:8.1f} ms  speedup={current / lean:5.1f}x"
+            )
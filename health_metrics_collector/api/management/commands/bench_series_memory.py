@@ -0,0 +1,62 @@
+import pickle
+import random
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api.management.commands.bench_read_path import make_glucose_docs, make_pressure_docs
+from api.models import BloodGlucose, BloodPressure
+from api.readers import GLUCOSE_FIELDS, PRESSURE_FIELDS, serialize_rows
+from api.series import GlucoseSeries, PressureSeries
+
+
+def traced_size(build):
+    """Số byte Python cấp phát (còn giữ lại) khi dựng đối tượng."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return after - before, result
+
+
+def build_series(series_cls, docs):
+    series = series_cls()
+    for doc in docs:
+        series.add_reading(doc)
+    return series
+
+
+class Command(BaseCommand):
+    help = "Memory benchmark: cached list of Documents vs. lean rows vs. the compact array-backed series."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        rows = options["rows"]
+        cases = [
+            ("glucose", BloodGlucose, GlucoseSeries, GLUCOSE_FIELDS, make_glucose_docs(rows, rng)),
+            ("pressure", BloodPressure, PressureSeries, PRESSURE_FIELDS, make_pressure_docs(rows, rng)),
+        ]
+
+        for name, document_cls, series_cls, fields, docs in cases:
+            representations = [
+                ("documents", lambda: [document_cls._from_son(doc) for doc in docs], pickle.dumps),
+                ("lean rows", lambda: serialize_rows(docs, fields), pickle.dumps),
+                ("series", lambda: build_series(series_cls, docs), lambda series: series.to_bytes()),
+            ]
+            baseline = None
+            for label, build, dump in representations:
+                heap, value = traced_size(build)
+                # Kích thước entry trong cache (Django cache pickle giá trị, series lưu thẳng bytes)
+                cached = len(pickle.dumps(dump(value), pickle.HIGHEST_PROTOCOL))
+                baseline = baseline or cached
+                self.stdout.write(
+                    f"{name:<9} {label:<10} rows={rows:<7} heap={heap / 1024:9.1f} KiB  "
+                    f"cache entry={cached / 1024:9.1f} KiB  ({baseline / cached:5.1f}x smaller)"
+                )
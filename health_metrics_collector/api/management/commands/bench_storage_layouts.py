@@ -0,0 +1,110 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import OperationFailure
+
+from api.models import BloodGlucose, BloodPressure
+from api.readers import GLUCOSE_FIELDS, PRESSURE_FIELDS
+from api.storage import STORAGE_MODES
+from api.workload import glucose_documents, pressure_documents, workload_start
+
+KINDS = {
+    "glucose": (BloodGlucose, GLUCOSE_FIELDS),
+    "pressure": (BloodPressure, PRESSURE_FIELDS),
+}
+
+
+def storage_size(storage):
+    """(dung lượng dữ liệu, dung lượng index) theo collStats, cộng trên mọi collection của layout."""
+    data = indexes = 0
+    for collection in storage.collections():
+        try:
+            stats = collection.database.command({"collStats": collection.name})
+        except OperationFailure:
+            return None, None
+        data += stats.get("storageSize", 0)
+        indexes += stats.get("totalIndexSize", 0)
+    return data, indexes
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the reading storage layouts (READINGS_STORAGE_MODE) on scratch collections: "
+        "storage size, insert throughput and latency of per-user time range queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=sorted(KINDS), default="glucose")
+        parser.add_argument("--modes", default=",".join(STORAGE_MODES), help="Comma-separated layouts (default: all).")
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--days", type=int, default=90)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--queries", type=int, default=200, help="Range queries per layout (default: 200).")
+        parser.add_argument("--window-days", type=int, default=7, help="Length of each range query (default: 7).")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--keep", action="store_true", help="Keep the bench_* collections afterwards.")
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options["modes"].split(",") if mode.strip()]
+        unknown = set(modes) - set(STORAGE_MODES)
+        if unknown:
+            raise CommandError(f"Unknown layouts: {', '.join(sorted(unknown))}")
+
+        document_cls, fields = KINDS[options["kind"]]
+        days = options["days"]
+        start = workload_start(days)
+        user_ids = list(range(1, options["users"] + 1))
+        build = glucose_documents if options["kind"] == "glucose" else pressure_documents
+        docs = [doc for index, user_id in enumerate(user_ids) for doc in build(options["seed"], index, user_id, start, days)]
+        self.stdout.write(f"{len(docs)} {document_cls.__name__} readings of {len(user_ids)} users over {days} days")
+
+        # Cùng một chuỗi truy vấn cho mọi layout
+        rng = random.Random(options["seed"])
+        window = timedelta(days=options["window_days"])
+        queries = []
+        for _ in range(options["queries"]):
+            query_start = start + timedelta(seconds=rng.uniform(0, max((timedelta(days=days) - window).total_seconds(), 0)))
+            queries.append((rng.choice(user_ids), query_start, query_start + window))
+        projection = {name: 1 for name, _ in fields}
+
+        for mode in modes:
+            base_name = f"bench_{document_cls._get_collection_name()}"
+            # Xóa dữ liệu của lần chạy trước, rồi tạo storage mới để collection/index được tạo lại
+            for collection in STORAGE_MODES[mode](document_cls, base_name=base_name).collections():
+                collection.drop()
+            storage = STORAGE_MODES[mode](document_cls, base_name=base_name)
+
+            batch_size = options["batch_size"]
+            started = time.perf_counter()
+            for i in range(0, len(docs), batch_size):
+                # Bản sao: insert_many gán _id vào document
+                storage.insert_many([dict(doc) for doc in docs[i:i + batch_size]])
+            insert_seconds = time.perf_counter() - started
+
+            latencies, rows = [], 0
+            for user_id, query_start, query_end in queries:
+                started = time.perf_counter()
+                rows += sum(1 for _ in storage.find(
+                    {"user_id": user_id}, projection, sort=[("timestamp", 1)], start=query_start, end=query_end,
+                ))
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            data, indexes = storage_size(storage)
+            size = "n/a" if data is None else f"data={data / 2**20:8.1f} MiB  indexes={indexes / 2**20:7.1f} MiB"
+            self.stdout.write(
+                f"{mode:<11} {size}  insert={len(docs) / insert_seconds:10,.0f} docs/s  "
+                f"range p50={statistics.median(latencies) if latencies else 0:6.2f} ms  "
+                f"p95={percentile(latencies, 95) if latencies else 0:6.2f} ms  rows/query={rows / max(len(queries), 1):.0f}"
+            )
+
+            if not options["keep"]:
+                for collection in storage.collections():
+                    collection.drop()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.caching import cache_is_shared
+from api.warming import COUNTERS, warm_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the cache warming counters (jobs scheduled after login/token refresh, deduplicated "
+        "requests, entries filled) and the warm-hit ratio of the reads that followed."
+    )
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            raise CommandError(
+                "The cache backend is local to each process: the counters of the web processes and "
+                "workers can't be read from here. Set CACHE_BACKEND=redis or memcached."
+            )
+        stats = warm_stats()
+        for name in COUNTERS:
+            self.stdout.write(f"{name:<15} {stats[name]}")
+        ratio = "n/a" if stats["hit_ratio"] is None else f"{stats['hit_ratio']:.1%}"
+        self.stdout.write(f"{'hit_ratio':<15} {ratio}")
@@ -0,0 +1,155 @@
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.workload import (
+    insert_user_readings,
+    load_rate_profile,
+    login,
+    phone_number,
+    replay,
+    workload_start,
+)
+
+USER_BATCH_SIZE = 1000
+
+
+def _init_worker():
+    django.setup()
+
+
+def _insert_partition(args):
+    return insert_user_readings(*args)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create synthetic users with deterministic CGM glucose and twice-daily blood pressure series, "
+        "or replay a recorded ingestion rate against the API (--replay)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Number of users (default: 1000).")
+        parser.add_argument("--first-user", type=int, default=0, help="Index of the first user (phone 08xxxxxxxx).")
+        parser.add_argument("--days", type=int, default=90, help="Days of history per user (default: 90).")
+        parser.add_argument("--interval", type=int, default=5, help="Minutes between glucose readings (default: 5).")
+        parser.add_argument("--kinds", default="glucose,pressure", help="Comma separated: glucose, pressure.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--password", default="workload-password", help="Password of every generated user.")
+        parser.add_argument("--processes", type=int, default=os.cpu_count())
+        parser.add_argument("--partition-size", type=int, default=50, help="Users per unit of work.")
+        parser.add_argument("--batch-size", type=int, default=20000, help="Documents per insert_many.")
+
+        parser.add_argument("--replay", metavar="RATE_FILE", help="CSV of offset_seconds,requests_per_second to replay.")
+        parser.add_argument("--api-url", default="http://localhost:8000/api")
+        parser.add_argument("--replay-users", type=int, default=50, help="Generated users to log in as during replay.")
+        parser.add_argument("--speedup", type=float, default=1.0, help="Play the rate profile this many times faster.")
+        parser.add_argument("--threads", type=int, default=32)
+        parser.add_argument("--pressure-share", type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        if options["replay"]:
+            return self.replay(options)
+
+        kinds = [kind.strip() for kind in options["kinds"].split(",") if kind.strip()]
+        if not kinds or set(kinds) - {"glucose", "pressure"}:
+            raise CommandError("--kinds must list glucose and/or pressure")
+        if options["users"] < 1 or options["days"] < 1:
+            raise CommandError("--users and --days must be at least 1")
+
+        per_day = 0
+        if "glucose" in kinds:
+            per_day += 24 * 60 // options["interval"]
+        if "pressure" in kinds:
+            per_day += 2
+        per_user = per_day * options["days"]
+        self.stdout.write(f"Generating ~{per_user * options['users']:,} readings for {options['users']:,} users")
+
+        started = time.perf_counter()
+        users = self.create_users(options)
+        self.stdout.write(f"Users ready in {time.perf_counter() - started:.1f}s")
+
+        start = workload_start(options["days"])
+        size = options["partition_size"]
+        partitions = [
+            (users[i:i + size], options["seed"], start, options["days"], options["interval"], kinds, options["batch_size"])
+            for i in range(0, len(users), size)
+        ]
+
+        totals = dict.fromkeys(kinds, 0)
+        processes = max(1, min(options["processes"], len(partitions)))
+
+        def record(result):
+            for kind, count in result.items():
+                totals[kind] += count
+            elapsed = time.perf_counter() - started
+            inserted = sum(totals.values())
+            self.stdout.write(f"inserted {inserted:,} readings  {inserted / elapsed:,.0f} readings/s")
+
+        if processes == 1:
+            for partition in partitions:
+                record(insert_user_readings(*partition))
+        else:
+            # Không để process con dùng chung socket MySQL của process cha
+            connections.close_all()
+            with Pool(processes, initializer=_init_worker) as pool:
+                for result in pool.imap_unordered(_insert_partition, partitions):
+                    record(result)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.1f}s: " + ", ".join(f"{count:,} {kind}" for kind, count in totals.items())
+        ))
+
+    def create_users(self, options):
+        """Tạo user theo lô (bỏ qua số điện thoại đã tồn tại), trả về [(user_index, user_id)]."""
+        User = get_user_model()
+        # Hash mật khẩu một lần cho tất cả user: hash từng user sẽ mất hàng giờ
+        password = make_password(options["password"])
+        first = options["first_user"]
+        users = []
+        for offset in range(0, options["users"], USER_BATCH_SIZE):
+            indexes = range(first + offset, first + min(offset + USER_BATCH_SIZE, options["users"]))
+            phones = {phone_number(index): index for index in indexes}
+            User.objects.bulk_create(
+                [User(phone_number=phone, password=password) for phone in phones],
+                batch_size=USER_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            ids = User.all_objects.using("default").filter(phone_number__in=list(phones)).values_list("phone_number", "id")
+            users.extend(sorted((phones[phone], user_id) for phone, user_id in ids))
+        return users
+
+    def replay(self, options):
+        try:
+            profile = load_rate_profile(options["replay"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        base_url = options["api_url"].rstrip("/")
+        first = options["first_user"]
+        tokens = [
+            login(base_url, phone_number(index), options["password"])
+            for index in range(first, first + options["replay_users"])
+        ]
+        duration = (profile[-1][0] - profile[0][0]) / options["speedup"]
+        self.stdout.write(f"Replaying {options['replay']} ({duration:.0f}s) as {len(tokens)} users against {base_url}")
+
+        summary = replay(
+            base_url,
+            tokens,
+            profile,
+            speedup=options["speedup"],
+            threads=options["threads"],
+            pressure_share=options["pressure_share"],
+            seed=options["seed"],
+            on_progress=lambda offset, rate, sent: self.stdout.write(f"t={offset:>7.0f}s  rate={rate:>7.1f}/s  sent={sent}"),
+        )
+        self.stdout.write(json.dumps(summary, indent=2))
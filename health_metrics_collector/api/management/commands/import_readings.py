@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.importer import (
+    FORMATS,
+    IMPORT_KINDS,
+    ImportFormatError,
+    collect_phone_numbers,
+    detect_format,
+    import_chunk,
+    init_worker,
+    iter_chunks,
+    iter_rows,
+    load_checkpoint,
+    lookup_user_ids,
+    save_checkpoint,
+)
+from api.series import invalidate_series
+from api.tasks import schedule_analytics_backfill
+
+LIST_CACHE_PREFIX = {"glucose": "blood_glucose_list", "pressure": "blood_pressure_list"}
+
+
+class Command(BaseCommand):
+    help = "Import historical readings from a CSV, JSON Lines or JSON array file, in parallel and resumable."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (with header), JSON Lines or JSON array (.json) file.")
+        parser.add_argument("--kind", choices=sorted(IMPORT_KINDS), required=True)
+        parser.add_argument("--format", choices=FORMATS, help="File format (default: from the file extension).")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per insert_many (default: 5000).")
+        parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count).")
+        parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint).")
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over.")
+        parser.add_argument("--errors", help="Write invalid rows as JSON Lines to this file.")
+        parser.add_argument(
+            "--rebuild-analytics", action="store_true",
+            help="Queue a low-priority rebuild of the series and forecast of every imported user (analytics queue).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        kind = options["kind"]
+        file_format = options["format"] or detect_format(path)
+        checkpoint_path = options["checkpoint"] or f"{path}.checkpoint"
+
+        checkpoint = None if options["restart"] else load_checkpoint(checkpoint_path, path)
+        if checkpoint is None:
+            checkpoint = {
+                "source": os.path.abspath(path),
+                "size": os.stat(path).st_size,
+                "next_row": 1,
+                "inserted": 0,
+                "duplicates": 0,
+                "invalid": 0,
+            }
+        elif checkpoint.get("done"):
+            self.stdout.write(self.style.SUCCESS(f"{path} was already imported ({checkpoint['inserted']} readings)."))
+            return
+        else:
+            self.stdout.write(f"Resuming from row {checkpoint['next_row']}")
+
+        # Lượt 1: chỉ đọc cột phone_number để map sang user id bằng truy vấn theo lô
+        try:
+            user_ids = lookup_user_ids(collect_phone_numbers(path, file_format))
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Matched {len(user_ids)} users by phone number")
+
+        chunks = iter_chunks(iter_rows(path, file_format), options["chunk_size"], skip=checkpoint["next_row"] - 1)
+        source = os.path.basename(path)
+        errors_file = open(options["errors"], "a") if options["errors"] else None
+        touched_users = set()
+        started = time.perf_counter()
+        processed = 0
+
+        def record(result):
+            nonlocal processed
+            processed += result["rows"]
+            for name in ("inserted", "duplicates", "invalid"):
+                checkpoint[name] += result[name]
+            checkpoint["next_row"] = result["first_row"] + result["rows"]
+            save_checkpoint(checkpoint_path, checkpoint)
+            touched_users.update(result["user_ids"])
+            if errors_file:
+                for number, row_errors in result["errors"]:
+                    errors_file.write(json.dumps({"row": number, "errors": row_errors}) + "\n")
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"row {checkpoint['next_row'] - 1:>10}  inserted={checkpoint['inserted']}  "
+                f"duplicates={checkpoint['duplicates']}  invalid={checkpoint['invalid']}  "
+                f"{processed / elapsed:,.0f} rows/s"
+            )
+
+        try:
+            processes = max(1, options["processes"])
+            if processes == 1:
+                init_worker(user_ids)
+                for first_row, rows in chunks:
+                    record(import_chunk(kind, source, first_row, rows))
+            else:
+                # Không để process con dùng chung socket MySQL của process cha
+                connections.close_all()
+                with Pool(processes, initializer=init_worker, initargs=(user_ids,)) as pool:
+                    # Giới hạn số chunk đang xử lý để không đọc cả file vào bộ nhớ; xử lý kết quả
+                    # theo đúng thứ tự để checkpoint luôn là một vị trí liền mạch trong file
+                    pending = deque()
+                    for first_row, rows in chunks:
+                        pending.append(pool.apply_async(import_chunk, (kind, source, first_row, rows)))
+                        if len(pending) >= processes * 2:
+                            record(pending.popleft().get())
+                    while pending:
+                        record(pending.popleft().get())
+        finally:
+            if errors_file:
+                errors_file.close()
+            # Dữ liệu mới làm cache danh sách/series của các user liên quan bị cũ
+            cache.delete_many([f"{LIST_CACHE_PREFIX[kind]}_{user_id}" for user_id in touched_users])
+            for user_id in touched_users:
+                invalidate_series(kind, user_id)
+
+        checkpoint["done"] = True
+        save_checkpoint(checkpoint_path, checkpoint)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {checkpoint['inserted']} readings ({checkpoint['duplicates']} already present, "
+            f"{checkpoint['invalid']} invalid) in {elapsed:.1f}s: {processed / max(elapsed, 1e-9):,.0f} rows/s"
+        ))
+        if options["rebuild_analytics"]:
+            scheduled = schedule_analytics_backfill(sorted(touched_users))
+            self.stdout.write(f"Queued analytics rebuild of {scheduled} users")
@@ -0,0 +1,92 @@
+import json
+from itertools import cycle, islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.queues import ANALYTICS_QUEUE, INGESTION_QUEUE, queue_depth
+from api.tasks import schedule_analytics_backfill
+from api.workload import cleanup_probe, phone_number, probe_ingestion
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test of the queue topology: measure ingestion latency (Celery ingestion queue to "
+        "MongoDB) alone, then while a backfill of analytics rebuilds for generate_workload users "
+        "is queued. Needs the broker and workers running (manage.py run_worker ...)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rate", type=float, default=10, help="Ingestion batches per second (default: 10).")
+        parser.add_argument("--batch-size", type=int, default=10, help="Readings per batch (default: 10).")
+        parser.add_argument("--baseline", type=float, default=30, help="Seconds measured without backfill.")
+        parser.add_argument("--duration", type=float, default=60, help="Seconds measured during the backfill.")
+        parser.add_argument("--backfill-users", type=int, default=1000, help="generate_workload users to rebuild.")
+        parser.add_argument("--backfill-tasks", type=int, default=5000, help="Rebuild jobs queued (cycling over the users).")
+        parser.add_argument(
+            "--backfill-queue", choices=(ANALYTICS_QUEUE, INGESTION_QUEUE), default=ANALYTICS_QUEUE,
+            help="Queue of the backfill; 'ingestion' shows what a shared queue would do to ingestion.",
+        )
+        parser.add_argument("--probe-users", type=int, default=10)
+        parser.add_argument("--timeout", type=float, default=30, help="Seconds before a batch counts as lost.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write both phases as JSON to this file.")
+
+    def handle(self, *args, **options):
+        phones = [phone_number(index) for index in range(options["backfill_users"])]
+        user_ids = list(get_user_model().objects.filter(phone_number__in=phones).values_list("id", flat=True))
+        if not user_ids:
+            raise CommandError("No generate_workload users found: run manage.py generate_workload first.")
+
+        probe = {
+            "rate": options["rate"],
+            "batch_size": options["batch_size"],
+            "users": options["probe_users"],
+            "timeout": options["timeout"],
+            "seed": options["seed"],
+        }
+        results = {}
+        try:
+            self.stdout.write(f"Baseline: {options['baseline']:.0f}s of ingestion alone")
+            results["baseline"] = probe_ingestion(duration=options["baseline"], **probe)
+            self.report("baseline", results["baseline"])
+
+            scheduled = schedule_analytics_backfill(
+                islice(cycle(user_ids), options["backfill_tasks"]), queue=options["backfill_queue"],
+            )
+            self.stdout.write(
+                f"Backfill: {scheduled} rebuilds of {len(user_ids)} users queued on '{options['backfill_queue']}', "
+                f"{options['duration']:.0f}s of ingestion"
+            )
+            results["backfill"] = probe_ingestion(duration=options["duration"], **probe)
+            self.report("backfill", results["backfill"])
+            results["backfill"]["backlog"] = self.backlog(options["backfill_queue"])
+        finally:
+            deleted = cleanup_probe(options["probe_users"])
+            self.stdout.write(f"Removed {deleted} probe readings")
+
+        baseline, backfill = results["baseline"]["latency_ms"], results["backfill"]["latency_ms"]
+        if baseline["p95"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"p95 during backfill / baseline: {backfill['p95'] / baseline['p95']:.2f}x "
+                f"(backfill still queued: {results['backfill']['backlog']})"
+            ))
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    def report(self, phase, stats):
+        latency = stats["latency_ms"]
+        self.stdout.write(
+            f"  {phase:<9} batches={stats['requests']:>6}  p50={latency['p50']:8.1f} ms  "
+            f"p95={latency['p95']:8.1f} ms  p99={latency['p99']:8.1f} ms  statuses={stats['statuses']}"
+        )
+
+    def backlog(self, queue):
+        """Số job backfill còn trong queue khi đo xong (None khi chạy eager, không có broker)."""
+        from health_metrics_collector.celery import app
+
+        if app.conf.task_always_eager:
+            return None
+        with app.connection_for_read() as connection:
+            return queue_depth(connection, queue)
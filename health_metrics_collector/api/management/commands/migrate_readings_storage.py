@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import BloodGlucose, BloodPressure
+from api.storage import STORAGE_MODES, storage_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the readings from one storage layout to another (see READINGS_STORAGE_MODE). "
+        "Documents keep their _id, so the copy can be run again to pick up readings written "
+        "in the meantime. Switch READINGS_STORAGE_MODE once the copy is complete."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="source", choices=sorted(STORAGE_MODES), required=True)
+        parser.add_argument("--to", dest="target", choices=sorted(STORAGE_MODES), required=True)
+        parser.add_argument("--batch-size", type=int, default=5000, help="Documents per insert_many (default: 5000).")
+        parser.add_argument("--drop-source", action="store_true", help="Drop the source collections once every reading was copied.")
+        parser.add_argument("--dry-run", action="store_true", help="Only show how many readings would be copied.")
+
+    def handle(self, *args, **options):
+        if options["source"] == options["target"]:
+            raise CommandError("--from and --to must be different layouts")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        for document_cls in (BloodGlucose, BloodPressure):
+            source = storage_for(document_cls, mode=options["source"])
+            target = storage_for(document_cls, mode=options["target"])
+            total = source.count()
+            names = ", ".join(collection.name for collection in source.collections()) or "-"
+            self.stdout.write(f"{document_cls.__name__}: {total} readings in {names}")
+            if options["dry_run"]:
+                continue
+
+            started = time.perf_counter()
+            copied = existing = 0
+            batch = []
+            for doc in source.find({}, batch_size=options["batch_size"]):
+                batch.append(doc)
+                if len(batch) == options["batch_size"]:
+                    inserted, duplicates = target.insert_many(batch)
+                    copied, existing, batch = copied + inserted, existing + duplicates, []
+                    self.stdout.write(f"  {copied + existing}/{total}")
+            if batch:
+                inserted, duplicates = target.insert_many(batch)
+                copied, existing = copied + inserted, existing + duplicates
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"  copied {copied} readings ({existing} already present) in {elapsed:.1f}s"
+            ))
+
+            # Chỉ xóa dữ liệu nguồn khi đích đã có đủ số bản ghi
+            if target.count() < total:
+                raise CommandError(
+                    f"{document_cls.__name__}: target has {target.count()} readings, source has {total}; "
+                    "the source was kept"
+                )
+            if options["drop_source"]:
+                source.drop()
+                self.stdout.write(f"  dropped {names}")
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from api.queues import replay_routes
+from health_metrics_collector.celery import app
+
+# Header RabbitMQ/Celery không được mang theo khi gửi lại message
+DROPPED_HEADERS = ("x-death", "x-first-death-exchange", "x-first-death-queue", "x-first-death-reason")
+
+
+class Command(BaseCommand):
+    help = (
+        "Move dead-lettered messages back to their work queue: failed Celery ingestion tasks "
+        "(ingestion.dead) and rejected raw events (<queue>.dead). Replayed tasks get a fresh "
+        "retry budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queue", action="append", help="Only replay this dead-letter queue (repeatable).")
+        parser.add_argument("--limit", type=int, help="Replay at most this many messages per queue.")
+        parser.add_argument("--dry-run", action="store_true", help="Only show how many messages are waiting.")
+
+    def handle(self, *args, **options):
+        routes = [route for route in replay_routes() if not options["queue"] or route[0].name in options["queue"]]
+
+        with app.connection_for_write() as connection:
+            channel = connection.default_channel
+            producer = connection.Producer(channel)
+            for dead_queue, exchange, routing_key, target in routes:
+                queue = dead_queue.bind(channel)
+                queue.declare()
+                waiting = queue.queue_declare(passive=True).message_count
+                self.stdout.write(f"{queue.name}: {waiting} messages")
+                if options["dry_run"] or not waiting:
+                    continue
+
+                replayed = 0
+                while options["limit"] is None or replayed < options["limit"]:
+                    message = queue.get(no_ack=False, accept=None)
+                    if message is None:
+                        break
+                    headers = {name: value for name, value in (message.headers or {}).items() if name not in DROPPED_HEADERS}
+                    if "retries" in headers:
+                        headers["retries"] = 0
+                    headers.pop("x-error", None)
+                    properties = message.properties
+                    # Gửi nguyên body đã mã hóa, chỉ ack sau khi publish thành công
+                    producer.publish(
+                        message.body,
+                        exchange=exchange,
+                        routing_key=routing_key,
+                        headers=headers,
+                        content_type=message.content_type,
+                        content_encoding=message.content_encoding,
+                        delivery_mode=2,
+                        correlation_id=properties.get("correlation_id"),
+                        reply_to=properties.get("reply_to"),
+                        declare=[target] if target is not None else [],
+                    )
+                    message.ack()
+                    replayed += 1
+                self.stdout.write(self.style.SUCCESS(f"  replayed {replayed} messages to {routing_key}"))
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import UserPurgeJob
+from api.tasks import purge_user_data
+
+
+class Command(BaseCommand):
+    help = "Re-enqueue hard-delete jobs that failed or stopped making progress."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=15,
+            help="Resume pending/running jobs that have not made progress for this many minutes.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["stale_minutes"])
+        jobs = UserPurgeJob.objects(status__in=["pending", "running", "failed"], updated_at__lt=cutoff)
+
+        count = 0
+        for job in jobs:
+            # Task xóa theo chunk nên chạy lại sẽ tiếp tục từ phần dữ liệu còn lại
+            purge_user_data.delay(str(job.id))
+            count += 1
+            self.stdout.write(f"Resumed purge job {job.id} for user {job.user_id} ({job.status})")
+
+        self.stdout.write(self.style.SUCCESS(f"Resumed {count} purge job(s)."))
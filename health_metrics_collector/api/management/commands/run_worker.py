@@ -0,0 +1,45 @@
+import shlex
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.queues import worker_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Start a Celery worker for one launch profile: a queue (ingestion, cache_warm, analytics, "
+        "maintenance, celery), a profile from WORKER_PROFILES or a comma-separated list of queues, "
+        "with the concurrency and prefetch of TASK_QUEUE_SETTINGS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("profile", help=f"Queue or profile ({', '.join([*settings.TASK_QUEUE_SETTINGS, *settings.WORKER_PROFILES])}).")
+        parser.add_argument("--concurrency", type=int, help="Override the profile's concurrency.")
+        parser.add_argument("--loglevel", default="INFO")
+        parser.add_argument("--print", action="store_true", help="Only print the equivalent celery command (systemd, docker).")
+        parser.add_argument("--celery-args", default="", help='Extra celery worker arguments, e.g. "--pool threads".')
+
+    def handle(self, *args, **options):
+        try:
+            profile = worker_profile(options["profile"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        name = options["profile"].replace(",", "-")
+        argv = [
+            "worker",
+            "--queues", ",".join(profile["queues"]),
+            "--concurrency", str(options["concurrency"] or profile["concurrency"]),
+            "--prefetch-multiplier", str(profile["prefetch_multiplier"]),
+            # Tên riêng cho mỗi profile để nhiều worker chạy được trên cùng một máy
+            "--hostname", f"{name}@%h",
+            "--loglevel", options["loglevel"],
+            *shlex.split(options["celery_args"]),
+        ]
+        if options["print"]:
+            self.stdout.write(shlex.join(["celery", "-A", "health_metrics_collector", *argv]))
+            return
+
+        from health_metrics_collector.celery import app
+        app.worker_main(argv)
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Code khởi động của từng entry point, chạy trong process mới với `python -X importtime`
+ENTRY_POINTS = {
+    "web": (
+        "import health_metrics_collector.wsgi\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+    ),
+    "worker": (
+        "from health_metrics_collector.celery import app\n"
+        "import django\n"
+        "django.setup()\n"
+        "app.loader.import_default_modules()\n"
+    ),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        list: ``(module, self_us, cumulative_us, depth)`` tuples in output order.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.partition(":")[2].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2 - 1
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Measure import time of the web and worker entry points against STARTUP_IMPORT_BUDGET_MS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("entry_points", nargs="*", help=f"Entry points to measure: {', '.join(ENTRY_POINTS)} (default: all).")
+        parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports to show.")
+        parser.add_argument("--check", action="store_true", help="Exit with an error when a budget is exceeded.")
+
+    def handle(self, *args, **options):
+        entry_points = options["entry_points"] or list(ENTRY_POINTS)
+        unknown = set(entry_points) - set(ENTRY_POINTS)
+        if unknown:
+            raise CommandError(f"Unknown entry point(s): {', '.join(sorted(unknown))}")
+        over_budget = []
+
+        for name in entry_points:
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", ENTRY_POINTS[name]],
+                cwd=settings.BASE_DIR,
+                env=os.environ.copy(),
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode != 0:
+                raise CommandError(f"{name} entry point failed to start:\n{result.stderr[-2000:]}")
+
+            modules = parse_importtime(result.stderr)
+            total_ms = sum(self_us for _, self_us, _, _ in modules) / 1000
+            budget_ms = settings.STARTUP_IMPORT_BUDGET_MS.get(name)
+
+            style = self.style.SUCCESS
+            if budget_ms is not None and total_ms > budget_ms:
+                style = self.style.ERROR
+                over_budget.append(name)
+            self.stdout.write(style(f"{name}: {total_ms:.0f} ms import time (budget {budget_ms} ms, {len(modules)} modules)"))
+
+            top_level = sorted((m for m in modules if m[3] == 0), key=lambda m: m[2], reverse=True)
+            for module, _, cumulative_us, _ in top_level[:options["top"]]:
+                self.stdout.write(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+        if options["check"] and over_budget:
+            raise CommandError(f"Startup import budget exceeded for: {', '.join(over_budget)}")
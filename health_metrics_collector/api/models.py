@@ -3,8 +3,9 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.validators import RegexValidator
+from django.conf import settings
 
-from mongoengine import Document, StringField, FloatField, IntField, DateTimeField, ReferenceField
+from mongoengine import Document, StringField, FloatField, IntField, DateTimeField, ReferenceField, DictField
 
 class UserManager(BaseUserManager):
     def create_user(self, phone_number, password=None, **extra_fields):
@@ -54,7 +55,44 @@ class User(AbstractUser):
         return self.phone_number
 
 
-class BloodGlucose(Document):
+class CaregiverLink(models.Model):
+    """
+    Permission of a caregiver or clinician to read a patient's readings.
+
+    Attributes:
+        caregiver (User): The user reading the data.
+        patient (User): The user whose readings can be read.
+        created_at (datetime): When the access was granted.
+    """
+    caregiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='patient_links')
+    patient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='caregiver_links')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['caregiver', 'patient'], name='unique_caregiver_patient'),
+        ]
+
+    def __str__(self):
+        return f"{self.caregiver} -> {self.patient}"
+
+
+# Unique (user_id, client_id) chỉ áp dụng cho bản ghi có client_id
+CLIENT_ID_INDEX = {
+    'fields': ['user_id', 'client_id'],
+    'unique': True,
+    'partialFilterExpression': {'client_id': {'$type': 'string'}},
+}
+
+
+class TrackedDocumentMixin:
+    """Cập nhật updated_at mỗi lần save để endpoint sync biết bản ghi đã thay đổi"""
+    def save(self, *args, **kwargs):
+        self.updated_at = timezone.now()
+        return super().save(*args, **kwargs)
+
+
+class BloodGlucose(TrackedDocumentMixin, Document):
     """
     A model representing a blood glucose measurement.
 
@@ -63,14 +101,26 @@ class BloodGlucose(Document):
         unit (str): The unit of the blood glucose measurement, either 'mg/dL' or 'mmol/L'.
         timestamp (datetime): The date and time when the measurement was taken.
         meal (str): The context of the measurement, either 'pre-meal', 'post-meal', 'fasting', or 'before bed'.
+        client_id (str): Optional identifier generated by the client, unique per user. Used to make retried uploads idempotent.
+        updated_at (datetime): When the reading was created or last modified. Used by the sync endpoint.
     """
     user_id = IntField(required=True)
     blood_glucose = FloatField(required=True)
     unit = StringField(choices=['mg/dL', 'mmol/L'], required=True)
     timestamp = DateTimeField(default=timezone.now, required=True)
     meal = StringField(choices=['pre-meal', 'post-meal', 'fasting', 'before bed'], required=True)
+    client_id = StringField(max_length=64)
+    updated_at = DateTimeField(default=timezone.now)
 
-class BloodPressure(Document):
+    meta = {
+        'indexes': [
+            CLIENT_ID_INDEX,
+            ('user_id', 'updated_at'),
+            ('user_id', 'timestamp'),
+        ],
+    }
+
+class BloodPressure(TrackedDocumentMixin, Document):
     """
     BloodPressure model to store blood pressure readings.
 
@@ -79,9 +129,95 @@ class BloodPressure(Document):
         diastolic (int): The diastolic blood pressure value. This field is required.
         timestamp (datetime): The date and time when the blood pressure reading was taken. This field is required.
         unit (str): The unit of measurement for the blood pressure reading. Defaults to 'mm Hg'. This field is required.
+        client_id (str): Optional identifier generated by the client, unique per user.
+        updated_at (datetime): When the reading was created or last modified.
     """
     user_id = IntField(required=True)
     systolic = IntField(required=True)
     diastolic = IntField(required=True)
     timestamp = DateTimeField(default=timezone.now, required=True)
-    unit = StringField(default='mm Hg', required=True)
\ No newline at end of file
+    unit = StringField(default='mm Hg', required=True)
+    client_id = StringField(max_length=64)
+    updated_at = DateTimeField(default=timezone.now)
+
+    meta = {
+        'indexes': [
+            CLIENT_ID_INDEX,
+            ('user_id', 'updated_at'),
+            ('user_id', 'timestamp'),
+        ],
+    }
+
+
+class ReadingTombstone(Document):
+    """
+    Marker left behind when a reading is deleted, so clients syncing with a token learn about the deletion.
+
+    Attributes:
+        user_id (int): Owner of the deleted reading.
+        kind (str): 'glucose' or 'pressure'.
+        reading_id (str): The id of the deleted reading.
+        deleted_at (datetime): When the reading was deleted. Tombstones expire after SYNC_TOMBSTONE_RETENTION_DAYS.
+    """
+    user_id = IntField(required=True)
+    kind = StringField(choices=['glucose', 'pressure'], required=True)
+    reading_id = StringField(required=True)
+    deleted_at = DateTimeField(default=timezone.now, required=True)
+
+    meta = {
+        'indexes': [
+            ('user_id', 'deleted_at'),
+            {'fields': ['deleted_at'], 'expireAfterSeconds': settings.SYNC_TOMBSTONE_RETENTION_DAYS * 86400},
+        ],
+    }
+
+
+class UserPurgeJob(Document):
+    """
+    Background job that permanently deletes a user and all of their health data.
+
+    Attributes:
+        user_id (int): The user being purged.
+        requested_by (int): The user who requested the purge.
+        status (str): 'pending', 'running', 'completed' or 'failed'.
+        deleted (dict): Number of documents deleted so far, per collection.
+        error (str): The last error, if the job failed.
+        created_at (datetime): When the purge was requested.
+        updated_at (datetime): When the job last made progress.
+    """
+    user_id = IntField(required=True)
+    requested_by = IntField()
+    status = StringField(choices=['pending', 'running', 'completed', 'failed'], default='pending', required=True)
+    deleted = DictField()
+    error = StringField()
+    created_at = DateTimeField(default=timezone.now, required=True)
+    updated_at = DateTimeField(default=timezone.now)
+
+    meta = {
+        'indexes': [
+            'user_id',
+            ('status', 'updated_at'),
+        ],
+    }
+
+
+class GlucoseForecast(Document):
+    """
+    Holt (double exponential smoothing) state of a user's glucose readings, see api.forecast.
+
+    Updated in O(1) with each new reading, so the forecast endpoint never reads the readings.
+
+    Attributes:
+        user_id (int): Owner of the readings.
+        level (float): Smoothed glucose level at ``timestamp``, in mg/dL.
+        trend (float): Smoothed rate of change, in mg/dL per minute.
+        timestamp (datetime): Time of the latest reading folded into the state.
+        count (int): Number of readings folded into the state, also used as a version for concurrent updates.
+        updated_at (datetime): When the state was last written.
+    """
+    user_id = IntField(required=True, unique=True)
+    level = FloatField(required=True)
+    trend = FloatField(default=0.0)
+    timestamp = DateTimeField(required=True)
+    count = IntField(default=0)
+    updated_at = DateTimeField(default=timezone.now)
@@ -0,0 +1,19 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, thiếu thì dùng json của thư viện chuẩn
+    orjson = None
+
+
+class FastJSONParser(JSONParser):
+    """JSON parser backed by orjson. Falls back to DRF's parser when orjson is unavailable."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
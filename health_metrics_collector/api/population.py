@@ -0,0 +1,215 @@
+"""
+Cohort metrics over many users, computed one partition of users at a time.
+
+``partition_metrics`` is the unit of work of ``manage.py population_report``: it streams
+the readings of a partition with a single projected query per collection, keeps them in
+flat typed arrays, and computes every per-user metric at once with ``np.bincount`` over the
+user index. ``merge_report`` combines the per-user metrics of all partitions into the
+cohort distributions.
+"""
+from array import array
+from datetime import timedelta
+
+import numpy as np
+
+from .analytics import PRESSURE_STAGES, glucose_range_masks, pressure_stages
+from .archive import cold_cutoff, read_table
+from .models import BloodGlucose, BloodPressure
+from .routing import analytics_read_preference
+from .series import MMOL_TO_MGDL, to_epoch_ms
+from .storage import storage_for
+
+DAY_MS = 24 * 60 * 60 * 1000
+STREAM_BATCH_SIZE = 5000
+PERCENTILES = (10, 25, 50, 75, 90)
+# Mục tiêu đồng thuận quốc tế về CGM: > 70% thời gian trong khoảng 70-180 mg/dL
+TIR_TARGET = 70.0
+# TIR/TBR/TAR gộp các khoảng của analytics.GLUCOSE_RANGES, cùng cận với glucose_summary
+TIME_IN_RANGE_GROUPS = {
+    'tir': ('in_range',),
+    'tbr': ('very_low', 'low'),
+    'tar': ('high', 'very_high'),
+}
+
+
+def _stream_columns(document_cls, user_ids, since, value_fields):
+    """
+    Read the readings of ``user_ids`` since ``since`` into flat arrays.
+
+    Returns:
+        dict: ``user_index`` (position of the owner in ``user_ids``), ``timestamps`` (ms) and
+        one float array per value field. Glucose values are normalized to mg/dL.
+    """
+    position = {user_id: index for index, user_id in enumerate(user_ids)}
+    owners, timestamps = array('l'), array('q')
+    values = {name: array('d') for name in value_fields}
+
+    projection = {'_id': 0, 'user_id': 1, 'timestamp': 1, 'unit': 1, **{name: 1 for name in value_fields}}
+    cursor = storage_for(document_cls).find(
+        {'user_id': {'$in': list(user_ids)}},
+        projection,
+        start=since,
+        read_preference=analytics_read_preference(),
+        batch_size=STREAM_BATCH_SIZE,
+    )
+    docs = cursor
+    if since < cold_cutoff():
+        docs = _with_archived(document_cls, user_ids, since, value_fields, cursor)
+
+    for doc in docs:
+        owners.append(position[doc['user_id']])
+        timestamps.append(to_epoch_ms(doc['timestamp']))
+        scale = MMOL_TO_MGDL if doc.get('unit') == 'mmol/L' else 1.0
+        for name in value_fields:
+            values[name].append(doc[name] * (scale if name == 'blood_glucose' else 1.0))
+
+    return {
+        'user_index': np.frombuffer(owners, dtype=np.int_) if owners else np.empty(0, dtype=np.int_),
+        'timestamps': np.frombuffer(timestamps, dtype=np.int64) if timestamps else np.empty(0, dtype=np.int64),
+        **{name: np.frombuffer(column, dtype=np.float64) if column else np.empty(0) for name, column in values.items()},
+    }
+
+
+def _with_archived(document_cls, user_ids, since, value_fields, cursor):
+    """Khi khoảng thời gian vượt quá mốc lưu trữ, đọc thêm dữ liệu từ cold tier."""
+    yield from cursor
+    for user_id in user_ids:
+        table = read_table(document_cls, user_id, start=since, columns=['timestamp', 'unit', *value_fields])
+        if table is not None:
+            for row in table.to_pylist():
+                yield dict(row, user_id=user_id)
+
+
+def _per_user(user_index, weights, users):
+    return np.bincount(user_index, weights=weights, minlength=users)
+
+
+def _active_days(user_index, timestamps, users):
+    """Số ngày (UTC) có ít nhất một bản ghi của mỗi user."""
+    if not len(timestamps):
+        return np.zeros(users)
+    day = timestamps // DAY_MS
+    pairs = np.unique(user_index.astype(np.int64) * (int(day.max()) + 1) + day)
+    return np.bincount(pairs // (int(day.max()) + 1), minlength=users).astype(np.float64)
+
+
+def _glucose_metrics(columns, users, days):
+    user_index, values = columns['user_index'], columns['blood_glucose']
+    count = _per_user(user_index, None, users).astype(np.float64)
+    masks = glucose_range_masks(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = _per_user(user_index, values, users) / count
+        variance = _per_user(user_index, values * values, users) / count - mean * mean
+        cv = np.sqrt(np.clip(variance, 0, None)) / mean * 100
+        time_in_ranges = {
+            metric: _per_user(
+                user_index, np.logical_or.reduce([masks[name] for name in names]).astype(np.float64), users,
+            ) / count * 100
+            for metric, names in TIME_IN_RANGE_GROUPS.items()
+        }
+    return {
+        'readings': count,
+        'mean': mean,
+        'cv': cv,
+        **time_in_ranges,
+        'readings_per_day': count / days,
+        'adherence': _active_days(user_index, columns['timestamps'], users) / days * 100,
+    }
+
+
+def _pressure_metrics(columns, users, days):
+    user_index = columns['user_index']
+    count = _per_user(user_index, None, users).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        systolic = _per_user(user_index, columns['systolic'], users) / count
+        diastolic = _per_user(user_index, columns['diastolic'], users) / count
+    return {
+        'readings': count,
+        'systolic': systolic,
+        'diastolic': diastolic,
+        'readings_per_day': count / days,
+        'adherence': _active_days(user_index, columns['timestamps'], users) / days * 100,
+    }
+
+
+def partition_metrics(user_ids, since, days):
+    """
+    Per-user metrics for one partition of users.
+
+    Args:
+        user_ids (list): The users of the partition.
+        since (datetime): Naive UTC start of the reporting window.
+        days (int): Length of the window, used for per-day rates.
+
+    Returns:
+        dict: ``{'glucose': {metric: list}, 'pressure': {metric: list}}``, each list aligned
+        with ``user_ids``. Metrics of users without readings are NaN.
+    """
+    users = len(user_ids)
+    glucose = _stream_columns(BloodGlucose, user_ids, since, ('blood_glucose',))
+    pressure = _stream_columns(BloodPressure, user_ids, since, ('systolic', 'diastolic'))
+    return {
+        'glucose': {name: values.tolist() for name, values in _glucose_metrics(glucose, users, days).items()},
+        'pressure': {name: values.tolist() for name, values in _pressure_metrics(pressure, users, days).items()},
+    }
+
+
+def _distribution(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    quantiles = np.percentile(values, PERCENTILES)
+    return {
+        'mean': round(float(values.mean()), 1),
+        **{f'p{p}': round(float(q), 1) for p, q in zip(PERCENTILES, quantiles)},
+    }
+
+
+def merge_report(partitions, since, days):
+    """
+    Combine the output of ``partition_metrics`` for all partitions into a cohort report.
+
+    ``partitions`` must not be empty. Only users with at least one reading of a kind count
+    towards that kind's distributions. Blood pressure stages are assigned from each user's
+    mean reading.
+    """
+    merged = {'glucose': {}, 'pressure': {}}
+    for partition in partitions:
+        for kind, metrics in partition.items():
+            for name, values in metrics.items():
+                merged[kind].setdefault(name, []).extend(values)
+    glucose = {name: np.asarray(values, dtype=np.float64) for name, values in merged['glucose'].items()}
+    pressure = {name: np.asarray(values, dtype=np.float64) for name, values in merged['pressure'].items()}
+
+    report = {
+        'window': {'since': since.isoformat() + 'Z', 'days': days},
+        'users': len(glucose['readings']),
+    }
+
+    with_glucose = glucose['readings'] > 0
+    report['glucose'] = {
+        'users_with_readings': int(with_glucose.sum()),
+        'users_meeting_tir_target': int((glucose['tir'][with_glucose] > TIR_TARGET).sum()),
+        **{name: _distribution(glucose[name][with_glucose])
+           for name in ('mean', 'cv', 'tir', 'tbr', 'tar', 'readings_per_day', 'adherence')},
+    }
+
+    with_pressure = pressure['readings'] > 0
+    stages = pressure_stages(pressure['systolic'][with_pressure], pressure['diastolic'][with_pressure])
+    total = max(int(with_pressure.sum()), 1)
+    report['pressure'] = {
+        'users_with_readings': int(with_pressure.sum()),
+        'stage_prevalence': {
+            name: round(float((stages == name).sum()) / total * 100, 1)
+            for name in ('normal', *(stage for stage, _, _ in reversed(PRESSURE_STAGES)))
+        },
+        **{name: _distribution(pressure[name][with_pressure])
+           for name in ('systolic', 'diastolic', 'readings_per_day', 'adherence')},
+    }
+    return report
+
+
+def window_start(now, days):
+    """Đầu ngày (UTC, naive) của ``days`` ngày gần nhất, tính cả hôm nay."""
+    start = (now - timedelta(days=days - 1)).replace(tzinfo=None)
+    return start.replace(hour=0, minute=0, second=0, microsecond=0)
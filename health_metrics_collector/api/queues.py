@@ -0,0 +1,191 @@
+"""
+RabbitMQ topology of the ingestion pipeline.
+
+- Celery ingestion tasks run on the ``ingestion`` queue. A message rejected there (retries
+  exhausted) is dead-lettered to ``ingestion.dead``.
+- Retries don't wait inside the worker: the task is republished to a delay queue
+  ``ingestion.retry.<N>s`` that nobody consumes. When its TTL expires RabbitMQ dead-letters
+  it back to ``ingestion``. One delay queue per step of ``INGESTION_RETRY_DELAYS`` gives an
+  exponential backoff without holding ETA tasks in the worker's prefetch buffer.
+- Rows that can never be written (bad payloads) are split off their batch and published to
+  ``ingestion.dead`` right away, with the error in the ``x-error`` header.
+- The raw event queues (``blood_glucose_queue``/``blood_pressure_queue``) dead-letter
+  rejected messages to ``<queue>.dead``.
+
+Every kind of work has its own queue and its own worker pool (``manage.py run_worker``), so
+a backfill or a purge can never hold up ingestion:
+
+- ``ingestion``: ``process_blood_glucose``/``process_blood_pressure``.
+- ``cache_warm``: cache warming after login (``api.warming``).
+- ``analytics``: rollups rebuilt from MongoDB (series, forecast state), e.g. after an import.
+- ``maintenance``: purges and archiving.
+
+Concurrency, prefetch and the default message priority of each queue are in
+``TASK_QUEUE_SETTINGS``. Queues are declared with ``x-max-priority``, so within one queue a
+message with a higher priority (e.g. a rebuild after a user's own upload) is delivered before
+lower ones already waiting (e.g. a backfill sent with ``BACKFILL_PRIORITY``).
+
+``manage.py replay_dead_letters`` moves dead-lettered messages back to their work queue.
+"""
+from django.conf import settings
+from kombu import Exchange, Queue
+
+DEFAULT_QUEUE = 'celery'
+INGESTION_QUEUE = 'ingestion'
+WARM_QUEUE = 'cache_warm'
+ANALYTICS_QUEUE = 'analytics'
+MAINTENANCE_QUEUE = 'maintenance'
+RAW_QUEUES = ('blood_glucose_queue', 'blood_pressure_queue')
+
+ingestion_exchange = Exchange(INGESTION_QUEUE, type='direct', durable=True)
+retry_exchange = Exchange('ingestion.retry', type='direct', durable=True)
+dead_letter_exchange = Exchange('health_metrics.dlx', type='direct', durable=True)
+
+
+def dead_letter_key(queue_name):
+    return f"{queue_name}.dead"
+
+
+def dead_letter_queue(queue_name):
+    """Queue giữ các message bị reject từ ``queue_name``."""
+    key = dead_letter_key(queue_name)
+    return Queue(key, dead_letter_exchange, routing_key=key, durable=True)
+
+
+def dead_letter_arguments(queue_name):
+    return {
+        'x-dead-letter-exchange': dead_letter_exchange.name,
+        'x-dead-letter-routing-key': dead_letter_key(queue_name),
+    }
+
+
+def ingestion_queue():
+    return Queue(
+        INGESTION_QUEUE,
+        ingestion_exchange,
+        routing_key=INGESTION_QUEUE,
+        durable=True,
+        queue_arguments=dead_letter_arguments(INGESTION_QUEUE),
+        max_priority=settings.TASK_MAX_PRIORITY,
+    )
+
+
+def retry_queue(delay):
+    """Delay queue: message hết hạn sau ``delay`` giây thì quay lại queue ``ingestion``."""
+    name = f"{INGESTION_QUEUE}.retry.{delay}s"
+    return Queue(
+        name,
+        retry_exchange,
+        routing_key=name,
+        durable=True,
+        queue_arguments={
+            'x-message-ttl': delay * 1000,
+            'x-dead-letter-exchange': ingestion_exchange.name,
+            'x-dead-letter-routing-key': INGESTION_QUEUE,
+        },
+    )
+
+
+def retry_delay(retries):
+    """Số giây chờ trước lần thử lại thứ ``retries + 1``, None nếu đã hết lượt."""
+    delays = settings.INGESTION_RETRY_DELAYS
+    return delays[retries] if retries < len(delays) else None
+
+
+def work_queue(name):
+    return Queue(name, Exchange(name), routing_key=name, durable=True, max_priority=settings.TASK_MAX_PRIORITY)
+
+
+def task_queues():
+    """Queue mà worker Celery consume. Delay queue và dead-letter queue không nằm trong đây."""
+    return (
+        work_queue(DEFAULT_QUEUE),
+        ingestion_queue(),
+        work_queue(WARM_QUEUE),
+        work_queue(ANALYTICS_QUEUE),
+        work_queue(MAINTENANCE_QUEUE),
+    )
+
+
+# task: queue
+TASK_QUEUES = {
+    'api.tasks.process_blood_glucose': INGESTION_QUEUE,
+    'api.tasks.process_blood_pressure': INGESTION_QUEUE,
+    'api.tasks.warm_user_cache': WARM_QUEUE,
+    'api.tasks.rebuild_user_analytics': ANALYTICS_QUEUE,
+    'api.tasks.purge_user_data': MAINTENANCE_QUEUE,
+    'api.tasks.archive_cold_readings_task': MAINTENANCE_QUEUE,
+}
+
+
+def queue_settings(name):
+    """concurrency, prefetch_multiplier và priority của queue ``name`` (TASK_QUEUE_SETTINGS)."""
+    return settings.TASK_QUEUE_SETTINGS[name]
+
+
+def task_routes():
+    """Route của từng task: queue và priority mặc định của queue đó."""
+    return {
+        task: {'queue': queue, 'priority': queue_settings(queue)['priority']}
+        for task, queue in TASK_QUEUES.items()
+    }
+
+
+def worker_profile(name):
+    """
+    Queues and pool size of a worker launch profile.
+
+    A profile is a queue name, a name from ``WORKER_PROFILES`` (several queues served by one
+    worker) or a comma-separated list of queues. Concurrency is the sum of the queues'
+    concurrency, the prefetch multiplier the smallest of theirs.
+
+    Returns:
+        dict: ``queues``, ``concurrency`` and ``prefetch_multiplier``.
+
+    Raises:
+        ValueError: Unknown profile or queue.
+    """
+    queues = settings.WORKER_PROFILES.get(name) or [queue.strip() for queue in name.split(',') if queue.strip()]
+    unknown = [queue for queue in queues if queue not in settings.TASK_QUEUE_SETTINGS]
+    if not queues or unknown:
+        raise ValueError(f"Unknown worker profile or queue: {', '.join(unknown) or name!r}")
+    return {
+        'queues': list(queues),
+        'concurrency': sum(queue_settings(queue)['concurrency'] for queue in queues),
+        'prefetch_multiplier': min(queue_settings(queue)['prefetch_multiplier'] for queue in queues),
+    }
+
+
+def declare_topology(connection):
+    """Khai báo mọi queue (kể cả delay/dead-letter) để message bị reject không bị mất."""
+    channel = connection.default_channel
+    queues = [ingestion_queue(), dead_letter_queue(INGESTION_QUEUE)]
+    queues += [retry_queue(delay) for delay in settings.INGESTION_RETRY_DELAYS]
+    queues += [dead_letter_queue(name) for name in RAW_QUEUES]
+    for queue in queues:
+        queue.bind(channel).declare()
+
+
+def queue_depth(connection, name):
+    """Số message đang chờ trong queue ``name``, None nếu queue chưa tồn tại."""
+    try:
+        return connection.channel().queue_declare(queue=name, passive=True).message_count
+    except connection.channel_errors:
+        return None
+
+
+def declare_raw_queue(channel, queue_name):
+    """Khai báo (bằng pika) queue sự kiện ``queue_name`` cùng dead-letter queue của nó."""
+    dead = dead_letter_key(queue_name)
+    channel.exchange_declare(exchange=dead_letter_exchange.name, exchange_type='direct', durable=True)
+    channel.queue_declare(queue=dead, durable=True)
+    channel.queue_bind(queue=dead, exchange=dead_letter_exchange.name, routing_key=dead)
+    channel.queue_declare(queue=queue_name, durable=True, arguments=dead_letter_arguments(queue_name))
+
+
+def replay_routes():
+    """(dead-letter queue, exchange, routing key, queue đích) cho replay_dead_letters."""
+    routes = [(dead_letter_queue(INGESTION_QUEUE), ingestion_exchange, INGESTION_QUEUE, ingestion_queue())]
+    for name in RAW_QUEUES:
+        routes.append((dead_letter_queue(name), Exchange(''), name, None))
+    return routes
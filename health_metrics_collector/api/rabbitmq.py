@@ -1,9 +1,16 @@
 import pika
-import json
 import os
 import logging
 
-from .tasks import process_blood_pressure
+from .codec import encode_message
+from .queues import declare_raw_queue
+from .tasks import process_blood_glucose, process_blood_pressure
+
+# Task Celery ghi batch dữ liệu của từng queue
+INGESTION_TASKS = {
+    "blood_glucose_queue": process_blood_glucose,
+    "blood_pressure_queue": process_blood_pressure,
+}
 
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
 
@@ -14,16 +21,18 @@ def get_connection():
 def publish_message(queue_name, message):
     """Gửi message vào queue cụ thể"""
     try:
-        print("publish_message - sending task to Celery")
-        process_blood_pressure.apply_async(args=[message])
+        # Chỉ batch (list) là dữ liệu chưa được lưu; dict là thông báo về bản ghi đã lưu
+        if isinstance(message, list):
+            print("publish_message - sending task to Celery")
+            INGESTION_TASKS[queue_name].apply_async(args=[message])
         connection = get_connection()
         channel = connection.channel()
 
-        # Đảm bảo queue tồn tại
-        channel.queue_declare(queue=queue_name, durable=True)
+        # Đảm bảo queue (và dead-letter queue của nó) tồn tại
+        declare_raw_queue(channel, queue_name)
 
-        # Chuyển đổi message sang JSON
-        message_body = json.dumps(message)
+        # Mã hóa message (JSON hoặc msgpack theo BROKER_MESSAGE_FORMAT), consumer đọc content_type để giải mã
+        message_body, content_type = encode_message(message)
 
         # Gửi message với độ bền
         channel.basic_publish(
@@ -32,6 +41,7 @@ def publish_message(queue_name, message):
             body=message_body,
             properties=pika.BasicProperties(
                 delivery_mode=2,  # Persistent messages
+                content_type=content_type,
             )
         )
 
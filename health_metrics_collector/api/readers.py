@@ -0,0 +1,197 @@
+import uuid
+from datetime import timezone as dt_timezone
+
+from django.core.cache import cache
+
+from .archive import read_documents
+from .models import BloodGlucose, BloodPressure
+from .storage import storage_for
+
+
+def format_datetime(value):
+    """Format giống DateTimeField của DRF (ISO 8601, UTC kết thúc bằng 'Z')."""
+    if value.tzinfo is None:
+        # pymongo trả về datetime naive theo UTC
+        return value.isoformat() + 'Z'
+    value = value.astimezone(dt_timezone.utc).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+# (field, converter) theo đúng thứ tự field của BloodGlucoseSerializer/BloodPressureSerializer
+GLUCOSE_FIELDS = (
+    ('blood_glucose', float),
+    ('unit', None),
+    ('timestamp', format_datetime),
+    ('meal', None),
+    ('client_id', None),
+    ('updated_at', format_datetime),
+)
+
+PRESSURE_FIELDS = (
+    ('systolic', int),
+    ('diastolic', int),
+    ('timestamp', format_datetime),
+    ('unit', None),
+    ('client_id', None),
+    ('updated_at', format_datetime),
+)
+
+
+def serialize_rows(cursor, fields):
+    """
+    Map raw Mongo documents straight to the API representation.
+
+    Produces the same output as the DRF serializers without hydrating mongoengine
+    Documents or running field-by-field serializer machinery.
+
+    Args:
+        cursor (iterable): Raw documents, e.g. a pymongo cursor.
+        fields (tuple): ``(name, converter)`` pairs such as ``GLUCOSE_FIELDS``.
+
+    Returns:
+        list: One dict per document.
+    """
+    rows = []
+    for raw in cursor:
+        row = {'id': str(raw['_id'])}
+        get = raw.get
+        for name, convert in fields:
+            value = get(name)
+            if convert is not None and value is not None:
+                value = convert(value)
+            row[name] = value
+        rows.append(row)
+    return rows
+
+
+def select_fields(fields, names):
+    """
+    Restrict ``fields`` (``GLUCOSE_FIELDS``/``PRESSURE_FIELDS``) to a sparse fieldset.
+
+    ``id`` is always part of the output and may be listed or not. The original field
+    order is kept, so equal field sets give equal tuples whatever order they were asked in.
+
+    Raises:
+        ValueError: ``names`` is empty or contains an unknown field.
+    """
+    known = [name for name, _ in fields]
+    unknown = [name for name in names if name not in known and name != 'id']
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available fields: id, {', '.join(known)}")
+    if not names:
+        raise ValueError("fields must list at least one field")
+    return tuple((name, convert) for name, convert in fields if name in names)
+
+
+LIST_CACHE_TIMEOUT = 300
+# Tiền tố key cache danh sách của từng loại chỉ số
+LIST_CACHE_PREFIXES = {'glucose': 'blood_glucose_list', 'pressure': 'blood_pressure_list'}
+# Version phải sống lâu hơn mọi entry dùng nó (danh sách: 5 phút, section dashboard: DASHBOARD_SECTION_TTLS)
+CACHE_VERSION_TIMEOUT = 3600
+
+
+def field_set_key(fields):
+    """Tên của field set trong key cache: 'all' hoặc danh sách field (kể cả id)."""
+    return 'all' if fields is None else ','.join(['id', *(name for name, _ in fields)])
+
+
+def versioned_cache_key(prefix, user_id, variant):
+    """
+    Cache key of one variant (field set, dashboard section...) of a user's readings.
+
+    ``<prefix>_<user_id>`` holds the current version: deleting that key, as every write
+    path does for the list cache, invalidates all variants at once.
+    """
+    version_key = f"{prefix}_{user_id}"
+    version = cache.get(version_key)
+    if not isinstance(version, str):
+        version = _new_version(version_key)
+    return f"{version_key}_{version}_{variant}"
+
+
+def versioned_cache_keys(prefix, user_ids, variant):
+    """``versioned_cache_key`` của nhiều user, đọc các version bằng một lần get_many."""
+    version_keys = {user_id: f"{prefix}_{user_id}" for user_id in user_ids}
+    versions = cache.get_many(list(version_keys.values()))
+    keys = {}
+    for user_id, version_key in version_keys.items():
+        version = versions.get(version_key)
+        if not isinstance(version, str):
+            version = _new_version(version_key)
+        keys[user_id] = f"{version_key}_{version}_{variant}"
+    return keys
+
+
+def _new_version(version_key):
+    """Tạo version cho key chưa có; nếu request khác vừa tạo trước thì dùng version của nó."""
+    version = uuid.uuid4().hex
+    if not cache.add(version_key, version, timeout=CACHE_VERSION_TIMEOUT):
+        version = cache.get(version_key, version)
+    return version
+
+
+def _projection(fields, sort=None):
+    # Field dùng để sort phải được đọc để gộp với dữ liệu cold tier
+    names = [name for name, _ in fields] + [field for field, _ in sort or ()]
+    # Projection rỗng nghĩa là đọc mọi field: ?fields=id chỉ cần _id
+    return dict.fromkeys(names or ['_id'], 1)
+
+
+def _find(document_cls, user_id, fields, sort=None, read_preference=None):
+    return storage_for(document_cls).find(
+        {'user_id': user_id}, _projection(fields, sort), sort, read_preference=read_preference,
+    )
+
+
+def _with_archive(document_cls, user_id, fields, docs, sort=None):
+    """Gộp dữ liệu đã lưu trữ (cold tier) vào kết quả đọc từ MongoDB."""
+    archived = read_documents(document_cls, user_id, columns=list(dict.fromkeys(['_id', *_projection(fields, sort)])))
+    if not archived:
+        return docs
+    docs = archived + list(docs)
+    if sort:
+        field, direction = sort[0]
+        docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+    return docs
+
+
+def iter_documents(document_cls, user_id, field_names, sort=None, read_preference=None):
+    """Raw documents (MongoDB + cold tier) of a user with only ``field_names`` projected."""
+    fields = tuple((name, None) for name in field_names)
+    docs = _find(document_cls, user_id, fields, sort, read_preference)
+    return _with_archive(document_cls, user_id, fields, docs, sort)
+
+
+def glucose_rows(user_id, sort=None, read_preference=None, fields=None):
+    """Danh sách đường huyết của user ở dạng đã serialize, chỉ đọc các field trong ``fields`` (mặc định: tất cả)."""
+    fields = GLUCOSE_FIELDS if fields is None else fields
+    docs = _find(BloodGlucose, user_id, fields, sort, read_preference)
+    return serialize_rows(_with_archive(BloodGlucose, user_id, fields, docs, sort), fields)
+
+
+def pressure_rows(user_id, sort=None, read_preference=None, fields=None):
+    """Danh sách huyết áp của user ở dạng đã serialize, chỉ đọc các field trong ``fields`` (mặc định: tất cả)."""
+    fields = PRESSURE_FIELDS if fields is None else fields
+    docs = _find(BloodPressure, user_id, fields, sort, read_preference)
+    return serialize_rows(_with_archive(BloodPressure, user_id, fields, docs, sort), fields)
+
+
+def cached_rows(kind, user_id, fields=None):
+    """
+    A user's serialized list of ``kind`` ('glucose' or 'pressure'), read through the list cache.
+
+    Each field set has its own cache entry (see ``versioned_cache_key``).
+
+    Returns:
+        tuple: ``(rows, cached)``, ``cached`` telling whether the rows came from the cache.
+    """
+    key = versioned_cache_key(LIST_CACHE_PREFIXES[kind], user_id, field_set_key(fields))
+    rows = cache.get(key)
+    if rows is not None:
+        return rows, True
+    read = glucose_rows if kind == 'glucose' else pressure_rows
+    rows = read(user_id, fields=fields)
+    cache.set(key, rows, timeout=LIST_CACHE_TIMEOUT)
+    return rows, False
@@ -0,0 +1,61 @@
+import datetime
+import decimal
+
+from bson import ObjectId
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, thiếu thì dùng json của thư viện chuẩn
+    orjson = None
+
+
+class HealthJSONEncoder(JSONEncoder):
+    """DRF encoder that also understands Mongo ObjectIds. Used when orjson is not installed."""
+    def default(self, obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        return super().default(obj)
+
+
+def orjson_default(obj):
+    """Kiểu dữ liệu orjson không tự xử lý, chuyển đổi giống HealthJSONEncoder."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__') and hasattr(obj, 'keys'):
+        return dict(obj)
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer backed by orjson.
+
+    Datetimes, ObjectIds and Decimals are encoded natively. Naive datetimes are treated as
+    UTC, as returned by pymongo. Falls back to DRF's renderer when orjson is unavailable.
+    """
+    encoder_class = HealthJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # Browsable API / ?indent=: orjson chỉ hỗ trợ thụt lề 2 dấu cách
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=orjson_default, option=option)
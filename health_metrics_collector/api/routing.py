@@ -0,0 +1,112 @@
+"""
+Read routing for heavy queries.
+
+- MongoDB: analytics, stats and export queries read from secondaries
+  (``MONGO_ANALYTICS_READ_PREFERENCE``). Read-your-writes paths (list, detail, sync) keep
+  the default read preference of the connection.
+- MySQL: ``PrimaryReplicaRouter`` sends reads to the ``replica`` alias when it is configured.
+- Freshness guard: after a user writes, their reads stay on the primary for
+  ``READ_AFTER_WRITE_WINDOW_SECONDS`` so they never see replication lag.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from pymongo.read_preferences import (
+    Nearest,
+    PrimaryPreferred,
+    ReadPreference,
+    Secondary,
+    SecondaryPreferred,
+)
+from rest_framework.permissions import SAFE_METHODS
+
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+
+_READ_PREFERENCES = {
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+
+def _recent_write_key(user_id):
+    return f"recent_write_{user_id}"
+
+
+def mark_write(user_id):
+    """Ghi nhận user vừa ghi dữ liệu: các lần đọc ngay sau đó đi vào primary."""
+    cache.set(_recent_write_key(user_id), 1, timeout=settings.READ_AFTER_WRITE_WINDOW_SECONDS)
+
+
+def recently_wrote(user_id):
+    return cache.get(_recent_write_key(user_id)) is not None
+
+
+def pin_to_primary():
+    _pinned_to_primary.set(True)
+
+
+def is_pinned_to_primary():
+    return _pinned_to_primary.get()
+
+
+def analytics_read_preference(user_id=None):
+    """
+    Read preference for analytics, stats and export queries.
+
+    Returns the primary while the current request is pinned, or while ``user_id`` is inside
+    its read-after-write window. Otherwise returns ``MONGO_ANALYTICS_READ_PREFERENCE``.
+    """
+    name = settings.MONGO_ANALYTICS_READ_PREFERENCE
+    if name == 'primary' or is_pinned_to_primary() or (user_id is not None and recently_wrote(user_id)):
+        return ReadPreference.PRIMARY
+    max_staleness = settings.MONGO_ANALYTICS_MAX_STALENESS_SECONDS
+    return _READ_PREFERENCES[name](max_staleness=max_staleness)
+
+
+def analytics_collection(document_cls, user_id=None):
+    """Collection của document với read preference dành cho truy vấn nặng."""
+    return document_cls._get_collection().with_options(read_preference=analytics_read_preference(user_id))
+
+
+class PrimaryReplicaRouter:
+    """Send reads to the replica alias when configured. Writes and migrations stay on 'default'."""
+
+    def db_for_read(self, model, **hints):
+        if settings.REPLICA_DATABASE in settings.DATABASES and not is_pinned_to_primary():
+            return settings.REPLICA_DATABASE
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica là bản sao của default nên quan hệ giữa hai alias luôn hợp lệ
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReadRoutingMiddleware:
+    """
+    Pins a request to the primary when it writes, and marks a successful write so that
+    the same user's following requests also read from the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        is_write = request.method not in SAFE_METHODS
+        token = _pinned_to_primary.set(is_write)
+        try:
+            response = self.get_response(request)
+            user = getattr(request, 'user', None)
+            if is_write and response.status_code < 400 and user is not None and user.is_authenticated:
+                mark_write(user.id)
+            return response
+        finally:
+            _pinned_to_primary.reset(token)
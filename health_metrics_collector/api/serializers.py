@@ -6,6 +6,8 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 from .models import BloodGlucose, BloodPressure
+from .bulk import upsert_reading
+from .storage import storage_for
 import logging
 
 User = get_user_model()
@@ -43,7 +45,16 @@ class UserUpdatePasswordSerializer(serializers.ModelSerializer):
         model = User
         fields = ['password']
 
-class BloodGlucoseSerializer(serializers.Serializer):
+class DynamicFieldsMixin:
+    """Serializer nhận thêm tham số ``fields``: chỉ giữ lại các field được liệt kê (``id`` luôn được giữ)."""
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - {'id'}:
+                self.fields.pop(name)
+
+class BloodGlucoseSerializer(DynamicFieldsMixin, serializers.Serializer):
     """This class is used to serialize the BloodGlucose model.
 
     Args:
@@ -57,6 +68,8 @@ class BloodGlucoseSerializer(serializers.Serializer):
     unit = serializers.ChoiceField(choices=['mg/dL', 'mmol/L'])
     timestamp = serializers.DateTimeField(read_only=True)
     meal = serializers.ChoiceField(choices=['pre-meal', 'post-meal', 'fasting', 'before bed'])
+    client_id = serializers.CharField(required=False, max_length=64)
+    updated_at = serializers.DateTimeField(read_only=True)
 
     def validate_blood_glucose(self, value):
         if value <= 0:
@@ -80,7 +93,9 @@ class BloodGlucoseSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         try:
-            return BloodGlucose.objects.create(**validated_data)
+            if validated_data.get('client_id'):
+                return upsert_reading(BloodGlucose, validated_data)
+            return storage_for(BloodGlucose).create(validated_data)
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.error(f"Error creating BloodGlucose record: {e}")
@@ -90,14 +105,13 @@ class BloodGlucoseSerializer(serializers.Serializer):
         try:
             for attr, value in validated_data.items():
                 setattr(instance, attr, value)
-            instance.save()
-            return instance
+            return storage_for(type(instance)).save(instance)
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.error(f"Error updating BloodGlucose record: {e}")
             raise serializers.ValidationError("An error occurred while updating the BloodGlucose record.")
     
-class BloodPressureSerializer(serializers.Serializer):
+class BloodPressureSerializer(DynamicFieldsMixin, serializers.Serializer):
     """This class is used to serialize the BloodPressure model.
 
     Args:
@@ -111,6 +125,8 @@ class BloodPressureSerializer(serializers.Serializer):
     diastolic = serializers.IntegerField()
     timestamp = serializers.DateTimeField(read_only=True)
     unit = serializers.CharField(default='mm Hg')
+    client_id = serializers.CharField(required=False, max_length=64)
+    updated_at = serializers.DateTimeField(read_only=True)
 
     def validate_systolic(self, value):
         if value <= 0:
@@ -144,7 +160,9 @@ class BloodPressureSerializer(serializers.Serializer):
         try:
             validated_data['timestamp'] = timezone.now()
             validated_data['unit'] = 'mm Hg'
-            return BloodPressure.objects.create(**validated_data)
+            if validated_data.get('client_id'):
+                return upsert_reading(BloodPressure, validated_data)
+            return storage_for(BloodPressure).create(validated_data)
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.error(f"Error creating BloodPressure record: {e}")
@@ -164,8 +182,7 @@ class BloodPressureSerializer(serializers.Serializer):
         try:
             for attr, value in validated_data.items():
                 setattr(instance, attr, value)
-            instance.save()
-            return instance
+            return storage_for(type(instance)).save(instance)
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.error(f"Error updating BloodPressure record: {e}")
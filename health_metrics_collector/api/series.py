@@ -0,0 +1,248 @@
+"""
+Compact per-user reading series for analytics and charts.
+
+A series stores parallel typed arrays (timestamp in ms, value(s), meal code) instead of a
+list of Documents. In the cache it is a single bytes blob: a small header followed by the
+raw column buffers. Readers get numpy views over that blob without copying. Writers append
+new readings to the cached blob without rebuilding it from MongoDB.
+
+Appends are read-modify-write cycles on the cache, so they hold a short per-series lock
+(``cache.add``) and concurrent writers (web processes, ingestion workers) don't lose each
+other's readings. A series rebuilt on a miss is only cached if no append or invalidation
+happened while it was read from MongoDB (both change a per-series generation), so a slow
+rebuild can't replace the cache with a series missing the latest readings. The series are
+only kept up to date by the workers when the cache is shared between processes
+(``CACHE_BACKEND``); with a process-local cache they expire after ``SERIES_LOCAL_TIMEOUT``
+instead.
+"""
+import struct
+import time
+import uuid
+from array import array
+from contextlib import contextmanager
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.core.cache import cache
+
+from .caching import cache_is_shared
+from .models import BloodGlucose, BloodPressure
+from .readers import iter_documents
+from .routing import analytics_read_preference
+
+MEALS = ('pre-meal', 'post-meal', 'fasting', 'before bed')
+MEAL_CODES = {meal: code for code, meal in enumerate(MEALS)}
+NO_MEAL = -1
+MMOL_TO_MGDL = 18.0
+
+SERIES_TIMEOUT = 3600
+# Cache riêng từng process không nhận bản ghi do worker ghi: series chỉ được cũ tối đa chừng này
+SERIES_LOCAL_TIMEOUT = 60
+# Khóa append hết hạn sau SERIES_LOCK_TIMEOUT giây nếu process giữ khóa bị chết
+SERIES_LOCK_TIMEOUT = 2
+_HEADER = struct.Struct('<4sI')  # magic, số bản ghi
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_ms(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+
+class _Series:
+    """Base class: subclasses declare MAGIC and COLUMNS = ((name, typecode, numpy dtype), ...)."""
+    __slots__ = ()
+    MAGIC = None
+    COLUMNS = ()
+
+    def __init__(self):
+        for name, typecode, _ in self.COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp_ms, *values):
+        """Thêm một bản ghi, giữ thứ tự tăng dần theo timestamp."""
+        position = len(self.timestamps)
+        if position and timestamp_ms < self.timestamps[-1]:
+            position = bisect_right(self.timestamps, timestamp_ms)
+        for (name, _, _), value in zip(self.COLUMNS, (timestamp_ms, *values)):
+            column = getattr(self, name)
+            if position == len(column):
+                column.append(value)
+            else:
+                column.insert(position, value)
+
+    def to_bytes(self):
+        parts = [_HEADER.pack(self.MAGIC, len(self))]
+        parts.extend(getattr(self, name).tobytes() for name, _, _ in self.COLUMNS)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """Nạp lại thành array (có copy) để append thêm bản ghi."""
+        series = cls()
+        for name, column in cls.views(buffer).items():
+            getattr(series, name).frombytes(column.tobytes())
+        return series
+
+    @classmethod
+    def views(cls, buffer):
+        """
+        Zero-copy numpy views over a serialized series.
+
+        Returns:
+            dict: Column name to a read-only numpy array backed by ``buffer``.
+        """
+        magic, count = _HEADER.unpack_from(buffer)
+        if magic != cls.MAGIC:
+            raise ValueError(f"Not a {cls.__name__} buffer")
+        offset = _HEADER.size
+        columns = {}
+        for name, _, dtype in cls.COLUMNS:
+            columns[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += count * columns[name].itemsize
+        return columns
+
+
+class GlucoseSeries(_Series):
+    """Blood glucose series: values are normalized to mg/dL, meals stored as MEAL_CODES."""
+    __slots__ = ('timestamps', 'values', 'meals')
+    MAGIC = b'HMG1'
+    COLUMNS = (('timestamps', 'q', '<i8'), ('values', 'd', '<f8'), ('meals', 'b', 'i1'))
+
+    def add_reading(self, reading):
+        value = reading['blood_glucose']
+        if reading.get('unit') == 'mmol/L':
+            value *= MMOL_TO_MGDL
+        self.append(to_epoch_ms(reading['timestamp']), value, MEAL_CODES.get(reading.get('meal'), NO_MEAL))
+
+
+class PressureSeries(_Series):
+    """Blood pressure series: systolic and diastolic in mm Hg."""
+    __slots__ = ('timestamps', 'systolic', 'diastolic')
+    MAGIC = b'HMP1'
+    COLUMNS = (('timestamps', 'q', '<i8'), ('systolic', 'h', '<i2'), ('diastolic', 'h', '<i2'))
+
+    def add_reading(self, reading):
+        self.append(to_epoch_ms(reading['timestamp']), reading['systolic'], reading['diastolic'])
+
+
+# kind -> (document, series class, các field cần đọc)
+SERIES_KINDS = {
+    'glucose': (BloodGlucose, GlucoseSeries, ('timestamp', 'blood_glucose', 'unit', 'meal')),
+    'pressure': (BloodPressure, PressureSeries, ('timestamp', 'systolic', 'diastolic')),
+}
+
+
+def series_cache_key(kind, user_id):
+    return f"{kind}_series_{user_id}"
+
+
+def _series_timeout():
+    return SERIES_TIMEOUT if cache_is_shared() else SERIES_LOCAL_TIMEOUT
+
+
+@contextmanager
+def _series_lock(key):
+    """Khóa ghi của một series trong cache; yield False nếu không lấy được khóa trong SERIES_LOCK_TIMEOUT."""
+    lock_key, token = f"{key}_lock", uuid.uuid4().hex
+    deadline = time.monotonic() + SERIES_LOCK_TIMEOUT
+    acquired = cache.add(lock_key, token, timeout=SERIES_LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.01)
+        acquired = cache.add(lock_key, token, timeout=SERIES_LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def _generation_key(key):
+    return f"{key}_generation"
+
+
+def _bump_generation(key):
+    """Đánh dấu series đã thay đổi: series đang được dựng lại từ MongoDB sẽ không được lưu vào cache."""
+    cache.set(_generation_key(key), uuid.uuid4().hex, timeout=SERIES_TIMEOUT)
+
+
+def build_series(kind, user_id):
+    """Đọc toàn bộ dữ liệu của user (kể cả cold tier) và dựng series đã sắp xếp theo thời gian."""
+    document_cls, series_cls, fields = SERIES_KINDS[kind]
+    series = series_cls()
+    docs = iter_documents(
+        document_cls, user_id, fields,
+        sort=[('timestamp', 1)],
+        read_preference=analytics_read_preference(user_id),
+    )
+    for doc in docs:
+        series.add_reading(doc)
+    return series
+
+
+def load_series(kind, user_id):
+    """
+    Return a user's series as zero-copy numpy column views.
+
+    The serialized series is cached under ``<kind>_series_<user_id>`` and rebuilt from
+    MongoDB on a miss. The rebuilt series is returned but not cached if readings were
+    appended or the series invalidated meanwhile.
+    """
+    _, series_cls, _ = SERIES_KINDS[kind]
+    key = series_cache_key(kind, user_id)
+    buffer = cache.get(key)
+    if buffer is None:
+        generation = cache.get(_generation_key(key))
+        buffer = build_series(kind, user_id).to_bytes()
+        with _series_lock(key) as locked:
+            if locked and cache.get(_generation_key(key)) == generation:
+                cache.add(key, buffer, timeout=_series_timeout())
+    return series_cls.views(buffer)
+
+
+def append_readings(kind, readings, exact=True):
+    """
+    Append newly written readings to the cached series of their users.
+
+    A user without a cached series is skipped: it is built on the next read. With
+    ``exact=False`` (some readings may already have existed, e.g. a resent client_id), or
+    when a reading has no ``timestamp`` to place it at, the cached series are dropped instead
+    so they can't count a reading twice or in the wrong place.
+    """
+    _, series_cls, _ = SERIES_KINDS[kind]
+    by_user = {}
+    for reading in readings:
+        by_user.setdefault(reading['user_id'], []).append(reading)
+
+    for user_id, user_readings in by_user.items():
+        key = series_cache_key(kind, user_id)
+        if not exact or any(reading.get('timestamp') is None for reading in user_readings):
+            invalidate_series(kind, user_id)
+            continue
+        with _series_lock(key) as locked:
+            # Series đang được dựng lại có thể đã đọc MongoDB trước khi các bản ghi này được ghi
+            _bump_generation(key)
+            if not locked:
+                # Process giữ khóa bị treo: bỏ series thay vì ghi đè lên phần nó đang append
+                cache.delete(key)
+                continue
+            buffer = cache.get(key)
+            if buffer is None:
+                continue
+            series = series_cls.from_bytes(buffer)
+            for reading in user_readings:
+                series.add_reading(reading)
+            cache.set(key, series.to_bytes(), timeout=_series_timeout())
+
+
+def invalidate_series(kind, user_id):
+    """Bỏ series đã cache; giữ khóa để một lần append đang chạy không ghi lại series cũ."""
+    key = series_cache_key(kind, user_id)
+    with _series_lock(key):
+        _bump_generation(key)
+        cache.delete(key)
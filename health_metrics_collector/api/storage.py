@@ -0,0 +1,776 @@
+"""
+Physical layout of the reading collections.
+
+``READINGS_STORAGE_MODE`` selects how BloodGlucose/BloodPressure documents are stored:
+
+- ``single`` (default): one collection per document, e.g. ``blood_glucose``.
+- ``monthly``: one collection per document and calendar month (UTC) of ``timestamp``, e.g.
+  ``blood_glucose_2025_01``. Reads with a time range only touch the partitions that
+  overlap it, results from several partitions are merged in sort order, and old months
+  can be archived or dropped one collection at a time.
+- ``timeseries``: a MongoDB time-series collection per document, e.g. ``blood_glucose_ts``,
+  with ``user_id``/``unit`` stored once per bucket instead of once per reading.
+
+Code that reads or writes readings goes through ``storage_for(document_cls)`` instead of
+``document_cls._get_collection()`` or ``document_cls.objects``, so it works with every
+layout. Documents coming out of the storage always have the shape of ``to_mongo()``.
+"""
+import heapq
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import chain
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class PartialWriteError(Exception):
+    """
+    Some documents of an unordered bulk write were refused; all the others are stored.
+
+    Attributes:
+        failed (dict): Index of each refused document in the written list to its MongoDB
+            write error.
+        inserted (int): Number of documents the write stored.
+    """
+
+    def __init__(self, failed, inserted):
+        errors = [f"{err.get('code')}: {err.get('errmsg')}" for err in list(failed.values())[:3]]
+        super().__init__(f"{len(failed)} documents refused ({'; '.join(errors)})")
+        self.failed = failed
+        self.inserted = inserted
+
+
+# Granularity của time-series collection theo tần suất đo: CGM vài phút/lần, huyết áp vài lần/ngày
+TIMESERIES_GRANULARITY = {
+    'blood_glucose': 'minutes',
+    'blood_pressure': 'hours',
+}
+# Danh sách partition được cache trong process, làm mới sau số giây này
+PARTITION_LIST_TTL = 60
+# Version dùng chung (Django cache) của danh sách partition, đổi khi một process tạo/xóa partition
+PARTITION_VERSION_KEY = 'readings_partitions_{}'
+# Time-series: claim client_id chưa được lưu sau số giây này được coi là của writer đã dừng
+CLAIM_LEASE_SECONDS = 60
+
+
+def _naive_utc(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _time_filter(query, start=None, end=None):
+    if start is None and end is None:
+        return query
+    bounds = {}
+    if start is not None:
+        bounds['$gte'] = start
+    if end is not None:
+        bounds['$lt'] = end
+    return {**query, 'timestamp': bounds}
+
+
+def _merge_sorted(iterables, sort):
+    """Gộp các kết quả đã sắp xếp của từng partition thành một dòng theo cùng thứ tự."""
+    if len(iterables) == 1:
+        return iterables[0]
+    if not sort:
+        return chain.from_iterable(iterables)
+    field, direction = sort[0]
+    return heapq.merge(*iterables, key=lambda doc: doc[field], reverse=direction < 0)
+
+
+def _object_id(document_cls, pk):
+    try:
+        return ObjectId(pk)
+    except (InvalidId, TypeError):
+        raise document_cls.DoesNotExist(f"Invalid id {pk!r}")
+
+
+class SingleCollectionStorage:
+    """
+    Default layout: all readings of a document class in its own collection.
+
+    ``base_name`` replaces the collection name of the document, e.g. to benchmark a layout
+    on scratch collections. The Document-level methods of this layout (``get``, ``create``,
+    ``save``, ``delete``) always use the document's own collection.
+    """
+
+    mode = 'single'
+
+    def __init__(self, document_cls, base_name=None):
+        self.document_cls = document_cls
+        self.base_name = base_name or document_cls._get_collection_name()
+        self._lock = threading.Lock()
+        self._indexed = set()
+
+    def _db(self):
+        return self.document_cls._get_db()
+
+    def _collection(self, name):
+        """Collection ``name``, được tạo cùng các index ở lần dùng đầu tiên trong process."""
+        if name == self.document_cls._get_collection_name():
+            return self.document_cls._get_collection()
+        collection = self._db()[name]
+        if name not in self._indexed:
+            self._create_collection(collection)
+            with self._lock:
+                self._indexed.add(name)
+        return collection
+
+    def _create_collection(self, collection):
+        """Tạo các index khai báo trong meta của Document (không làm gì nếu đã có)."""
+        for spec in self.document_cls._meta['index_specs']:
+            spec = dict(spec)
+            fields = spec.pop('fields')
+            collection.create_index(fields, **spec)
+
+    # Bố cục vật lý
+
+    def collections(self, start=None, end=None, read_preference=None):
+        """Collections holding readings with ``start <= timestamp < end``, oldest first."""
+        collection = self._collection(self.base_name)
+        if read_preference is not None:
+            collection = collection.with_options(read_preference=read_preference)
+        return [collection]
+
+    def collection_for(self, timestamp):
+        """Collection a reading taken at ``timestamp`` is written to."""
+        return self._collection(self.base_name)
+
+    def discard_if_empty(self, collection):
+        """Drop a collection emptied by archiving, when the layout allows it."""
+
+    def drop(self):
+        """Xóa mọi collection của layout (dữ liệu nguồn sau khi migrate)."""
+        for collection in self.collections():
+            collection.drop()
+
+    def release_claims(self, ids=None, user_id=None):
+        """Sau khi xóa bản ghi trực tiếp trên collection: cho phép ghi lại client_id của chúng (chỉ layout timeseries)."""
+
+    def count(self):
+        """Số bản ghi (ước lượng theo metadata) trên mọi collection của layout."""
+        return sum(collection.estimated_document_count() for collection in self.collections())
+
+    # Chuyển đổi giữa dạng lưu trữ và dạng to_mongo(); các layout khác có thể override
+
+    def field(self, name):
+        """Path of a document field in the stored documents."""
+        return name
+
+    def to_storage(self, doc):
+        return doc
+
+    def from_storage(self, doc):
+        return doc
+
+    def translate_filter(self, query):
+        return query
+
+    def translate_projection(self, projection):
+        return projection
+
+    # Đọc
+
+    def find(self, query, projection=None, sort=None, start=None, end=None, read_preference=None, batch_size=None):
+        """
+        Find readings across the collections of the layout.
+
+        Args:
+            query (dict): Filter on document fields, e.g. ``{'user_id': 1}``.
+            projection (dict, optional): Fields to return.
+            sort (list, optional): ``[(field, direction)]``. Only the first key is used to
+                merge partitions; the sort field must be in the projection.
+            start, end (datetime, optional): ``start <= timestamp < end``. Used to skip
+                partitions outside the range.
+            read_preference (optional): pymongo read preference.
+            batch_size (int, optional): Cursor batch size.
+
+        Returns:
+            iterable: Documents shaped like ``to_mongo()``.
+        """
+        query = self.translate_filter(_time_filter(query, start, end))
+        projection = self.translate_projection(projection)
+        results = []
+        for collection in self.collections(start, end, read_preference):
+            cursor = collection.find(query, projection)
+            if batch_size:
+                cursor = cursor.batch_size(batch_size)
+            if sort:
+                cursor = cursor.sort([(self.field(name), direction) for name, direction in sort])
+            results.append(map(self.from_storage, cursor))
+        return _merge_sorted(results, sort)
+
+    def distinct(self, field, query):
+        values = set()
+        for collection in self.collections():
+            values.update(collection.distinct(self.field(field), self.translate_filter(query)))
+        return values
+
+    def get(self, pk, user_id):
+        """
+        The reading ``pk`` of ``user_id`` as a Document.
+
+        Raises:
+            DoesNotExist: If there is no such reading.
+        """
+        return self.document_cls.objects.get(id=pk, user_id=user_id)
+
+    # Ghi
+
+    def create(self, data):
+        """Lưu một bản ghi mới từ dữ liệu đã validate, trả về Document."""
+        return self.document_cls.objects.create(**data)
+
+    def save(self, instance):
+        instance.save()
+        return instance
+
+    def delete(self, instance):
+        instance.delete()
+
+    def delete_many(self, query):
+        """Delete matching readings in every collection. Returns the number deleted."""
+        deleted = 0
+        for collection in self.collections():
+            deleted += collection.delete_many(self.translate_filter(query)).deleted_count
+        return deleted
+
+    def _group_by_collection(self, docs):
+        """(collection, document đã chuyển sang dạng lưu trữ, index trong ``docs``) theo từng collection."""
+        groups = {}
+        for index, doc in enumerate(docs):
+            collection = self.collection_for(doc['timestamp'])
+            group = groups.setdefault(collection.name, (collection, [], []))
+            group[1].append(self.to_storage(doc))
+            group[2].append(index)
+        return groups.values()
+
+    def insert_many(self, docs):
+        """
+        Insert raw documents with unordered ``insert_many``, skipping duplicates.
+
+        Returns:
+            tuple: ``(inserted, duplicates)``.
+        """
+        inserted = duplicates = 0
+        for collection, group, _ in self._group_by_collection(docs):
+            try:
+                inserted += len(collection.insert_many(group, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                if any(err['code'] != DUPLICATE_KEY_ERROR for err in e.details['writeErrors']):
+                    raise
+                inserted += e.details['nInserted']
+                duplicates += len(e.details['writeErrors'])
+        return inserted, duplicates
+
+    def _write_op(self, doc):
+        client_id = doc.get('client_id')
+        if not client_id:
+            return InsertOne(doc)
+        # $setOnInsert: gửi lại cùng client_id không tạo bản ghi mới và không ghi đè dữ liệu cũ
+        return UpdateOne(
+            {'user_id': doc['user_id'], 'client_id': client_id},
+            {'$setOnInsert': doc},
+            upsert=True,
+        )
+
+    def upsert_many(self, docs):
+        """
+        Write raw documents with one unordered bulk write per collection, upserting on
+        ``(user_id, client_id)`` when the document has a ``client_id``.
+
+        Returns:
+            dict: ``inserted`` and ``duplicates`` counts.
+
+        Raises:
+            PartialWriteError: MongoDB refused some documents. The write is unordered, so every
+                other document (in every collection) is stored: only the refused ones may be
+                written again.
+        """
+        inserted, failed = 0, {}
+        for collection, group, indices in self._group_by_collection(docs):
+            try:
+                details = collection.bulk_write([self._write_op(doc) for doc in group], ordered=False).bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for err in details['writeErrors']:
+                    # Hai request upsert cùng client_id song song có thể đụng unique index: bản ghi đã tồn tại
+                    if err['code'] != DUPLICATE_KEY_ERROR:
+                        failed[indices[err['index']]] = err
+            inserted += details['nInserted'] + details['nUpserted']
+        if failed:
+            raise PartialWriteError(failed, inserted)
+        return {'inserted': inserted, 'duplicates': len(docs) - inserted}
+
+    def upsert_one(self, doc):
+        """Upsert một document có client_id, trả về document đã lưu (bản ghi cũ nếu đã tồn tại)."""
+        raw = self.collection_for(doc['timestamp']).find_one_and_update(
+            self.translate_filter({'user_id': doc['user_id'], 'client_id': doc['client_id']}),
+            {'$setOnInsert': self.to_storage(doc)},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return self.from_storage(raw)
+
+
+class MonthlyPartitionStorage(SingleCollectionStorage):
+    """
+    One collection per calendar month of ``timestamp``: ``<collection>_<YYYY>_<MM>``.
+
+    The list of partitions is cached in the process. A process that creates or drops a
+    partition changes a version shared through the Django cache, so the others list again
+    on their next read instead of waiting for ``PARTITION_LIST_TTL``. Reads always include
+    the current month, where new readings are written, and ``get`` lists again before
+    reporting a missing reading.
+
+    The unique ``(user_id, client_id)`` index only covers one partition. A resent reading
+    stamped with the time of the request may fall in the next month, so upserts first look
+    the ``client_id`` up in every partition.
+    """
+
+    mode = 'monthly'
+
+    def __init__(self, document_cls, base_name=None):
+        super().__init__(document_cls, base_name)
+        self._pattern = re.compile(rf'^{re.escape(self.base_name)}_(\d{{4}})_(\d{{2}})$')
+        self._months = None
+        self._listed_at = 0
+        self._version = None
+        self._version_key = PARTITION_VERSION_KEY.format(self.base_name)
+
+    def partition_name(self, timestamp):
+        return f"{self.base_name}_{_naive_utc(timestamp):%Y_%m}"
+
+    def months(self, refresh=False):
+        """Các tháng đã có partition (datetime đầu tháng), tăng dần; ``refresh`` bỏ qua cache."""
+        # Đọc version trước khi list: partition tạo sau lần list này sẽ đổi version lần nữa
+        version = cache.get(self._version_key)
+        with self._lock:
+            stale = time.monotonic() - self._listed_at > PARTITION_LIST_TTL
+            if refresh or self._months is None or stale or version != self._version:
+                months = []
+                for name in self._db().list_collection_names():
+                    match = self._pattern.match(name)
+                    if match:
+                        months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+                self._months = sorted(months)
+                self._listed_at = time.monotonic()
+                self._version = version
+            return list(self._months)
+
+    def _changed_partitions(self):
+        """Báo cho các process khác danh sách partition đã thay đổi."""
+        cache.set(self._version_key, uuid.uuid4().hex, timeout=None)
+
+    def collections(self, start=None, end=None, read_preference=None):
+        start = _naive_utc(start) if start is not None else None
+        end = _naive_utc(end) if end is not None else None
+        # Partition tháng hiện tại có thể vừa được process khác tạo: luôn đọc
+        current = _naive_utc(timezone.now()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        selected = []
+        for month in sorted({*self.months(), current}):
+            next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+            # Bỏ qua partition nằm ngoài khoảng thời gian cần đọc
+            if (start is not None and next_month <= start) or (end is not None and month >= end):
+                continue
+            collection = self._db()[self.partition_name(month)]
+            if read_preference is not None:
+                collection = collection.with_options(read_preference=read_preference)
+            selected.append(collection)
+        return selected
+
+    def collection_for(self, timestamp):
+        return self._collection(self.partition_name(timestamp))
+
+    def _create_collection(self, collection):
+        super()._create_collection(collection)
+        if self._pattern.match(collection.name):
+            self._months = None  # có thể là partition mới
+            self._changed_partitions()
+
+    def discard_if_empty(self, collection):
+        if self._pattern.match(collection.name) and collection.estimated_document_count() == 0:
+            collection.drop()
+            with self._lock:
+                self._indexed.discard(collection.name)
+                self._months = None
+            self._changed_partitions()
+
+    def _stored_client_ids(self, docs):
+        """Các cặp (user_id, client_id) của ``docs`` đã được lưu ở bất kỳ partition nào."""
+        pairs = {(doc['user_id'], doc['client_id']) for doc in docs if doc.get('client_id')}
+        if not pairs:
+            return set()
+        query = {
+            'user_id': {'$in': sorted({user_id for user_id, _ in pairs})},
+            'client_id': {'$in': sorted({client_id for _, client_id in pairs})},
+        }
+        stored = set()
+        for collection in self.collections():
+            for raw in collection.find(query, {'user_id': 1, 'client_id': 1}):
+                stored.add((raw['user_id'], raw['client_id']))
+        return stored & pairs
+
+    def upsert_many(self, docs):
+        stored = self._stored_client_ids(docs)
+        if not stored:
+            return super().upsert_many(docs)
+        # Bản ghi đã lưu ở partition khác được tính là trùng
+        kept = [index for index, doc in enumerate(docs) if (doc['user_id'], doc.get('client_id')) not in stored]
+        try:
+            result = super().upsert_many([docs[index] for index in kept])
+        except PartialWriteError as e:
+            raise PartialWriteError({kept[index]: err for index, err in e.failed.items()}, e.inserted)
+        return {'inserted': result['inserted'], 'duplicates': len(docs) - result['inserted']}
+
+    def upsert_one(self, doc):
+        query = {'user_id': doc['user_id'], 'client_id': doc['client_id']}
+        for collection in reversed(self.collections()):
+            raw = collection.find_one(query)
+            if raw is not None:
+                return self.from_storage(raw)
+        return super().upsert_one(doc)
+
+    def get(self, pk, user_id):
+        object_id = _object_id(self.document_cls, pk)
+        # Bản ghi thường nằm ở partition của thời điểm tạo _id: thử partition đó trước
+        likely = self.partition_name(object_id.generation_time)
+        searched = set()
+        # Không thấy thì list lại partition một lần: có thể nằm ở partition process khác vừa tạo
+        for refresh in (False, True):
+            names = [self.partition_name(month) for month in self.months(refresh=refresh)]
+            for name in sorted({likely, *names} - searched, key=lambda name: name != likely):
+                searched.add(name)
+                raw = self._db()[name].find_one({'_id': object_id, 'user_id': user_id})
+                if raw is not None:
+                    return self.document_cls._from_son(raw)
+        raise self.document_cls.DoesNotExist(f"{self.document_cls.__name__} {pk} not found")
+
+    def create(self, data):
+        instance = self.document_cls(**data)
+        return self.save(instance)
+
+    def save(self, instance):
+        instance.switch_collection(self.collection_for(instance.timestamp).name)
+        instance.save()
+        return instance
+
+    def delete(self, instance):
+        self.collection_for(instance.timestamp).delete_one({'_id': instance.id})
+
+
+class TimeSeriesStorage(SingleCollectionStorage):
+    """
+    A MongoDB time-series collection ``<collection>_ts`` (MongoDB 7.0+).
+
+    ``timestamp`` is the timeField and ``{user_id, unit}`` the metaField ``meta``, so MongoDB
+    groups the readings of a user into compressed buckets instead of storing a full document
+    per reading. Filters, projections and sorts on ``user_id``/``unit`` are rewritten to
+    ``meta.*`` and documents are flattened back to the ``to_mongo()`` shape when read.
+
+    Time-series collections have no unique indexes. Readings with an ``_id`` or a
+    ``client_id`` already stored are skipped by a lookup before each insert, and each
+    ``(user_id, client_id)`` is then claimed in ``<collection>_ts_claims``, an ordinary
+    collection with a unique index on it: only the writer that inserted the claim stores the
+    reading, so concurrent or retried writes of a ``client_id`` store it once. A claim whose
+    reading is not stored after ``CLAIM_LEASE_SECONDS`` (the writer stopped in between) is
+    taken over by the next writer of that ``client_id``.
+    """
+
+    mode = 'timeseries'
+    META_FIELDS = ('user_id', 'unit')
+
+    def __init__(self, document_cls, base_name=None):
+        super().__init__(document_cls, base_name)
+        self.name = f"{self.base_name}_ts"
+        self.granularity = TIMESERIES_GRANULARITY.get(document_cls._get_collection_name(), 'minutes')
+
+    def _create_collection(self, collection):
+        try:
+            self._db().create_collection(collection.name, timeseries={
+                'timeField': 'timestamp',
+                'metaField': 'meta',
+                'granularity': self.granularity,
+            })
+        except CollectionInvalid:
+            pass  # đã tồn tại
+        # Unique index không được hỗ trợ: index giống Document nhưng không unique
+        for spec in self.document_cls._meta['index_specs']:
+            collection.create_index([(self.field(name), direction) for name, direction in spec['fields']])
+
+    def collections(self, start=None, end=None, read_preference=None):
+        collection = self.collection_for(None)
+        if read_preference is not None:
+            collection = collection.with_options(read_preference=read_preference)
+        return [collection]
+
+    def collection_for(self, timestamp):
+        return self._collection(self.name)
+
+    def count(self):
+        # estimated_document_count không dùng được trên time-series collection
+        return sum(collection.count_documents({}) for collection in self.collections())
+
+    def field(self, name):
+        return f'meta.{name}' if name in self.META_FIELDS else name
+
+    def to_storage(self, doc):
+        doc = dict(doc)
+        doc['meta'] = {name: doc.pop(name) for name in self.META_FIELDS if name in doc}
+        return doc
+
+    def from_storage(self, doc):
+        doc.update(doc.pop('meta', None) or {})
+        return doc
+
+    def translate_filter(self, query):
+        translated = {}
+        for key, value in query.items():
+            if key in ('$and', '$or', '$nor'):
+                value = [self.translate_filter(clause) for clause in value]
+            translated[self.field(key)] = value
+        return translated
+
+    def translate_projection(self, projection):
+        if projection is None:
+            return None
+        return {self.field(name): value for name, value in projection.items()}
+
+    def get(self, pk, user_id):
+        raw = self.collection_for(None).find_one({'_id': _object_id(self.document_cls, pk), 'meta.user_id': user_id})
+        if raw is None:
+            raise self.document_cls.DoesNotExist(f"{self.document_cls.__name__} {pk} not found")
+        return self.document_cls._from_son(self.from_storage(raw))
+
+    def create(self, data):
+        instance = self.document_cls(**data)
+        instance.validate()
+        doc = self.to_storage(instance.to_mongo().to_dict())
+        instance.id = self.collection_for(instance.timestamp).insert_one(doc).inserted_id
+        return instance
+
+    def save(self, instance):
+        # Giống TrackedDocumentMixin.save; timestamp (timeField) không bao giờ được cập nhật
+        instance.updated_at = timezone.now()
+        instance.validate()
+        doc = self.to_storage(instance.to_mongo().to_dict())
+        for name in ('_id', 'timestamp'):
+            doc.pop(name, None)
+        self.collection_for(instance.timestamp).update_one({'_id': instance.id}, {'$set': doc})
+        return instance
+
+    def delete(self, instance):
+        self.collection_for(instance.timestamp).delete_one({'_id': instance.id})
+        self.release_claims(ids=[instance.id])
+
+    def delete_many(self, query):
+        collection = self.collection_for(None)
+        ids = [raw['_id'] for raw in collection.find(self.translate_filter(query), {'_id': 1})]
+        deleted = collection.delete_many({'_id': {'$in': ids}}).deleted_count if ids else 0
+        self.release_claims(ids=ids)
+        return deleted
+
+    def drop(self):
+        super().drop()
+        self._db()[f"{self.name}_claims"].drop()
+        with self._lock:
+            self._indexed.clear()
+
+    def release_claims(self, ids=None, user_id=None):
+        # Claim có _id của bản ghi: giống unique index ở các layout khác, client_id của bản ghi đã xóa được ghi lại
+        query = {'_id': {'$in': list(ids)}} if ids is not None else {'user_id': user_id}
+        if ids is None or ids:
+            self._claims().delete_many(query)
+
+    def _claims(self):
+        """Collection thường với unique index (user_id, client_id), tạo ở lần dùng đầu tiên trong process."""
+        name = f"{self.name}_claims"
+        collection = self._db()[name]
+        if name not in self._indexed:
+            collection.create_index([('user_id', 1), ('client_id', 1)], unique=True)
+            with self._lock:
+                self._indexed.add(name)
+        return collection
+
+    def _new_documents(self, collection, docs):
+        """(index, document) chưa được lưu (khác _id và user_id + client_id đã có), kể cả trùng trong lô."""
+        ids = [doc['_id'] for doc in docs if '_id' in doc]
+        seen_ids = {raw['_id'] for raw in collection.find({'_id': {'$in': ids}}, {'_id': 1})} if ids else set()
+
+        client_ids = {}
+        for doc in docs:
+            if doc.get('client_id'):
+                client_ids.setdefault(doc['user_id'], set()).add(doc['client_id'])
+        seen_clients = set()
+        if client_ids:
+            query = {'$or': [
+                {'meta.user_id': user_id, 'client_id': {'$in': sorted(values)}}
+                for user_id, values in client_ids.items()
+            ]}
+            for raw in collection.find(query, {'meta.user_id': 1, 'client_id': 1}):
+                seen_clients.add((raw['meta']['user_id'], raw['client_id']))
+
+        new = []
+        for index, doc in enumerate(docs):
+            client_key = (doc['user_id'], doc.get('client_id'))
+            if doc.get('_id') in seen_ids or (client_key[1] and client_key in seen_clients):
+                continue
+            if '_id' in doc:
+                seen_ids.add(doc['_id'])
+            if client_key[1]:
+                seen_clients.add(client_key)
+            new.append((index, doc))
+        return new
+
+    def _claim(self, pending):
+        """
+        Claim the ``(user_id, client_id)`` of each ``(index, document)`` of ``pending``.
+
+        Returns:
+            list: The ``(index, document)`` pairs this writer must insert, with the document's
+            ``_id`` set to the ``_id`` of its claim. The others are stored, or being stored, by
+            another writer.
+        """
+        if not pending:
+            return []
+        now = timezone.now()
+        pending = [(index, dict(doc, _id=doc.get('_id') or ObjectId())) for index, doc in pending]
+        lost = set()
+        try:
+            self._claims().insert_many([
+                {'_id': doc['_id'], 'user_id': doc['user_id'], 'client_id': doc['client_id'],
+                 'stored': False, 'claimed_at': now}
+                for _, doc in pending
+            ], ordered=False)
+        except BulkWriteError as e:
+            for err in e.details['writeErrors']:
+                if err['code'] != DUPLICATE_KEY_ERROR:
+                    raise
+                lost.add(err['index'])
+
+        claimed = []
+        for position, (index, doc) in enumerate(pending):
+            if position not in lost:
+                claimed.append((index, doc))
+                continue
+            doc = self._take_over(doc, now)
+            if doc is not None:
+                claimed.append((index, doc))
+        return claimed
+
+    def _take_over(self, doc, now):
+        """Lấy claim của writer đã dừng giữa claim và insert; None nếu claim vẫn còn hiệu lực hoặc đã lưu."""
+        claim = self._claims().find_one_and_update(
+            {'user_id': doc['user_id'], 'client_id': doc['client_id'], 'stored': False,
+             'claimed_at': {'$lt': now - timedelta(seconds=CLAIM_LEASE_SECONDS)}},
+            {'$set': {'claimed_at': now}},
+        )
+        if claim is None:
+            return None
+        # Writer trước có thể đã insert nhưng chưa kịp đánh dấu claim
+        if self.collection_for(None).find_one({'_id': claim['_id']}, {'_id': 1}) is not None:
+            self._claims().update_one({'_id': claim['_id']}, {'$set': {'stored': True}})
+            return None
+        return dict(doc, _id=claim['_id'])
+
+    def _store(self, docs):
+        """
+        Insert the documents of ``docs`` not stored yet, claiming each ``client_id`` first.
+
+        Returns:
+            tuple: ``(inserted, failed, error)``. ``failed`` maps the index in ``docs`` of each
+            document MongoDB refused to its write error, ``error`` is the BulkWriteError (or None).
+        """
+        collection = self.collection_for(None)
+        new = self._new_documents(collection, docs)
+        pending = sorted(
+            [(index, doc) for index, doc in new if not doc.get('client_id')]
+            + self._claim([(index, doc) for index, doc in new if doc.get('client_id')]),
+            key=lambda item: item[0],
+        )
+        if not pending:
+            return 0, {}, None
+
+        failed, error = {}, None
+        try:
+            collection.insert_many([self.to_storage(doc) for _, doc in pending], ordered=False)
+        except BulkWriteError as e:
+            error = e
+            failed = {pending[err['index']][0]: err for err in e.details['writeErrors']}
+        claims = [(index, doc['_id']) for index, doc in pending if doc.get('client_id')]
+        stored = [claim_id for index, claim_id in claims if index not in failed]
+        refused = [claim_id for index, claim_id in claims if index in failed]
+        if stored:
+            self._claims().update_many({'_id': {'$in': stored}}, {'$set': {'stored': True}})
+        if refused:
+            # Bản ghi bị từ chối được phép ghi lại (sửa dữ liệu rồi gửi lại cùng client_id)
+            self._claims().delete_many({'_id': {'$in': refused}, 'stored': False})
+        return len(pending) - len(failed), failed, error
+
+    def insert_many(self, docs):
+        inserted, _, error = self._store(docs)
+        if error is not None:
+            raise error
+        return inserted, len(docs) - inserted
+
+    def upsert_many(self, docs):
+        inserted, failed, _ = self._store(docs)
+        if failed:
+            raise PartialWriteError(failed, inserted)
+        return {'inserted': inserted, 'duplicates': len(docs) - inserted}
+
+    def upsert_one(self, doc):
+        collection = self.collection_for(doc['timestamp'])
+        query = {'meta.user_id': doc['user_id'], 'client_id': doc['client_id']}
+        deadline = time.monotonic() + CLAIM_LEASE_SECONDS
+        while True:
+            raw = collection.find_one(query)
+            if raw is not None:
+                return self.from_storage(raw)
+            claimed = self._claim([(0, doc)])
+            if claimed:
+                raw = self.to_storage(claimed[0][1])
+                try:
+                    collection.insert_one(raw)
+                except Exception:
+                    self._claims().delete_one({'_id': raw['_id'], 'stored': False})
+                    raise
+                self._claims().update_one({'_id': raw['_id']}, {'$set': {'stored': True}})
+                return self.from_storage(raw)
+            # Writer khác đang ghi cùng client_id: chờ bản ghi của nó
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{self.document_cls.__name__} client_id {doc['client_id']} is still being written")
+            time.sleep(0.05)
+
+
+STORAGE_MODES = {
+    'single': SingleCollectionStorage,
+    'monthly': MonthlyPartitionStorage,
+    'timeseries': TimeSeriesStorage,
+}
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def storage_for(document_cls, mode=None):
+    """Storage của document theo ``READINGS_STORAGE_MODE`` (hoặc ``mode`` nếu truyền vào)."""
+    mode = mode or settings.READINGS_STORAGE_MODE
+    key = (document_cls, mode)
+    with _storages_lock:
+        if key not in _storages:
+            _storages[key] = STORAGE_MODES[mode](document_cls)
+        return _storages[key]
@@ -0,0 +1,177 @@
+import heapq
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .archive import iter_documents as iter_archived
+from .models import BloodGlucose, BloodPressure, ReadingTombstone
+from .readers import GLUCOSE_FIELDS, PRESSURE_FIELDS, serialize_rows
+from .series import to_epoch_ms
+from .storage import storage_for
+
+# kind: (Document, field trả về)
+KINDS = {
+    'glucose': (BloodGlucose, GLUCOSE_FIELDS),
+    'pressure': (BloodPressure, PRESSURE_FIELDS),
+}
+CURSOR_PREFIX = 'snapshot'
+# Vị trí của loại đã gửi hết trong cursor
+DONE = 'done'
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(moment):
+    """Sync token là số millisecond (UTC) của thời điểm đồng bộ"""
+    return str(int(moment.timestamp() * 1000))
+
+
+def decode_token(token):
+    try:
+        return datetime.fromtimestamp(int(token) / 1000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise InvalidSyncToken(f"Invalid sync token: {token!r}")
+
+
+def encode_cursor(token, positions):
+    """Cursor của trang tiếp theo: token sẽ trả về khi xong và timestamp (ms) cuối cùng đã gửi của mỗi loại."""
+    return ':'.join([CURSOR_PREFIX, token, *(str(positions[kind]) for kind in KINDS)])
+
+
+def decode_cursor(cursor):
+    parts = str(cursor).split(':')
+    try:
+        if len(parts) != len(KINDS) + 2 or parts[0] != CURSOR_PREFIX:
+            raise ValueError(cursor)
+        decode_token(parts[1])
+        positions = {kind: value if value == DONE else int(value) for kind, value in zip(KINDS, parts[2:])}
+    except (InvalidSyncToken, ValueError):
+        raise InvalidSyncToken(f"Invalid sync cursor: {cursor!r}")
+    return parts[1], positions
+
+
+def record_deletion(kind, instance):
+    """Lưu tombstone khi xóa một bản ghi để client sync biết bản ghi đã bị xóa."""
+    ReadingTombstone(user_id=instance.user_id, kind=kind, reading_id=str(instance.id)).save()
+
+
+def _changed_rows(document_cls, fields, query):
+    """Các bản ghi khớp query ở dạng đã serialize, đọc qua storage nên đúng với mọi bố cục."""
+    projection = {name: 1 for name, _ in fields}
+    return serialize_rows(storage_for(document_cls).find(query, projection), fields)
+
+
+def _snapshot_documents(document_cls, fields, user_id, start, batch_size):
+    """
+    A user's readings from ``start`` (naive UTC) in timestamp order: MongoDB, read on the
+    ``(user_id, timestamp)`` index, merged with the archived readings of the cold tier.
+    """
+    names = [name for name, _ in fields]
+    hot = storage_for(document_cls).find(
+        {'user_id': user_id}, dict.fromkeys(names, 1), sort=[('timestamp', 1)], start=start, batch_size=batch_size,
+    )
+    cold = iter_archived(document_cls, user_id, start, columns=['_id', *names])
+    return heapq.merge(cold, hot, key=lambda doc: doc['timestamp'])
+
+
+def _snapshot_page(document_cls, fields, user_id, after_ms, limit):
+    """
+    One page of a user's readings (MongoDB and archive) in timestamp order.
+
+    Readings sharing the timestamp of the last one are all included, so a page boundary never
+    splits a timestamp and the next page can start strictly after it. The position is a
+    timestamp, so it applies to both tiers.
+
+    Returns:
+        tuple: ``(rows, position)``. ``position`` is the timestamp (ms) of the last row, or
+        ``DONE`` if there are no more readings.
+    """
+    start = None if after_ms is None else datetime(1970, 1, 1) + timedelta(milliseconds=after_ms)
+    page, last, ids = [], None, set()
+    for doc in _snapshot_documents(document_cls, fields, user_id, start, limit + 1):
+        moment = to_epoch_ms(doc['timestamp'])
+        if after_ms is not None and moment <= after_ms:
+            continue  # start lấy cả timestamp bằng after_ms, đã được gửi ở trang trước
+        if moment != last:
+            if len(page) >= limit:
+                return serialize_rows(page, fields), last
+            last, ids = moment, set()
+        # Bản ghi đang được lưu trữ có thể nằm ở cả file Parquet lẫn MongoDB
+        if str(doc['_id']) in ids:
+            continue
+        ids.add(str(doc['_id']))
+        page.append(doc)
+    return serialize_rows(page, fields), DONE
+
+
+def _snapshot(user_id, token, positions, reset):
+    """Một trang của toàn bộ dữ liệu; next_token chỉ được trả về ở trang cuối."""
+    changes = {'deleted': {kind: [] for kind in KINDS}, 'reset': reset}
+    for kind, (document_cls, fields) in KINDS.items():
+        if positions[kind] == DONE:
+            changes[kind] = []
+            continue
+        changes[kind], positions[kind] = _snapshot_page(
+            document_cls, fields, user_id, positions[kind], settings.SYNC_PAGE_SIZE,
+        )
+    done = all(position == DONE for position in positions.values())
+    changes['next_token'] = token if done else None
+    changes['next_cursor'] = None if done else encode_cursor(token, positions)
+    return changes
+
+
+def collect_changes(user_id, token=None, cursor=None):
+    """
+    Return the readings created, updated or deleted for a user since a sync token.
+
+    Without a token, or with one older than the tombstone retention, the full current state
+    is returned with ``reset`` set so the client replaces its local copy, including the
+    readings moved to the cold-tier archive. That snapshot is
+    paged: at most ``SYNC_PAGE_SIZE`` readings of each kind per response, in timestamp order.
+    While ``next_cursor`` is set the client requests it and appends the page (``reset`` is
+    only set on the first page); ``next_token`` is returned with the last page. Changes made
+    while paging have a later ``updated_at`` than that token and come with the next sync.
+
+    Args:
+        user_id (int): The user to sync.
+        token (str, optional): The ``next_token`` returned by the previous sync.
+        cursor (str, optional): The ``next_cursor`` of the previous snapshot page.
+
+    Returns:
+        dict: Changed readings per kind, deleted ids per kind, ``next_token``, ``next_cursor``
+        and ``reset``.
+
+    Raises:
+        InvalidSyncToken: If the token or the cursor cannot be decoded.
+    """
+    if cursor:
+        token, positions = decode_cursor(cursor)
+        return _snapshot(user_id, token, positions, reset=False)
+
+    now = timezone.now()
+    since = decode_token(token) if token else None
+    retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    reset = since is None or since < now - retention
+
+    # Lùi token một khoảng nhỏ: bản ghi ghi dở lúc truy vấn sẽ được gửi lại ở lần sync sau
+    next_token = encode_token(now - timedelta(seconds=settings.SYNC_TOKEN_OVERLAP_SECONDS))
+    if reset:
+        return _snapshot(user_id, next_token, {kind: None for kind in KINDS}, reset=True)
+
+    # Dùng index (user_id, updated_at): chi phí theo số bản ghi thay đổi, không theo lịch sử
+    query = {'user_id': user_id, 'updated_at': {'$gt': since}}
+    deleted = {kind: [] for kind in KINDS}
+    tombstones = ReadingTombstone.objects.filter(user_id=user_id, deleted_at__gt=since).only('kind', 'reading_id')
+    for tombstone in tombstones:
+        deleted[tombstone.kind].append(tombstone.reading_id)
+
+    return {
+        **{kind: _changed_rows(document_cls, fields, query) for kind, (document_cls, fields) in KINDS.items()},
+        'deleted': deleted,
+        'next_token': next_token,
+        'next_cursor': None,
+        'reset': False,
+    }
@@ -2,71 +2,341 @@ from celery import shared_task
 from celery.exceptions import Reject
 
 import logging
+import time
 
 from mongoengine import DoesNotExist
 from datetime import datetime
+from pymongo.errors import ConnectionFailure
 
-from .models import BloodPressure, BloodGlucose
+from .models import BloodPressure, BloodGlucose, GlucoseForecast, ReadingTombstone, UserPurgeJob
+from .bulk import upsert_readings
+from .caching import cache_is_shared
+from .series import append_readings, invalidate_series, load_series
+from .forecast import rebuild_forecast, update_forecasts
+from .archive import archive_cold_readings, delete_user_archive
+from .storage import PartialWriteError, storage_for
+from .queues import INGESTION_QUEUE, dead_letter_queue, retry_delay, retry_queue
+from .warming import warm
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 
+# Lỗi kết nối MongoDB là tạm thời: cả batch được thử lại sau. Lỗi khác do chính dữ liệu gây ra.
+TRANSIENT_ERRORS = (ConnectionFailure,)
+
+
+def _timestamp(data, now):
+    return datetime.fromisoformat(data["timestamp"]) if data.get("timestamp") else now
+
+
+def _pressure_record(data, now):
+    return {
+        "user_id": int(data["user_id"]),
+        "systolic": int(data["systolic"]),
+        "diastolic": int(data["diastolic"]),
+        "timestamp": _timestamp(data, now),
+        "unit": "mm Hg",
+        "client_id": data.get("client_id"),
+    }
+
+
+def _glucose_record(data, now):
+    return {
+        "user_id": int(data["user_id"]),
+        "blood_glucose": float(data["blood_glucose"]),
+        "meal": data["meal"],
+        "timestamp": _timestamp(data, now),
+        "unit": data.get("unit", "mg/dL"),
+        "client_id": data.get("client_id"),
+    }
+
+
+def _written(kind, records, duplicates):
+    """Cập nhật series và dự báo sau khi ``records`` đã được lưu."""
+    append_readings(kind, records, exact=not duplicates)
+    if kind == "glucose":
+        update_forecasts(records)
+
+
+def _reject(rejected, row, record, e):
+    # Giữ thời điểm đã gán để replay không đổi timestamp của bản ghi
+    rejected.append((dict(row[0], timestamp=record["timestamp"].isoformat()), e))
+
+
+def _write_isolating(kind, document_cls, rows, rejected):
+    """
+    Ghi các dòng ``(data, record)``; dòng bị MongoDB từ chối được thử lại riêng (rồi thêm vào
+    ``rejected``) để các dòng còn lại vẫn được ghi.
+
+    Bulk write không theo thứ tự: khi MongoDB báo lỗi theo từng dòng (PartialWriteError), các
+    dòng khác đã được lưu nên chỉ các dòng lỗi được gửi lại; dòng không có client_id là insert
+    thường, gửi lại sẽ tạo bản ghi trùng. Chỉ lỗi không gắn với dòng nào mới phải chia đôi batch.
+    """
+    if not rows:
+        return {"inserted": 0, "duplicates": 0}
+    records = [record for _, record in rows]
+    try:
+        result = upsert_readings(document_cls, records)
+    except TRANSIENT_ERRORS:
+        raise
+    except PartialWriteError as e:
+        written = [record for index, record in enumerate(records) if index not in e.failed]
+        _written(kind, written, len(written) - e.inserted)
+        result = {"inserted": e.inserted, "duplicates": len(written) - e.inserted}
+        for index in sorted(e.failed):
+            if len(rows) == 1:
+                _reject(rejected, rows[0], records[0], e)
+                continue
+            retried = _write_isolating(kind, document_cls, [rows[index]], rejected)
+            result = {name: result[name] + retried[name] for name in result}
+        return result
+    except Exception as e:
+        if len(rows) == 1:
+            _reject(rejected, rows[0], records[0], e)
+            return {"inserted": 0, "duplicates": 0}
+        middle = len(rows) // 2
+        first = _write_isolating(kind, document_cls, rows[:middle], rejected)
+        second = _write_isolating(kind, document_cls, rows[middle:], rejected)
+        return {name: first[name] + second[name] for name in first}
+    _written(kind, records, result["duplicates"])
+    return result
+
+
+def _dead_letter(task, rejected):
+    """Gửi các dòng lỗi sang ingestion.dead dưới dạng task cùng loại, để replay_dead_letters chạy lại."""
+    errors = [f"{type(e).__name__}: {e}" for _, e in rejected]
+    logging.error(f"❌ {task.name}: {len(rejected)} rows sent to the dead-letter queue: {errors[:5]}")
+    if task.app.conf.task_always_eager:
+        return  # chạy eager (test): không có broker, tránh gọi lại chính task này
+    queue = dead_letter_queue(INGESTION_QUEUE)
+    task.apply_async(
+        args=[[data for data, _ in rejected]],
+        queue=queue,
+        declare=[queue],
+        headers={"x-error": "; ".join(errors[:20])},
+    )
+
+
+def _retry_later(task, exc, data_batch):
+    """Thử lại ``data_batch`` qua delay queue theo INGESTION_RETRY_DELAYS; hết lượt thì reject sang ingestion.dead."""
+    delay = retry_delay(task.request.retries)
+    if delay is None:
+        raise Reject(exc, requeue=False)
+    queue = retry_queue(delay)
+    raise task.retry(args=[data_batch], exc=exc, countdown=0, max_retries=None, queue=queue, declare=[queue])
+
+
+def _stamped(task, index, data, now):
+    """
+    Dòng ``data`` với client_id và timestamp cố định: batch được thử lại sau lỗi kết nối có
+    thể đã được ghi một phần, khi đó các dòng được upsert lại thay vì tạo bản ghi trùng.
+    """
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    if not data.get("client_id"):
+        data["client_id"] = f"task:{task.request.id}:{index}"
+    if not data.get("timestamp"):
+        data["timestamp"] = now.isoformat()
+    return data
+
+
+def _ingest(task, kind, document_cls, build_record, data_batch):
+    """
+    Write a batch of readings from the ingestion queue without letting bad rows block it.
+
+    Rows that can't be parsed, and rows MongoDB refuses, are split off and published to the
+    dead-letter queue; the rest of the batch is written. Connection errors retry the whole
+    batch through the delay queues. Rows without a ``client_id`` or a ``timestamp`` are given
+    fixed ones first, so rows already written before the error are not stored twice.
+
+    Returns:
+        dict: ``inserted``, ``duplicates`` and ``rejected`` counts.
+    """
+    if isinstance(data_batch, dict):
+        data_batch = [data_batch]
+    now = timezone.now()
+    rows, rejected = [], []
+    data_batch = [_stamped(task, index, data, now) for index, data in enumerate(data_batch)]
+    for data in data_batch:
+        try:
+            rows.append((data, build_record(data, now)))
+        except (KeyError, TypeError, ValueError) as e:
+            rejected.append((data, e))
+
+    try:
+        result = _write_isolating(kind, document_cls, rows, rejected)
+    except TRANSIENT_ERRORS as e:
+        logging.warning(f"{task.name}: MongoDB unavailable, retrying later: {e}")
+        _retry_later(task, e, data_batch)
+    if rejected:
+        _dead_letter(task, rejected)
+    return dict(result, rejected=len(rejected))
+
+
 @shared_task(bind=True, acks_late=True)
 def process_blood_pressure(self, data_batch):
     """
     Xử lý dữ liệu huyết áp từ hàng đợi RabbitMQ.
     """
-    try:
-        print("process_blood_pressure")
-        records = []
-        for data in data_batch:
-            data['timestamp'] = timezone.now().isoformat()
-            data['unit'] = 'mm Hg'
-            record = BloodPressure(
-                user_id=data["user_id"],
-                systolic=data["systolic"],
-                diastolic=data["diastolic"],
-                timestamp=datetime.fromisoformat(data["timestamp"]),
-                unit=data.get("unit", "mm Hg"),
-            )
-            records.append(record)
-
-        # Lưu tất cả bản ghi vào MongoDB trong một lần
-        if records:
-            BloodPressure.objects.insert(records)
-
-        logging.info(f"✅ Saved {len(records)} BloodPressure records to MongoDB.")
-        return f"Saved {len(records)} records"
+    result = _ingest(self, "pressure", BloodPressure, _pressure_record, data_batch)
+    logging.info(
+        f"✅ Saved {result['inserted']} BloodPressure records to MongoDB "
+        f"({result['duplicates']} duplicates, {result['rejected']} rejected)."
+    )
+    return f"Saved {result['inserted']} records"
 
-    except Exception as e:
-        logging.error(f"❌ Error saving to MongoDB: {e}")
-        raise self.retry(exc=e, countdown=10, max_retries=3)  # Nếu lỗi, thử lại 3 lần
-    
 
 @shared_task(bind=True, acks_late=True)
 def process_blood_glucose(self, data_batch):
     """
     Xử lý dữ liệu đường huyết từ hàng đợi RabbitMQ.
     """
+    result = _ingest(self, "glucose", BloodGlucose, _glucose_record, data_batch)
+    logging.info(
+        f"✅ Đã lưu {result['inserted']} bản ghi BloodGlucose vào MongoDB "
+        f"({result['duplicates']} bản ghi trùng, {result['rejected']} bản ghi lỗi)."
+    )
+    return f"Saved {result['inserted']} records"
+
+
+# (tên, collection, tiền tố cache của từng bản ghi)
+PURGE_TARGETS = [
+    ("blood_glucose", BloodGlucose, "blood_glucose"),
+    ("blood_pressure", BloodPressure, "blood_pressure"),
+    ("tombstones", ReadingTombstone, None),
+    ("glucose_forecast", GlucoseForecast, None),
+]
+
+
+def _physical_collections(document_cls):
+    """(collection, đường dẫn field user_id) của document; bản ghi đo có thể nằm trên nhiều partition."""
+    if document_cls not in (BloodGlucose, BloodPressure):
+        return [(document_cls._get_collection(), "user_id")]
+    storage = storage_for(document_cls)
+    return [(collection, storage.field("user_id")) for collection in storage.collections()]
+
+
+def _purge_collection(job, name, document_cls, cache_prefix):
+    """Xóa dữ liệu của user trong một collection theo từng chunk _id, cập nhật tiến độ sau mỗi chunk."""
+    for collection, user_field in _physical_collections(document_cls):
+        _purge_chunks(job, name, collection, user_field, cache_prefix)
+    if document_cls in (BloodGlucose, BloodPressure):
+        storage_for(document_cls).release_claims(user_id=job.user_id)
+
+
+def _purge_chunks(job, name, collection, user_field, cache_prefix):
+    while True:
+        ids = [doc["_id"] for doc in collection.find({user_field: job.user_id}, {"_id": 1}).limit(settings.PURGE_CHUNK_SIZE)]
+        if not ids:
+            return
+
+        result = collection.delete_many({"_id": {"$in": ids}})
+        if cache_prefix:
+            cache.delete_many([f"{cache_prefix}_{_id}_{job.user_id}" for _id in ids])
+        UserPurgeJob.objects(id=job.id).update(
+            **{f"inc__deleted__{name}": result.deleted_count},
+            set__updated_at=timezone.now(),
+        )
+        time.sleep(settings.PURGE_CHUNK_PAUSE_SECONDS)
+
+
+@shared_task(bind=True, acks_late=True)
+def purge_user_data(self, job_id):
+    """
+    Xóa vĩnh viễn user và toàn bộ dữ liệu sức khỏe theo từng chunk.
+
+    Task có thể chạy lại an toàn: nếu worker chết giữa chừng, task được giao lại
+    (acks_late) và tiếp tục xóa phần dữ liệu còn lại.
+    """
+    job = UserPurgeJob.objects(id=job_id).first()
+    if job is None or job.status == "completed":
+        return f"Nothing to purge for job {job_id}"
+
     try:
-        print("process_blood_glucose")
-        records = []
-        for data in data_batch:
-            data['timestamp'] = timezone.now().isoformat()
-            data['unit'] = 'mg/dL'
-            record = BloodGlucose(
-                user_id=data["user_id"],
-                glucose_level=data["glucose_level"],
-                timestamp=datetime.fromisoformat(data["timestamp"]),
-                unit=data.get("unit", "mg/dL"),
-            )
-            records.append(record)
-
-        # Lưu tất cả bản ghi vào MongoDB trong một lần
-        if records:
-            BloodGlucose.objects.insert(records)
-
-        logging.info(f"✅ Đã lưu {len(records)} bản ghi BloodGlucose vào MongoDB.")
-        return f"Saved {len(records)} records"
+        job.update(set__status="running", set__updated_at=timezone.now())
+        for name, document_cls, cache_prefix in PURGE_TARGETS:
+            _purge_collection(job, name, document_cls, cache_prefix)
+        delete_user_archive(job.user_id)
+
+        cache.delete_many([
+            f"blood_glucose_list_{job.user_id}",
+            f"blood_pressure_list_{job.user_id}",
+            f"blood_pressure_batch_{job.user_id}",
+        ])
+        invalidate_series("glucose", job.user_id)
+        invalidate_series("pressure", job.user_id)
+        # Xóa user khỏi MySQL sau cùng, khi dữ liệu sức khỏe đã được xóa hết
+        get_user_model().all_objects.filter(id=job.user_id).delete()
+
+        job.update(set__status="completed", set__updated_at=timezone.now())
+        logging.info(f"✅ Purged user {job.user_id} (job {job_id}).")
+        return f"Purged user {job.user_id}"
 
     except Exception as e:
-        logging.error(f"❌ Lỗi khi lưu vào MongoDB: {e}")
-        raise self.retry(exc=e, countdown=10, max_retries=3)  # Nếu lỗi, thử lại 3 lần
\ No newline at end of file
+        logging.error(f"❌ Error purging user {job.user_id}: {e}")
+        job.update(set__status="failed", set__error=str(e), set__updated_at=timezone.now())
+        raise self.retry(exc=e, countdown=30, max_retries=3)
+
+
+
+@shared_task(bind=True, acks_late=True)
+def archive_cold_readings_task(self):
+    """
+    Chuyển dữ liệu cũ hơn READINGS_ARCHIVE_AFTER_DAYS từ MongoDB sang file Parquet (cold tier).
+    """
+    try:
+        moved = {
+            document_cls.__name__: archive_cold_readings(document_cls)
+            for document_cls in (BloodGlucose, BloodPressure)
+        }
+        logging.info(f"✅ Archived cold readings: {moved}")
+        return moved
+    except Exception as e:
+        logging.error(f"❌ Error archiving cold readings: {e}")
+        raise self.retry(exc=e, countdown=300, max_retries=3)
+
+
+@shared_task(bind=True, acks_late=True, ignore_result=True)
+def rebuild_user_analytics(self, user_id):
+    """
+    Dựng lại series thống kê và trạng thái dự báo của user từ MongoDB (queue analytics).
+
+    Dùng sau khi dữ liệu được ghi thẳng vào MongoDB (import, backfill); job hàng loạt gửi với
+    BACKFILL_PRIORITY để không chặn job của user đang dùng app. Series chỉ được dựng lại khi
+    cache dùng chung với process web (CACHE_BACKEND); trạng thái dự báo nằm trong MongoDB.
+    """
+    try:
+        if cache_is_shared():
+            for kind in ("glucose", "pressure"):
+                invalidate_series(kind, user_id)
+                load_series(kind, user_id)
+        else:
+            # Series dựng trong cache riêng của worker không tới được process web
+            logging.warning(f"Series of user {user_id} not rebuilt: the cache backend is not shared between processes")
+        readings = rebuild_forecast(user_id)
+        logging.info(f"Rebuilt analytics of user {user_id} ({readings} readings for the forecast)")
+    except Exception as e:
+        logging.error(f"❌ Error rebuilding analytics of user {user_id}: {e}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
+def schedule_analytics_backfill(user_ids, queue=None):
+    """Xếp rebuild_user_analytics cho từng user với BACKFILL_PRIORITY (``queue`` để đổi queue khi chạy loadtest)."""
+    options = {"priority": settings.BACKFILL_PRIORITY}
+    if queue:
+        options["queue"] = queue
+    scheduled = 0
+    for user_id in user_ids:
+        rebuild_user_analytics.apply_async(args=[user_id], **options)
+        scheduled += 1
+    return scheduled
+
+
+@shared_task(ignore_result=True)
+def warm_user_cache(user_id):
+    """Làm nóng cache danh sách, series và dashboard của user sau khi đăng nhập (queue cache_warm)."""
+    result = warm(user_id)
+    logging.info(f"Warmed cache of user {user_id}: {result}")
+    return result
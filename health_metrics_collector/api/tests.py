@@ -1,3 +1,505 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from bson import ObjectId
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from pymongo.errors import ConnectionFailure
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .archive import archive_cold_readings, pa
+from .authentication import ReadRoutingJWTAuthentication
+from .bulk import upsert_readings
+from .forecast import HoltState, _update_user
+from .models import BloodGlucose, BloodPressure, GlucoseForecast, ReadingTombstone, User
+from .routing import (
+    PrimaryReplicaRouter,
+    ReadRoutingMiddleware,
+    _pinned_to_primary,
+    is_pinned_to_primary,
+    mark_write,
+    recently_wrote,
+)
+from .series import append_readings, build_series, load_series
+from .storage import MonthlyPartitionStorage, storage_for
+from .sync import InvalidSyncToken, collect_changes, decode_token, encode_token, record_deletion
+from .tasks import process_blood_glucose
+from .throttling import ReadingBulkThrottle, RequestExceedsQuota
+from .views import dashboard
+
+# manage.py test khai báo alias replica là mirror của default (xem settings.py). Mirror dùng
+# kết nối riêng nên không thấy dữ liệu trong transaction của TestCase: dùng TransactionTestCase
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ReadRoutingTestCase(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        # Mỗi test bắt đầu không bị ghim vào primary và chưa có lần ghi nào được ghi nhận
+        self._pin_token = _pinned_to_primary.set(False)
+        cache.clear()
+        self.user = User.objects.create_user('0912345678', 'secret')
+
+    def tearDown(self):
+        _pinned_to_primary.reset(self._pin_token)
+
+
+class PrimaryReplicaRouterTests(ReadRoutingTestCase):
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(User), 'replica')
+
+    def test_pinned_reads_go_to_the_primary(self):
+        _pinned_to_primary.set(True)
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(User), 'default')
+
+    def test_writes_and_migrations_stay_on_the_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_write(User), 'default')
+        self.assertTrue(router.allow_migrate('default', 'api'))
+        self.assertFalse(router.allow_migrate('replica', 'api'))
+
+    def test_queries_use_the_replica_connection(self):
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            User.objects.filter(id=self.user.id).exists()
+        self.assertEqual(len(replica), 1)
+        self.assertEqual(len(primary), 0)
+
+
+class ReadRoutingMiddlewareTests(ReadRoutingTestCase):
+
+    def run_request(self, method, status=200):
+        seen = {}
+
+        def view(request):
+            request.user = self.user
+            seen['pinned'] = is_pinned_to_primary()
+            return HttpResponse(status=status)
+
+        request = getattr(RequestFactory(), method)('/api/glucose/')
+        ReadRoutingMiddleware(view)(request)
+        return seen['pinned']
+
+    def test_write_is_pinned_and_marked(self):
+        self.assertTrue(self.run_request('post', status=201))
+        self.assertTrue(recently_wrote(self.user.id))
+        # Ghim chỉ kéo dài trong request
+        self.assertFalse(is_pinned_to_primary())
+
+    def test_read_is_not_pinned(self):
+        self.assertFalse(self.run_request('get'))
+        self.assertFalse(recently_wrote(self.user.id))
+
+    def test_failed_write_is_not_marked(self):
+        self.assertTrue(self.run_request('post', status=400))
+        self.assertFalse(recently_wrote(self.user.id))
+
+    @override_settings(READ_AFTER_WRITE_WINDOW_SECONDS=0)
+    def test_mark_expires_after_the_window(self):
+        mark_write(self.user.id)
+        self.assertFalse(recently_wrote(self.user.id))
+
+
+class FreshnessGuardTests(ReadRoutingTestCase):
+
+    def authenticate(self):
+        token = AccessToken.for_user(self.user)
+        request = RequestFactory().get('/api/glucose/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            user, _ = ReadRoutingJWTAuthentication().authenticate(request)
+        return user, len(replica), len(primary)
+
+    def test_user_is_read_from_the_replica(self):
+        user, replica, primary = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertEqual((replica, primary), (1, 0))
+        self.assertFalse(is_pinned_to_primary())
+
+    def test_user_who_just_wrote_is_read_from_the_primary(self):
+        mark_write(self.user.id)
+        user, replica, primary = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertEqual((replica, primary), (0, 1))
+        self.assertTrue(is_pinned_to_primary())
+
+    def test_just_deactivated_user_is_rejected(self):
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        mark_write(self.user.id)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class MongoTestCase(SimpleTestCase):
+    """Test trên MongoDB (database MONGO_TEST_URI của `manage.py test`), làm rỗng các collection sau mỗi test."""
+
+    user_id = 42
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        for document_cls in (BloodGlucose, BloodPressure):
+            storage_for(document_cls).delete_many({})
+        for document_cls in (ReadingTombstone, GlucoseForecast):
+            document_cls._get_collection().delete_many({})
+
+    def insert_glucose(self, *readings):
+        """Ghi bản ghi đường huyết ``(timestamp, blood_glucose)`` của self.user_id."""
+        storage_for(BloodGlucose).insert_many([
+            {'user_id': self.user_id, 'blood_glucose': value, 'unit': 'mg/dL', 'meal': 'fasting',
+             'timestamp': timestamp, 'updated_at': timestamp}
+            for timestamp, value in readings
+        ])
+
+    def sync_pages(self, token=None):
+        """Mọi trang của một lần sync theo next_cursor: (các trang, giá trị đường huyết theo thứ tự)."""
+        pages = [collect_changes(self.user_id, token)]
+        while pages[-1]['next_cursor']:
+            pages.append(collect_changes(self.user_id, cursor=pages[-1]['next_cursor']))
+        return pages, [row['blood_glucose'] for page in pages for row in page['glucose']]
+
+
+class MonthlyPartitionTests(MongoTestCase):
+    """Hai storage là danh sách partition cache của hai process khác nhau."""
+
+    def setUp(self):
+        super().setUp()
+        self.writer = MonthlyPartitionStorage(BloodGlucose, base_name='test_partitions')
+        self.reader = MonthlyPartitionStorage(BloodGlucose, base_name='test_partitions')
+        self.addCleanup(self.writer.drop)
+        self.assertEqual(self.reader.months(), [])
+
+    def write(self, timestamp):
+        doc = {'user_id': self.user_id, 'blood_glucose': 100.0, 'unit': 'mg/dL', 'meal': 'fasting',
+               'timestamp': timestamp, 'updated_at': timestamp}
+        self.writer.insert_many([doc])
+        return doc['_id']
+
+    def values(self):
+        return [doc['_id'] for doc in self.reader.find({'user_id': self.user_id})]
+
+    def test_partition_created_by_another_process_is_read(self):
+        pk = self.write(datetime(2023, 3, 1))
+        self.assertEqual(self.values(), [pk])
+        self.assertEqual(self.reader.get(pk, self.user_id).id, pk)
+
+    def test_current_month_is_always_read(self):
+        pk = self.write(timezone.now().replace(tzinfo=None))
+        cache.clear()  # version dùng chung bị mất (cache riêng của từng process)
+        self.assertEqual(self.values(), [pk])
+
+    def test_get_lists_partitions_again_on_a_miss(self):
+        pk = self.write(datetime(2023, 3, 1))
+        cache.clear()
+        self.assertEqual(self.reader.get(pk, self.user_id).id, pk)
+        with self.assertRaises(BloodGlucose.DoesNotExist):
+            self.reader.get(ObjectId(), self.user_id)
+
+    def test_resent_client_id_is_not_stored_again_in_another_month(self):
+        doc = {'user_id': self.user_id, 'blood_glucose': 100.0, 'unit': 'mg/dL', 'meal': 'fasting',
+               'client_id': 'c1', 'timestamp': datetime(2023, 3, 31, 23, 59)}
+        stored = self.writer.upsert_one(dict(doc))
+        # Gửi lại sau nửa đêm cuối tháng: thời điểm ghi thuộc partition tháng sau
+        resent = dict(doc, timestamp=datetime(2023, 4, 1, 0, 1))
+        self.assertEqual(self.reader.upsert_one(dict(resent))['_id'], stored['_id'])
+        other = dict(doc, client_id='c2', timestamp=datetime(2023, 4, 1, 0, 1))
+        self.assertEqual(self.reader.upsert_many([dict(resent), other]), {'inserted': 1, 'duplicates': 1})
+        self.assertEqual(sorted(raw['client_id'] for raw in self.reader.find({'user_id': self.user_id})), ['c1', 'c2'])
+
+
+@skipUnless(pa is not None, "pyarrow is not installed")
+class SyncArchiveTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        archive_root = override_settings(READINGS_ARCHIVE_ROOT=root)
+        archive_root.enable()
+        self.addCleanup(archive_root.disable)
+
+        self.insert_glucose((datetime(2020, 1, 5), 1.0), (datetime(2020, 2, 5), 2.0), (datetime(2024, 6, 1), 3.0))
+        self.assertEqual(archive_cold_readings(BloodGlucose, cutoff=datetime(2021, 1, 1)), 2)
+
+    def test_reset_sync_returns_archived_and_live_readings(self):
+        changes = collect_changes(self.user_id)
+        self.assertTrue(changes['reset'])
+        self.assertEqual([row['blood_glucose'] for row in changes['glucose']], [1.0, 2.0, 3.0])
+        self.assertIsNone(changes['next_cursor'])
+
+    @override_settings(SYNC_PAGE_SIZE=1)
+    def test_snapshot_pages_through_both_tiers(self):
+        pages, values = self.sync_pages()
+        self.assertEqual(values, [1.0, 2.0, 3.0])
+        self.assertEqual(len(pages), 3)
+
+
+class SyncTests(MongoTestCase):
+
+    def now(self):
+        return timezone.now().replace(tzinfo=None)
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_snapshot_is_paged_with_a_cursor(self):
+        self.insert_glucose(*((datetime(2024, 1, day), float(day)) for day in range(1, 6)))
+        pages, values = self.sync_pages()
+        self.assertEqual(values, [1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual([len(page['glucose']) for page in pages], [2, 2, 1])
+        # Chỉ trang đầu thay thế dữ liệu của client, next_token chỉ có ở trang cuối
+        self.assertEqual([page['reset'] for page in pages], [True, False, False])
+        self.assertEqual([page['next_token'] is not None for page in pages], [False, False, True])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_page_boundary_never_splits_a_timestamp(self):
+        tied = datetime(2024, 1, 2)
+        self.insert_glucose((datetime(2024, 1, 1), 1.0), (tied, 2.0), (tied, 3.0), (tied, 4.0), (datetime(2024, 1, 3), 5.0))
+        pages, values = self.sync_pages()
+        self.assertEqual(sorted(values), [1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual([len(page['glucose']) for page in pages], [4, 1])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_kinds_are_paged_independently(self):
+        self.insert_glucose((datetime(2024, 1, 1), 1.0))
+        storage_for(BloodPressure).insert_many([
+            {'user_id': self.user_id, 'systolic': 120 + day, 'diastolic': 80, 'unit': 'mm Hg',
+             'timestamp': datetime(2024, 1, day), 'updated_at': datetime(2024, 1, day)}
+            for day in range(1, 4)
+        ])
+        pages, _ = self.sync_pages()
+        self.assertEqual([(len(page['glucose']), len(page['pressure'])) for page in pages], [(1, 2), (0, 1)])
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ('bogus', 'snapshot:1:x:done', 'snapshot:abc:done:done'):
+            with self.assertRaises(InvalidSyncToken):
+                collect_changes(self.user_id, cursor=cursor)
+
+    def test_incremental_sync_returns_changes_and_tombstones(self):
+        self.insert_glucose((datetime(2024, 1, 1), 1.0))
+        token = collect_changes(self.user_id)['next_token']
+        self.insert_glucose((self.now(), 2.0))
+        record_deletion('glucose', SimpleNamespace(user_id=self.user_id, id='65f000000000000000000001'))
+
+        changes = collect_changes(self.user_id, token)
+        self.assertFalse(changes['reset'])
+        self.assertIsNone(changes['next_cursor'])
+        self.assertEqual([row['blood_glucose'] for row in changes['glucose']], [2.0])
+        self.assertEqual(changes['deleted'], {'glucose': ['65f000000000000000000001'], 'pressure': []})
+
+    @override_settings(SYNC_TOKEN_OVERLAP_SECONDS=5)
+    def test_token_overlaps_writes_in_flight(self):
+        token = collect_changes(self.user_id)['next_token']
+        self.assertLessEqual(decode_token(token), timezone.now() - timedelta(seconds=5))
+        # Bản ghi có updated_at ngay trước lúc sync nhưng chưa đọc được khi truy vấn
+        self.insert_glucose((self.now() - timedelta(seconds=2), 1.0))
+        self.assertEqual([row['blood_glucose'] for row in collect_changes(self.user_id, token)['glucose']], [1.0])
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_token_older_than_tombstone_retention_resets(self):
+        self.insert_glucose((datetime(2024, 1, 1), 1.0))
+        token = encode_token(timezone.now() - timedelta(days=31))
+        changes = collect_changes(self.user_id, token)
+        self.assertTrue(changes['reset'])
+        self.assertEqual([row['blood_glucose'] for row in changes['glucose']], [1.0])
+
+    def test_invalid_token_is_rejected(self):
+        with self.assertRaises(InvalidSyncToken):
+            collect_changes(self.user_id, 'abc')
+
+
+class IngestRetryTests(MongoTestCase):
+
+    def test_retry_after_connection_failure_does_not_duplicate_rows(self):
+        calls = []
+
+        def write_then_fail(document_cls, records):
+            # Lần đầu: bản ghi đã được lưu nhưng kết nối mất trước khi có kết quả
+            result = upsert_readings(document_cls, records)
+            calls.append(len(records))
+            if len(calls) == 1:
+                raise ConnectionFailure("connection closed")
+            return result
+
+        batch = [{'user_id': self.user_id, 'blood_glucose': value, 'meal': 'fasting'} for value in (90, 110)]
+        with mock.patch('api.tasks.upsert_readings', side_effect=write_then_fail):
+            process_blood_glucose.apply(args=[batch]).get()
+
+        self.assertEqual(calls, [2, 2])
+        docs = list(storage_for(BloodGlucose).find({'user_id': self.user_id}))
+        self.assertEqual(sorted(doc['blood_glucose'] for doc in docs), [90.0, 110.0])
+
+
+class SeriesCacheTests(MongoTestCase):
+
+    def test_rebuild_does_not_overwrite_readings_appended_meanwhile(self):
+        self.insert_glucose((datetime(2024, 1, 1), 90.0))
+        reading = {'user_id': self.user_id, 'blood_glucose': 110.0, 'unit': 'mg/dL', 'meal': 'fasting',
+                   'timestamp': datetime(2024, 1, 2)}
+
+        def build_then_write(kind, user_id):
+            # Bản ghi được ghi (và append) sau khi series đã đọc MongoDB
+            series = build_series(kind, user_id)
+            self.insert_glucose((reading['timestamp'], reading['blood_glucose']))
+            append_readings('glucose', [reading])
+            return series
+
+        with mock.patch('api.series.build_series', side_effect=build_then_write):
+            self.assertEqual(list(load_series('glucose', self.user_id)['values']), [90.0])
+        self.assertEqual(list(load_series('glucose', self.user_id)['values']), [90.0, 110.0])
+
+    def test_rebuilt_series_is_cached(self):
+        self.insert_glucose((datetime(2024, 1, 1), 90.0))
+        load_series('glucose', self.user_id)
+        with mock.patch('api.series.build_series') as build:
+            self.assertEqual(list(load_series('glucose', self.user_id)['values']), [90.0])
+        build.assert_not_called()
+
+
+class ManualClockBulkThrottle(ReadingBulkThrottle):
+    rate = '10/min'
+    clock = 0.0
+
+    def timer(self):
+        return self.clock
+
+
+@override_settings(CACHES=LOCAL_CACHE, INGEST_THROTTLE_LOCAL_PRECHECK=False)
+class ReadingThrottleTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.view = SimpleNamespace(action='bulk')
+
+    def bulk(self, count, at):
+        """Throttle của một request bulk ``count`` bản ghi tại giây ``at``; trả về (throttle, được nhận)."""
+        throttle = ManualClockBulkThrottle()
+        throttle.clock = at
+        request = SimpleNamespace(method='POST', data=[{}] * count, user=SimpleNamespace(is_authenticated=True, pk=1))
+        return throttle, throttle.allow_request(request, self.view)
+
+    def test_bulk_is_charged_per_reading(self):
+        allowed = [self.bulk(count, at=1)[1] for count in (4, 4, 3, 2)]
+        self.assertEqual(allowed, [True, True, False, True])
+
+    def test_retry_after_until_window_has_room(self):
+        self.bulk(10, at=1)
+        throttle, allowed = self.bulk(1, at=30)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 30)
+        # Window sau: 10 bản ghi của window trước còn tính 10 * (1 - 0.5) = 5
+        throttle, allowed = self.bulk(6, at=90)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 6)
+        self.assertTrue(self.bulk(6, at=96)[1])
+
+    def test_bulk_larger_than_quota_is_rejected_with_400(self):
+        with self.assertRaises(RequestExceedsQuota) as raised:
+            self.bulk(11, at=1)
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertTrue(self.bulk(10, at=1)[1])
+
+
+MINUTE_MS = 60000
+HOLT_SETTINGS = {'FORECAST_ALPHA': 0.5, 'FORECAST_BETA': 0.3, 'FORECAST_STEP_MINUTES': 5, 'FORECAST_RESET_MINUTES': 60}
+
+
+@override_settings(**HOLT_SETTINGS)
+class HoltStateTests(SimpleTestCase):
+
+    def state(self, *points):
+        state = HoltState()
+        for minute, value in points:
+            state.update(minute * MINUTE_MS, value)
+        return state
+
+    def assertState(self, state, level, trend, count):
+        self.assertAlmostEqual(state.level, level)
+        self.assertAlmostEqual(state.trend, trend)
+        self.assertEqual(state.count, count)
+
+    def test_one_step_uses_alpha_and_beta(self):
+        # level = 0.5 * 110 + 0.5 * 100, trend = 0.3 * (105 - 100) / 5
+        self.assertState(self.state((0, 100.0), (5, 110.0)), 105.0, 0.3, 2)
+
+    def test_longer_interval_scales_the_smoothing_factors(self):
+        # 10 phút = 2 bước: alpha = 1 - 0.5², beta = 1 - 0.7²; dự báo 105 + 0.3 * 10 = 108
+        # level = 0.75 * 120 + 0.25 * 108 = 117, trend = 0.51 * (117 - 105) / 10 + 0.49 * 0.3
+        self.assertState(self.state((0, 100.0), (5, 110.0), (15, 120.0)), 117.0, 0.759, 3)
+
+    def test_same_timestamp_only_smooths_the_level(self):
+        self.assertState(self.state((0, 100.0), (5, 110.0), (5, 125.0)), 115.0, 0.3, 3)
+
+    def test_gap_longer_than_reset_restarts_from_the_reading(self):
+        self.assertState(self.state((0, 100.0), (5, 110.0), (66, 150.0)), 150.0, 0.0, 3)
+
+    def test_reading_older_than_the_state_is_skipped(self):
+        state = self.state((0, 100.0), (5, 110.0))
+        self.assertFalse(state.update(4 * MINUTE_MS, 300.0))
+        self.assertState(state, 105.0, 0.3, 2)
+        self.assertEqual(state.timestamp_ms, 5 * MINUTE_MS)
+
+
+class RacingCollection:
+    """Collection mà ngay trước lần replace_one đầu tiên, một process khác cập nhật trạng thái."""
+
+    def __init__(self, collection, concurrent_update):
+        self.collection = collection
+        self.concurrent_update = concurrent_update
+
+    def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    def replace_one(self, *args, **kwargs):
+        if self.concurrent_update:
+            self.concurrent_update()
+            self.concurrent_update = None
+        return self.collection.replace_one(*args, **kwargs)
+
+
+@override_settings(**HOLT_SETTINGS)
+class ForecastUpdateTests(MongoTestCase):
+
+    def test_concurrent_update_is_merged_on_retry(self):
+        collection = GlucoseForecast._get_collection()
+        _update_user(collection, self.user_id, [(0, 100.0)])
+        racing = RacingCollection(collection, lambda: _update_user(collection, self.user_id, [(5 * MINUTE_MS, 110.0)]))
+
+        _update_user(racing, self.user_id, [(10 * MINUTE_MS, 120.0)])
+
+        # Lần thử lại gộp 120 vào trạng thái (105, 0.3) của process kia: dự báo 106.5
+        # level = 0.5 * 120 + 0.5 * 106.5, trend = 0.3 * (113.25 - 105) / 5 + 0.7 * 0.3
+        state = HoltState.from_document(collection.find_one({'user_id': self.user_id}))
+        self.assertAlmostEqual(state.level, 113.25)
+        self.assertAlmostEqual(state.trend, 0.705)
+        self.assertEqual(state.count, 3)
+
+
+@override_settings(CACHES=LOCAL_CACHE, CACHE_WARM_ENABLED=True)
+class DashboardTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_counter_failure_does_not_fail_the_dashboard(self):
+        request = APIRequestFactory().get('/api/dashboard/')
+        force_authenticate(request, user=SimpleNamespace(id=1, pk=1, is_authenticated=True))
+        sections = {'glucose_recent': {'status': 'ok', 'cached': True}}
+        with mock.patch('api.views.build_dashboard', return_value=({}, sections)), \
+                mock.patch('api.warming.cache') as warm_cache:
+            warm_cache.get.side_effect = ConnectionError("cache unavailable")
+            response = dashboard(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'success')
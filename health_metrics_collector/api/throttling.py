@@ -0,0 +1,216 @@
+import threading
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+from .caching import cache_is_shared
+
+# Trạng thái cục bộ của từng process, dùng cho pre-check không cần gọi cache
+_local_state = {}
+_local_lock = threading.Lock()
+_LOCAL_STATE_MAX_KEYS = 10000
+# Lần cuối process đẩy phần cost còn treo của các user không gửi request nữa lên cache
+_last_flush = [0.0]
+
+
+class RequestExceedsQuota(APIException):
+    """Request chứa nhiều bản ghi hơn cả quota: không bao giờ được nhận dù chờ bao lâu."""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = 'exceeds_quota'
+
+
+class _LocalWindow:
+    __slots__ = ('window', 'known', 'pending', 'synced_at')
+
+    def __init__(self, window, known, synced_at):
+        self.window = window
+        self.known = known
+        self.pending = 0
+        self.synced_at = synced_at
+
+
+class ReadingCountThrottle(SimpleRateThrottle):
+    """
+    Sliding-window counter throttle that charges requests by the number of readings they carry.
+
+    Each (scope, ident) pair keeps one integer counter per fixed window in the cache. The
+    allowance is estimated as ``previous * (1 - elapsed) + current`` so every request costs a
+    single ``get_many`` plus a single ``incr`` instead of rewriting a timestamp history list.
+
+    When ``INGEST_THROTTLE_LOCAL_PRECHECK`` is enabled (off by default), a process that recently
+    saw the counter well below the quota admits requests from its own memory and flushes the
+    accumulated cost on the next cache round-trip. Every process does this on its own, so with
+    N processes up to ``N * INGEST_THROTTLE_LOCAL_FRACTION`` of the quota can be admitted on top
+    of the shared count before they sync: a user can overshoot the quota by that much. Cost
+    still pending when a user goes quiet is flushed within ``INGEST_THROTTLE_LOCAL_SYNC_SECONDS``
+    by the next request of any user. The pre-check needs a cache shared between processes and
+    is ignored with a process-local one.
+
+    A request carrying more readings than the whole quota is rejected with 400
+    (``RequestExceedsQuota``) instead of 429, since waiting would never let it through.
+
+    Attributes:
+        scope (str): The key in ``DEFAULT_THROTTLE_RATES`` holding the quota.
+        category (str): Which requests this throttle applies to: 'read', 'write' or 'bulk'.
+    """
+    category = None
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def get_category(self, request, view):
+        if request.method in SAFE_METHODS:
+            return 'read'
+        if getattr(view, 'action', None) == 'bulk' or isinstance(request.data, list):
+            return 'bulk'
+        return 'write'
+
+    def get_cost(self, request, view):
+        """Số lượng bản ghi trong request (request đọc luôn tính là 1)."""
+        if self.category == 'read':
+            return 1
+        data = request.data
+        if isinstance(data, list):
+            return max(len(data), 1)
+        return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None or self.get_category(request, view) != self.category:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        self.now = self.timer()
+        cost = self.get_cost(request, view)
+        if cost > self.num_requests:
+            raise RequestExceedsQuota(
+                f"Request carries {cost} readings, more than the quota of {self.num_requests} "
+                f"per {self.duration} seconds. Split it into smaller requests."
+            )
+        window = int(self.now // self.duration)
+
+        if self._local_precheck(key, window, cost):
+            return True
+
+        estimated = self._sync(key, window)
+        if estimated + cost > self.num_requests:
+            self._wait = self._compute_wait(estimated, cost)
+            return self.throttle_failure()
+
+        current = self._incr(self._window_key(key, window), cost)
+        self._remember(key, window, estimated + cost, current)
+        return True
+
+    def wait(self):
+        return getattr(self, '_wait', None)
+
+    def _window_key(self, key, window):
+        return f"{key}_{window}"
+
+    def _incr(self, window_key, amount):
+        try:
+            return self.cache.incr(window_key, amount)
+        except ValueError:
+            # Counter chưa tồn tại: tạo mới, nếu process khác đã kịp tạo thì incr lại
+            if self.cache.add(window_key, amount, timeout=self.duration * 2):
+                return amount
+            return self.cache.incr(window_key, amount)
+
+    def _sync(self, key, window):
+        """Flush the locally admitted cost and return the sliding-window estimate."""
+        with _local_lock:
+            state = _local_state.pop(key, None)
+        if state is not None and state.pending:
+            self._incr(self._window_key(key, state.window), state.pending)
+        self._flush_idle()
+
+        current_key = self._window_key(key, window)
+        previous_key = self._window_key(key, window - 1)
+        counts = self.cache.get_many([current_key, previous_key])
+        self._elapsed = (self.now % self.duration) / self.duration
+        self._previous = counts.get(previous_key, 0)
+        return self._previous * (1 - self._elapsed) + counts.get(current_key, 0)
+
+    def _compute_wait(self, estimated, cost):
+        current = estimated - self._previous * (1 - self._elapsed)
+        remaining = self.duration * (1 - self._elapsed)
+        if current + cost > self.num_requests or not self._previous:
+            return remaining
+        # Chờ tới khi phần đóng góp của window trước giảm đủ
+        needed = 1 - (self.num_requests - current - cost) / self._previous
+        return max((needed - self._elapsed) * self.duration, 0) or remaining
+
+    def _precheck_enabled(self):
+        # Cache riêng từng process thì counter "dùng chung" cũng là của riêng process
+        return getattr(settings, 'INGEST_THROTTLE_LOCAL_PRECHECK', False) and cache_is_shared(self.cache)
+
+    def _flush(self, states):
+        for key, state in states:
+            if state.pending:
+                self._incr(self._window_key(key, state.window), state.pending)
+
+    def _flush_idle(self):
+        """Đẩy cost còn treo của các user đã lâu không gửi request, tối đa một lần mỗi SYNC_SECONDS."""
+        max_age = getattr(settings, 'INGEST_THROTTLE_LOCAL_SYNC_SECONDS', 5)
+        with _local_lock:
+            if not _local_state or self.now - _last_flush[0] < max_age:
+                return
+            _last_flush[0] = self.now
+            idle = [(key, state) for key, state in _local_state.items() if self.now - state.synced_at > max_age]
+            for key, _ in idle:
+                del _local_state[key]
+        self._flush(idle)
+
+    def _local_precheck(self, key, window, cost):
+        if not self._precheck_enabled():
+            return False
+        fraction = getattr(settings, 'INGEST_THROTTLE_LOCAL_FRACTION', 0.5)
+        max_age = getattr(settings, 'INGEST_THROTTLE_LOCAL_SYNC_SECONDS', 5)
+        with _local_lock:
+            state = _local_state.get(key)
+            if (
+                state is None
+                or state.window != window
+                or self.now - state.synced_at > max_age
+                or state.known + state.pending + cost > self.num_requests * fraction
+            ):
+                return False
+            state.pending += cost
+            return True
+
+    def _remember(self, key, window, estimated, current):
+        if not self._precheck_enabled():
+            return
+        evicted = []
+        with _local_lock:
+            if len(_local_state) >= _LOCAL_STATE_MAX_KEYS:
+                evicted = list(_local_state.items())
+                _local_state.clear()
+            _local_state[key] = _LocalWindow(window, max(estimated, current), self.now)
+        # Không bỏ cost đã nhận khi dọn trạng thái cục bộ
+        self._flush(evicted)
+
+
+class ReadingReadThrottle(ReadingCountThrottle):
+    scope = 'ingest_read'
+    category = 'read'
+
+
+class ReadingWriteThrottle(ReadingCountThrottle):
+    scope = 'ingest_write'
+    category = 'write'
+
+
+class ReadingBulkThrottle(ReadingCountThrottle):
+    scope = 'ingest_bulk'
+    category = 'bulk'
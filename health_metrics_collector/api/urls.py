@@ -1,10 +1,7 @@
 from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenObtainPairView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 from .views import (
@@ -12,9 +9,15 @@ from .views import (
     BloodPressureViewSet,
     UserRegistrationView,
     CustomTokenObtainPairView,
+    CustomTokenRefreshView,
     UserUpdateView,
     soft_delete_user,
     hard_delete_user,
+    purge_job_status,
+    sync_readings,
+    dashboard,
+    caregiver_patients,
+    health_check,
 )
 
 router = DefaultRouter()
@@ -23,7 +26,7 @@ router.register(r'pressure', BloodPressureViewSet, basename='pressure')
 
 urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('', include(router.urls)),
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
     path('swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
@@ -32,4 +35,9 @@ urlpatterns = [
     path("user/update/", UserUpdateView.as_view(), name="user-update"),
     path("user/soft-delete/", soft_delete_user, name="user-soft-delete"),
     path("user/hard-delete/", hard_delete_user, name="user-hard-delete"),
+    path("user/hard-delete/<str:job_id>/", purge_job_status, name="user-hard-delete-status"),
+    path("sync/", sync_readings, name="sync"),
+    path("dashboard/", dashboard, name="dashboard"),
+    path("caregiver/patients/", caregiver_patients, name="caregiver-patients"),
+    path("health/", health_check, name="health"),
 ]
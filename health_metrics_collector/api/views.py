@@ -1,20 +1,35 @@
 import logging
+import time
+from datetime import timedelta
 
 from rest_framework import generics, permissions
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.generics import UpdateAPIView
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (
+    action,
+    api_view,
+    authentication_classes,
+    permission_classes,
+    throttle_classes,
+)
 
 from django.core.cache import cache
+from django.db import connections
 from django.http import JsonResponse
+from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from mongoengine.errors import ValidationError as MongoValidationError
 
-from .models import BloodGlucose, BloodPressure
+from .models import BloodGlucose, BloodPressure, CaregiverLink, UserPurgeJob
 from .serializers import (
     BloodGlucoseSerializer,
     BloodPressureSerializer,
@@ -24,11 +39,122 @@ from .serializers import (
     UserUpdatePasswordSerializer,
 )
 from .permissions import IsOwnerPermission
+from .bulk import upsert_readings
+from .readers import GLUCOSE_FIELDS, PRESSURE_FIELDS, cached_rows, glucose_rows, pressure_rows, select_fields
+from .series import append_readings, invalidate_series, load_series, to_epoch_ms
+from .caregiver import patients_overview
+from .dashboard import build_dashboard
+from .forecast import glucose_forecast, update_forecasts
+from .warming import record_read, schedule_warm
+from .analytics import chart_series, glucose_summary, pressure_summary, window
+from .downsampling import METHODS
+from .routing import analytics_read_preference
+from .storage import storage_for
+from .sync import InvalidSyncToken, collect_changes, record_deletion
+from .validation import list_errors, validate_batch
 from .rabbitmq import publish_message
-from .tasks import process_blood_pressure
+from .tasks import process_blood_pressure, purge_user_data
+from health_metrics_collector import mongo
+
+
+def _bad_request(error):
+    return Response({
+        "status": "error",
+        "status_code": status.HTTP_400_BAD_REQUEST,
+        "message": str(error)
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+def _window_start_ms(request):
+    """Mốc bắt đầu (epoch ms) từ query param `days`, None nếu lấy toàn bộ dữ liệu"""
+    days = request.query_params.get("days")
+    if days is None:
+        return None
+    if not days.isdigit() or int(days) < 1:
+        raise ValueError("days must be a positive integer")
+    return to_epoch_ms(timezone.now() - timedelta(days=int(days)))
+
+def _parse_time_param(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"{name} must be an ISO 8601 datetime")
+    return to_epoch_ms(moment)
+
+def _chart_params(request):
+    """Đọc start/end (ISO 8601, mặc định UTC), points và method cho endpoint biểu đồ"""
+    start_ms = _parse_time_param(request, "start")
+    end_ms = _parse_time_param(request, "end")
+    if start_ms is not None and end_ms is not None and start_ms >= end_ms:
+        raise ValueError("start must be before end")
+
+    points = request.query_params.get("points", str(settings.CHART_DEFAULT_POINTS))
+    if not points.isdigit() or not 3 <= int(points) <= settings.CHART_MAX_POINTS:
+        raise ValueError(f"points must be an integer between 3 and {settings.CHART_MAX_POINTS}")
+
+    method = request.query_params.get("method", "lttb")
+    if method not in METHODS:
+        raise ValueError(f"method must be one of: {', '.join(METHODS)}")
+    return start_ms, end_ms, int(points), method
+
+def _chart_response(kind, user_id, value_columns, unit, params):
+    start_ms, end_ms, points, method = params
+    columns = window(load_series(kind, user_id), start_ms=start_ms, end_ms=end_ms)
+    return Response({
+        "unit": unit,
+        "method": method,
+        "total_points": len(columns["timestamps"]),
+        "series": chart_series(columns, value_columns, points, method),
+    })
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets: with ``?fields=timestamp,blood_glucose`` only those fields (and ``id``)
+    are read from MongoDB, serialized and returned, on list, retrieve and export.
+
+    Attributes:
+        reader_fields (tuple): ``(name, converter)`` pairs of the endpoint (see api.readers).
+    """
+    reader_fields = ()
+
+    def requested_fields(self):
+        """Field set từ query param `fields`, None nếu lấy mọi field (ValueError nếu có field không hợp lệ)"""
+        names = self.request.query_params.get("fields")
+        if names is None:
+            return None
+        return select_fields(self.reader_fields, [name.strip() for name in names.split(",") if name.strip()])
+
+    def get_serializer(self, *args, **kwargs):
+        # Chỉ áp dụng khi đọc: serializer đã bỏ field thì cũng bỏ qua dữ liệu ghi vào field đó
+        if self.request is not None and self.request.method == "GET":
+            fields = self.requested_fields()
+            if fields is not None:
+                kwargs["fields"] = [name for name, _ in fields]
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        try:
+            self.requested_fields()
+        except ValueError as e:
+            return _bad_request(e)
+        # get_queryset đã trả về dữ liệu serialize sẵn, chỉ cần phân trang
+        rows = self.get_queryset()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            self.requested_fields()
+        except ValueError as e:
+            return _bad_request(e)
+        return super().retrieve(request, *args, **kwargs)
 
 
-class BloodGlucoseViewSet(ModelViewSet):
+class BloodGlucoseViewSet(SparseFieldsMixin, ModelViewSet):
     """
     A viewset for viewing and editing blood glucose instances.
 
@@ -38,29 +164,115 @@ class BloodGlucoseViewSet(ModelViewSet):
 
     Methods:
         get_queryset():
-            Returns the queryset of BloodGlucose objects filtered by the current user.
+            Returns the current user's BloodGlucose records, already serialized (see api.readers).
         
         perform_create(serializer):
             Saves the serializer with the current user as the owner.
     """
     serializer_class = BloodGlucoseSerializer
     permission_classes = [IsAuthenticated, IsOwnerPermission]
+    reader_fields = GLUCOSE_FIELDS
 
     # Return data of user who is logged in
     def get_queryset(self):
         try:
-            cache_key = f"blood_glucose_list_{self.request.user.id}"
-            queryset = cache.get(cache_key)
-
-            if not queryset:
-                queryset = list(BloodGlucose.objects.filter(user_id=self.request.user.id))
-                cache.set(cache_key, queryset, timeout=300)  # Cache trong 5 phút
-
+            # Danh sách đã serialize (dict) được cache, không hydrate Document; mỗi field set một key
+            fields = self.requested_fields()
+            queryset, cached = cached_rows("glucose", self.request.user.id, fields)
+            record_read(self.request.user.id, cached)
             return queryset
         except Exception as e:
             logging.error(f"Error retrieving blood glucose records: {str(e)}")
             raise NotFound(f"Error retrieving blood glucose records: {str(e)}")
 
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """Xuất toàn bộ dữ liệu đường huyết của user, sắp xếp theo thời gian"""
+        try:
+            fields = self.requested_fields()
+        except ValueError as e:
+            return _bad_request(e)
+        try:
+            # Export là truy vấn nặng: đọc từ secondary (trừ khi user vừa ghi dữ liệu)
+            return Response(glucose_rows(
+                request.user.id,
+                sort=[("timestamp", 1)],
+                read_preference=analytics_read_preference(request.user.id),
+                fields=fields,
+            ))
+        except Exception as e:
+            logging.error(f"Error exporting blood glucose records: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=["get"])
+    def chart(self, request):
+        """
+        Chuỗi đường huyết đã downsample cho biểu đồ: `start`/`end` (ISO 8601),
+        `points` (số điểm tối đa trả về) và `method` (lttb hoặc minmax)
+        """
+        try:
+            params = _chart_params(request)
+        except ValueError as e:
+            return _bad_request(e)
+        try:
+            return _chart_response("glucose", request.user.id, {"blood_glucose": "values"}, "mg/dL", params)
+        except Exception as e:
+            logging.error(f"Error building blood glucose chart: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=["get"])
+    def forecast(self, request):
+        """
+        Xu hướng và giá trị đường huyết dự báo sau `minutes` phút (danh sách, mặc định FORECAST_HORIZONS),
+        tính từ trạng thái Holt đã lưu, không đọc lại dữ liệu đo
+        """
+        minutes = request.query_params.get("minutes")
+        horizons = settings.FORECAST_HORIZONS if minutes is None else minutes.split(",")
+        if not all(str(m).isdigit() and 1 <= int(m) <= settings.FORECAST_MAX_MINUTES for m in horizons):
+            return _bad_request(f"minutes must be integers between 1 and {settings.FORECAST_MAX_MINUTES}")
+        try:
+            result = glucose_forecast(request.user.id, [int(m) for m in horizons])
+        except Exception as e:
+            logging.error(f"Error forecasting blood glucose: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if result is None:
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_404_NOT_FOUND,
+                "message": "No blood glucose readings to forecast from"
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
+
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """Thống kê đường huyết (TIR, CV, GMI, trung bình theo bữa ăn) trong `days` ngày gần nhất"""
+        try:
+            start_ms = _window_start_ms(request)
+        except ValueError as e:
+            return _bad_request(e)
+        try:
+            columns = window(load_series("glucose", request.user.id), start_ms=start_ms)
+            return Response(glucose_summary(columns))
+        except Exception as e:
+            logging.error(f"Error summarizing blood glucose records: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     def perform_create(self, serializer):
         try:
             instance = serializer.save(user_id=self.request.user.id)
@@ -76,6 +288,11 @@ class BloodGlucoseViewSet(ModelViewSet):
                 "unit": instance.unit,
                 "meal": instance.meal,
             }
+            # Bản ghi có client_id có thể là bản ghi cũ được gửi lại: khi đó bỏ series đã cache
+            reading = dict(message, timestamp=instance.timestamp)
+            append_readings("glucose", [reading], exact=not instance.client_id)
+            update_forecasts([reading])
+
             publish_message("blood_glucose_queue", message)
         except Exception as e:
             logging.error(f"Error creating blood glucose record: {str(e)}")
@@ -94,7 +311,7 @@ class BloodGlucoseViewSet(ModelViewSet):
 
             if not obj:
                 try:
-                    obj = BloodGlucose.objects.get(id=pk, user_id=self.request.user.id)
+                    obj = storage_for(BloodGlucose).get(pk, self.request.user.id)
                     cache.set(cache_key, obj, timeout=300)  # Cache trong 5 phút
                 except BloodGlucose.DoesNotExist:
                     logging.error(f"Blood Glucose record not found for id {pk} and user {self.request.user.id}")
@@ -118,6 +335,7 @@ class BloodGlucoseViewSet(ModelViewSet):
                 # Xóa cache sau khi cập nhật
                 cache.delete(f"blood_glucose_list_{self.request.user.id}")
                 cache.delete(f"blood_glucose_{instance.id}_{self.request.user.id}")
+                invalidate_series("glucose", self.request.user.id)
 
                 message = {
                     "user_id": instance.user_id,
@@ -142,7 +360,43 @@ class BloodGlucoseViewSet(ModelViewSet):
                 "message": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class BloodPressureViewSet(ModelViewSet):
+    def perform_destroy(self, instance):
+        storage_for(BloodGlucose).delete(instance)
+        record_deletion("glucose", instance)
+
+        # Xóa cache sau khi xóa
+        cache.delete(f"blood_glucose_list_{self.request.user.id}")
+        cache.delete(f"blood_glucose_{instance.id}_{self.request.user.id}")
+        invalidate_series("glucose", self.request.user.id)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Ghi nhiều bản ghi đường huyết trong một lần, upsert theo client_id"""
+        validated, errors = validate_batch(BloodGlucoseSerializer, request.data, self.get_serializer_context())
+        if errors:
+            return Response(list_errors(errors, len(request.data)), status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # upsert_readings gán timestamp cho từng bản ghi, series đã cache nhận đúng thời điểm được lưu
+            readings = [dict(item, user_id=request.user.id) for item in validated]
+            result = upsert_readings(BloodGlucose, readings)
+            cache.delete(f"blood_glucose_list_{request.user.id}")
+            append_readings("glucose", readings, exact=not result["duplicates"])
+            update_forecasts(readings)
+            return Response({
+                "status": "success",
+                "status_code": status.HTTP_201_CREATED,
+                "message": "Blood glucose records saved successfully",
+                "data": result
+            }, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            logging.error(f"Error bulk creating blood glucose records: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class BloodPressureViewSet(SparseFieldsMixin, ModelViewSet):
     """
     A viewset for viewing and editing blood pressure instances.
     Attributes:
@@ -150,36 +404,97 @@ class BloodPressureViewSet(ModelViewSet):
         permission_classes (list): A list of permission classes that are used to determine access control.
     Methods:
         get_queryset():
-            Returns the queryset of blood pressure instances for the currently authenticated user.
+            Returns the blood pressure records of the currently authenticated user, already serialized.
         perform_create(serializer):
             Saves the serializer with the current user as the owner.
     """
     serializer_class = BloodPressureSerializer
     permission_classes = [IsAuthenticated, IsOwnerPermission]
+    reader_fields = PRESSURE_FIELDS
 
     # Return data of user who is logged in
     def get_queryset(self):
         try:
-            # return BloodPressure.objects.filter(user_id=self.request.user.id)
-            cache_key = f"blood_pressure_list_{self.request.user.id}"
-            queryset = cache.get(cache_key)
-
-            if not queryset:
-                queryset = list(BloodPressure.objects.filter(user_id=self.request.user.id))
-                cache.set(cache_key, queryset, timeout=300)  # Cache trong 5 phút
-
+            fields = self.requested_fields()
+            queryset, cached = cached_rows("pressure", self.request.user.id, fields)
+            record_read(self.request.user.id, cached)
             return queryset
         except Exception as e:
             logging.error(f"Error retrieving blood pressure records: {str(e)}")
             raise NotFound(f"Error retrieving blood pressure records: {str(e)}")
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """Xuất toàn bộ dữ liệu huyết áp của user, sắp xếp theo thời gian"""
+        try:
+            fields = self.requested_fields()
+        except ValueError as e:
+            return _bad_request(e)
+        try:
+            # Export là truy vấn nặng: đọc từ secondary (trừ khi user vừa ghi dữ liệu)
+            return Response(pressure_rows(
+                request.user.id,
+                sort=[("timestamp", 1)],
+                read_preference=analytics_read_preference(request.user.id),
+                fields=fields,
+            ))
+        except Exception as e:
+            logging.error(f"Error exporting blood pressure records: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=["get"])
+    def chart(self, request):
+        """
+        Chuỗi huyết áp (tâm thu/tâm trương) đã downsample cho biểu đồ: `start`/`end` (ISO 8601),
+        `points` (số điểm tối đa trả về) và `method` (lttb hoặc minmax)
+        """
+        try:
+            params = _chart_params(request)
+        except ValueError as e:
+            return _bad_request(e)
+        try:
+            return _chart_response("pressure", request.user.id, {"systolic": "systolic", "diastolic": "diastolic"}, "mm Hg", params)
+        except Exception as e:
+            logging.error(f"Error building blood pressure chart: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """Thống kê huyết áp (trung bình, phân loại theo giai đoạn) trong `days` ngày gần nhất"""
+        try:
+            start_ms = _window_start_ms(request)
+        except ValueError as e:
+            return _bad_request(e)
+        try:
+            columns = window(load_series("pressure", request.user.id), start_ms=start_ms)
+            return Response(pressure_summary(columns))
+        except Exception as e:
+            logging.error(f"Error summarizing blood pressure records: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     # Save the serializer with the current user as the owner
     def perform_create(self, serializer):
         try:
+            # Gán timestamp khi nhận: batch có thể nằm trong cache vài phút và worker có thể xử lý lại,
+            # nếu để worker gán thì lần thử lại sang tháng mới sẽ ghi vào partition khác (trùng client_id)
             message = {
                 "user_id": self.request.user.id,
                 "systolic": serializer.validated_data["systolic"],
                 "diastolic": serializer.validated_data["diastolic"],
+                "client_id": serializer.validated_data.get("client_id"),
+                "timestamp": timezone.now().isoformat(),
             }
             print("Message:", message)
             # Batch message vào Memcached
@@ -211,7 +526,7 @@ class BloodPressureViewSet(ModelViewSet):
 
             if not obj:
                 try:
-                    obj = BloodPressure.objects.get(id=pk, user_id=self.request.user.id)
+                    obj = storage_for(BloodPressure).get(pk, self.request.user.id)
                     cache.set(cache_key, obj, timeout=300)  # Cache trong 5 phút
                 except BloodPressure.DoesNotExist:
                     raise NotFound("Blood Pressure record not found")
@@ -235,6 +550,7 @@ class BloodPressureViewSet(ModelViewSet):
                 # Xóa cache sau khi cập nhật
                 cache.delete(f"blood_pressure_list_{self.request.user.id}")
                 cache.delete(f"blood_pressure_{instance.id}_{self.request.user.id}")
+                invalidate_series("pressure", self.request.user.id)
 
                 message = {
                     "user_id": instance.user_id,
@@ -257,12 +573,57 @@ class BloodPressureViewSet(ModelViewSet):
                 "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
                 "message": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def perform_destroy(self, instance):
+        storage_for(BloodPressure).delete(instance)
+        record_deletion("pressure", instance)
+
+        # Xóa cache sau khi xóa
+        cache.delete(f"blood_pressure_list_{self.request.user.id}")
+        cache.delete(f"blood_pressure_{instance.id}_{self.request.user.id}")
+        invalidate_series("pressure", self.request.user.id)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Gửi nhiều bản ghi huyết áp vào hàng đợi trong một lần, worker sẽ upsert theo client_id"""
+        validated, errors = validate_batch(BloodPressureSerializer, request.data, self.get_serializer_context())
+        if errors:
+            return Response(list_errors(errors, len(request.data)), status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Như perform_create: timestamp cố định từ lúc nhận để worker xử lý lại vẫn ghi cùng partition
+            now = timezone.now().isoformat()
+            batch = [{
+                "user_id": request.user.id,
+                "systolic": item["systolic"],
+                "diastolic": item["diastolic"],
+                "client_id": item.get("client_id"),
+                "timestamp": now,
+            } for item in validated]
+            publish_message("blood_pressure_queue", batch)
+            return Response({
+                "status": "success",
+                "status_code": status.HTTP_202_ACCEPTED,
+                "message": "Blood pressure records queued successfully",
+                "data": {"queued": len(batch)}
+            }, status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            logging.error(f"Error bulk creating blood pressure records: {str(e)}")
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
 
 class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
 
+def _warm_after_token(response):
+    """Làm nóng cache (chạy nền) cho user của access token vừa cấp."""
+    if response.status_code == status.HTTP_200_OK and "access" in response.data:
+        schedule_warm(AccessToken(response.data["access"])[jwt_settings.USER_ID_CLAIM])
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
@@ -271,6 +632,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             response = super().post(request, *args, **kwargs)
             print("Access Token:", response.data['access']) 
             print("Refresh Token:", response.data['refresh'])
+            _warm_after_token(response)
             return response
         except Exception as e:
             logging.error(f"Error logging in: {str(e)}")
@@ -280,6 +642,12 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                 "message": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+class CustomTokenRefreshView(TokenRefreshView):
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        _warm_after_token(response)
+        return response
+
 class UserUpdateView(UpdateAPIView):
     serializer_class = UserUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -341,6 +709,153 @@ class UserUpdatePasswordView(UpdateAPIView):
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sync_readings(request):
+    """
+    Trả về các bản ghi đường huyết/huyết áp được tạo, sửa hoặc xóa kể từ sync token `since`,
+    kèm token mới cho lần đồng bộ tiếp theo. Đồng bộ lại toàn bộ được chia trang theo `cursor`.
+    """
+    try:
+        changes = collect_changes(
+            request.user.id, request.query_params.get("since"), request.query_params.get("cursor"),
+        )
+    except InvalidSyncToken as e:
+        return Response({
+            "status": "error",
+            "status_code": status.HTTP_400_BAD_REQUEST,
+            "message": str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logging.error(f"Error syncing readings: {str(e)}")
+        return Response({
+            "status": "error",
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "message": str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(changes, status=status.HTTP_200_OK)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def dashboard(request):
+    """
+    Dữ liệu màn hình chính trong một request: bản ghi gần nhất và thống kê của đường huyết/huyết áp.
+    Section quá DASHBOARD_TIMEOUT_SECONDS hoặc bị lỗi trả về null, các section khác vẫn được trả về.
+    """
+    try:
+        data, sections = build_dashboard(request.user.id)
+    except Exception as e:
+        logging.error(f"Error building dashboard: {str(e)}")
+        return Response({
+            "status": "error",
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "message": str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    complete = all(section["status"] == "ok" for section in sections.values())
+    record_read(request.user.id, all(section.get("cached") for section in sections.values()))
+    return Response({
+        "status": "success" if complete else "partial",
+        "status_code": status.HTTP_200_OK,
+        "data": data,
+        "sections": sections,
+    }, status=status.HTTP_200_OK)
+
+def _patient_ids(request):
+    """Danh sách id trong query param `user_ids` (phân tách bằng dấu phẩy, bỏ trùng), None nếu không truyền"""
+    value = request.query_params.get("user_ids")
+    if value is None:
+        return None
+    parts = [part.strip() for part in value.split(",") if part.strip()]
+    if not parts or not all(part.isdigit() for part in parts):
+        raise ValueError("user_ids must be a comma-separated list of user ids")
+    user_ids = list(dict.fromkeys(int(part) for part in parts))
+    if len(user_ids) > settings.CAREGIVER_MAX_PATIENTS:
+        raise ValueError(f"At most {settings.CAREGIVER_MAX_PATIENTS} user_ids per request")
+    return user_ids
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def caregiver_patients(request):
+    """
+    Bản ghi mới nhất và thống kê CAREGIVER_SUMMARY_DAYS ngày gần nhất của nhiều bệnh nhân trong một request.
+    `user_ids` mặc định là mọi bệnh nhân đang hoạt động được liên kết (tối đa CAREGIVER_MAX_PATIENTS);
+    user luôn được đọc dữ liệu của chính mình.
+    """
+    try:
+        user_ids = _patient_ids(request)
+    except ValueError as e:
+        return _bad_request(e)
+
+    links = CaregiverLink.objects.filter(caregiver=request.user, patient__is_active=True)
+    if user_ids is None:
+        user_ids = list(
+            links.order_by("patient_id").values_list("patient_id", flat=True)[:settings.CAREGIVER_MAX_PATIENTS]
+        )
+    else:
+        allowed = set(links.filter(patient_id__in=user_ids).values_list("patient_id", flat=True))
+        allowed.add(request.user.id)
+        denied = [user_id for user_id in user_ids if user_id not in allowed]
+        if denied:
+            return Response({
+                "status": "error",
+                "status_code": status.HTTP_403_FORBIDDEN,
+                "message": f"Not allowed to read the data of users: {', '.join(map(str, denied))}"
+            }, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        patients, cache_stats = patients_overview(user_ids)
+    except Exception as e:
+        logging.error(f"Error reading caregiver patients: {str(e)}")
+        return Response({
+            "status": "error",
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "message": str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response({
+        "status": "success",
+        "status_code": status.HTTP_200_OK,
+        "data": {"days": settings.CAREGIVER_SUMMARY_DAYS, "patients": patients},
+        "cache": cache_stats,
+    }, status=status.HTTP_200_OK)
+
+def _timed_check(check):
+    started = time.perf_counter()
+    try:
+        check()
+        result = {"status": "ok"}
+    except Exception as e:
+        result = {"status": "error", "message": str(e)}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+def _check_mysql():
+    with connections["default"].cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+def _check_cache():
+    cache.set("health_check", "ok", timeout=10)
+    if cache.get("health_check") != "ok":
+        raise RuntimeError("Cache read-back failed")
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+@throttle_classes([])
+def health_check(request):
+    """Kiểm tra kết nối tới MongoDB, MySQL và cache (dùng cho load balancer / orchestrator)"""
+    checks = {
+        "mongodb": _timed_check(mongo.ping),
+        "mysql": _timed_check(_check_mysql),
+        "cache": _timed_check(_check_cache),
+    }
+    healthy = all(check["status"] == "ok" for check in checks.values())
+    code = status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE
+    return Response({
+        "status": "ok" if healthy else "error",
+        "status_code": code,
+        "checks": checks,
+    }, status=code)
+
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def soft_delete_user(request):
@@ -371,21 +886,26 @@ def hard_delete_user(request):
     """
     Xóa cứng user: xóa khỏi hệ thống và xóa dữ liệu liên quan.
     Chỉ admin hoặc user có quyền cao mới nên thực hiện.
+
+    Việc xóa chạy nền (Celery) theo từng chunk; API trả về job_id để theo dõi tiến độ.
     """
     user = request.user
     if not user.is_staff:  # Chỉ admin mới có quyền xóa vĩnh viễn
         return Response({"message": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
     try:
-        # Xóa dữ liệu sức khỏe liên quan trong MySQL
-        BloodGlucose.objects.filter(user_id=user.id).delete()
-        BloodPressure.objects.filter(user_id=user.id).delete()
-        # Xóa user khỏi cơ sở dữ liệu MySQL (xóa vĩnh viễn)
-        user.delete()
+        # Khóa tài khoản ngay để không còn dữ liệu mới được ghi trong lúc xóa
+        user.is_active = False
+        user.save(update_fields=["is_active"])
+
+        job = UserPurgeJob(user_id=user.id, requested_by=user.id)
+        job.save()
+        purge_user_data.delay(str(job.id))
         return Response({
             "status": "success",
-            "status_code": status.HTTP_200_OK,
-            "message": "User and all related health data have been permanently deleted."
-        }, status=status.HTTP_200_OK)
+            "status_code": status.HTTP_202_ACCEPTED,
+            "message": "User deletion has been scheduled.",
+            "data": {"job_id": str(job.id)}
+        }, status=status.HTTP_202_ACCEPTED)
     except Exception as e:
         logging.error(f"Error hard deleting user: {str(e)}")
         return Response({
@@ -393,3 +913,27 @@ def hard_delete_user(request):
             "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
             "message": str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def purge_job_status(request, job_id):
+    """Xem tiến độ của job xóa cứng user"""
+    try:
+        job = UserPurgeJob.objects(id=job_id).first()
+    except MongoValidationError:
+        job = None
+    if job is None:
+        raise NotFound("Purge job not found")
+    return Response({
+        "status": "success",
+        "status_code": status.HTTP_200_OK,
+        "data": {
+            "job_id": str(job.id),
+            "user_id": job.user_id,
+            "status": job.status,
+            "deleted": job.deleted,
+            "error": job.error,
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
+        }
+    }, status=status.HTTP_200_OK)
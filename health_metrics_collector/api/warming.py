@@ -0,0 +1,107 @@
+"""
+Cache warming after login and token refresh.
+
+The first screen after a login reads the reading lists, the series behind the summaries and
+the dashboard sections, all of which are usually cold by then. ``schedule_warm`` enqueues a
+``warm_user_cache`` task on the ``cache_warm`` queue so they are filled in the background
+while the app is still starting.
+
+- Shared cache: the entries are filled in the worker's process, so warming needs a cache
+  shared with the web processes (``CACHE_BACKEND``). With a process-local cache no job is
+  scheduled.
+- Deduplication: at most one warm job per user every ``CACHE_WARM_DEDUP_SECONDS``; further
+  logins and refreshes in that window are only counted.
+- Metrics (``manage.py cache_warm_stats``): jobs, deduplicated requests, entries filled or
+  already cached, and the warm-hit ratio, i.e. the share of list/dashboard reads served from
+  the cache during the ``CACHE_WARM_TRACK_SECONDS`` that follow a warm job.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import cache_is_shared
+from .dashboard import SECTIONS, load_section
+from .readers import LIST_CACHE_PREFIXES, cached_rows
+
+COUNTERS = ('scheduled', 'deduplicated', 'jobs', 'filled', 'already_cached', 'hits', 'misses')
+
+
+def _pending_key(user_id):
+    return f"cache_warm_pending_{user_id}"
+
+
+def _warmed_key(user_id):
+    return f"cache_warm_warmed_{user_id}"
+
+
+def _count(name, amount=1):
+    key = f"cache_warm_{name}"
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Counter chưa tồn tại: tạo mới, nếu process khác đã kịp tạo thì incr lại
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def schedule_warm(user_id):
+    """Xếp job làm nóng cache cho user, bỏ qua nếu user đã có job trong CACHE_WARM_DEDUP_SECONDS."""
+    if not settings.CACHE_WARM_ENABLED:
+        return False
+    if not cache_is_shared():
+        # Worker chỉ làm nóng bộ nhớ của chính nó, process web không đọc được
+        logging.warning("Cache warming skipped: the cache backend is not shared between processes")
+        return False
+    try:
+        if not cache.add(_pending_key(user_id), 1, timeout=settings.CACHE_WARM_DEDUP_SECONDS):
+            _count('deduplicated')
+            return False
+        from .tasks import warm_user_cache  # tasks import module này: import muộn để tránh vòng lặp
+        warm_user_cache.apply_async(args=[user_id])
+        _count('scheduled')
+        return True
+    except Exception as e:
+        # Làm nóng cache không được làm hỏng đăng nhập
+        logging.error(f"Error scheduling cache warm for user {user_id}: {e}")
+        return False
+
+
+def warm(user_id):
+    """
+    Fill the cache entries read by the first screens of ``user_id``.
+
+    Returns:
+        dict: ``{'filled': n, 'already_cached': n}``.
+    """
+    cached = [cached_rows(kind, user_id)[1] for kind in LIST_CACHE_PREFIXES]
+    # Section thống kê dựng luôn series (<kind>_series_<user_id>) mà endpoint summary/chart dùng
+    cached += [load_section(name, user_id)[1] for name in SECTIONS]
+    filled, already_cached = cached.count(False), cached.count(True)
+
+    cache.set(_warmed_key(user_id), 1, timeout=settings.CACHE_WARM_TRACK_SECONDS)
+    _count('jobs')
+    _count('filled', filled)
+    _count('already_cached', already_cached)
+    return {'filled': filled, 'already_cached': already_cached}
+
+
+def record_read(user_id, cached):
+    """Ghi nhận một lần đọc danh sách/dashboard nếu user vừa được làm nóng cache."""
+    if not settings.CACHE_WARM_ENABLED:
+        return
+    try:
+        if cache.get(_warmed_key(user_id)):
+            _count('hits' if cached else 'misses')
+    except Exception as e:
+        # Counter chỉ để đo hiệu quả làm nóng: không được làm hỏng request đọc
+        logging.error(f"Error recording cache warm read for user {user_id}: {e}")
+
+
+def warm_stats():
+    """Giá trị các counter và warm-hit ratio (None khi chưa có lần đọc nào sau warm)."""
+    values = cache.get_many([f"cache_warm_{name}" for name in COUNTERS])
+    stats = {name: values.get(f"cache_warm_{name}", 0) for name in COUNTERS}
+    reads = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / reads, 3) if reads else None
+    return stats
@@ -1,17 +1,27 @@
-import pika
-import json
+import logging
 import os
 
+import pika
+
+from api.codec import decode_message
+from api.queues import declare_raw_queue
+
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
 
 def callback(ch, method, properties, body):
     """Hàm xử lý message từ RabbitMQ"""
-    data = json.loads(body)
-    print("Testing!!!")
-    print(f"Received message: {data}")
-
-    # Giả lập lưu trữ hoặc xử lý (ở đây chỉ in ra)
-    # Bạn có thể lưu vào cơ sở dữ liệu khác hoặc kích hoạt cảnh báo
+    try:
+        data = decode_message(body, properties.content_type)
+        print("Testing!!!")
+        print(f"Received message: {data}")
+
+        # Giả lập lưu trữ hoặc xử lý (ở đây chỉ in ra)
+        # Bạn có thể lưu vào cơ sở dữ liệu khác hoặc kích hoạt cảnh báo
+    except Exception as e:
+        # Message lỗi không được requeue (tránh chặn queue): RabbitMQ chuyển nó sang <queue>.dead
+        logging.error(f"Rejected message: {e}")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+        return
     ch.basic_ack(delivery_tag=method.delivery_tag)  # Xác nhận đã xử lý
 
 def consume(queue_name):
@@ -19,8 +29,8 @@ def consume(queue_name):
     connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
     channel = connection.channel()
 
-    # Đảm bảo queue tồn tại
-    channel.queue_declare(queue=queue_name, durable=True)
+    # Đảm bảo queue (và dead-letter queue của nó) tồn tại
+    declare_raw_queue(channel, queue_name)
 
     # Đặt prefetch_count để kiểm soát số message worker nhận cùng lúc
     channel.basic_qos(prefetch_count=1)
@@ -0,0 +1,417 @@
+"""
+Synthetic workload: realistic, deterministic datasets, API load replay and ingestion probes.
+
+Every user's series is generated from ``np.random.default_rng((seed, user_index, stream))``, so
+the same seed always produces the same data, whatever the number of worker processes or
+the order in which users are generated.
+
+- Glucose follows a CGM profile: a per-user baseline, a circadian swing, three meals a day
+  with jittered times and a gamma-shaped post-meal rise, and AR(1) sensor noise.
+- Blood pressure is measured twice a day (morning and evening) around a per-user baseline
+  with a morning surge.
+"""
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .series import MEALS
+
+MINUTE_MS = 60 * 1000
+DAY_MS = 24 * 60 * MINUTE_MS
+# Giờ ăn trung bình trong ngày (phút từ 0h) và độ lệch chuẩn
+MEAL_TIMES = ((7 * 60 + 30, 30), (12 * 60 + 30, 40), (19 * 60, 45))
+PRESSURE_TIMES = ((7 * 60, 30), (21 * 60, 40))
+# user_id của bản ghi do probe_ingestion gửi: nằm ngoài khoảng id của user thật
+PROBE_USER_BASE = 2 ** 40
+
+
+GLUCOSE_STREAM, PRESSURE_STREAM = 0, 1
+
+
+def _rng(seed, user_index, stream):
+    return np.random.default_rng((seed, user_index, stream))
+
+
+def glucose_series(seed, user_index, start, days, interval_minutes=5):
+    """
+    Synthetic CGM series of one user.
+
+    Args:
+        seed (int): Dataset seed.
+        user_index (int): Position of the user in the dataset.
+        start (datetime): Naive UTC midnight of the first day.
+        days (int): Number of days.
+        interval_minutes (int): Minutes between readings (5 for a CGM).
+
+    Returns:
+        tuple: ``(timestamps, values, meals)``: datetime64[ms] array, mg/dL float array and
+        an array of meal labels.
+    """
+    rng = _rng(seed, user_index, GLUCOSE_STREAM)
+    minutes = np.arange(0, days * 24 * 60, interval_minutes, dtype=np.int64)
+    minute_of_day = minutes % (24 * 60)
+
+    # Mức nền của user: phần lớn ổn định, một phần kiểm soát kém
+    baseline = rng.normal(105, 10) if rng.random() < 0.7 else rng.normal(150, 20)
+    values = baseline + 8 * np.sin(2 * np.pi * (minute_of_day - 4 * 60) / (24 * 60))
+
+    # Giờ ăn (phút từ đầu khoảng thời gian) và mức tăng đường huyết của từng bữa
+    meal_minutes = np.concatenate([
+        np.arange(days) * 24 * 60 + rng.normal(mean, spread, days) for mean, spread in MEAL_TIMES
+    ])
+    rises = rng.uniform(25, 90, len(meal_minutes))
+    order = np.argsort(meal_minutes)
+    meal_minutes, rises = meal_minutes[order], rises[order]
+
+    # Đường huyết tăng sau bữa ăn: hàm gamma, đỉnh 50 phút sau khi ăn, kéo dài tối đa 4 giờ.
+    # Mỗi thời điểm chỉ chịu ảnh hưởng của vài bữa gần nhất trước đó.
+    nxt = np.searchsorted(meal_minutes, minutes, side='left')
+    for back in range(1, 4):
+        index = nxt - back
+        valid = index >= 0
+        since = np.where(valid, minutes - meal_minutes[np.clip(index, 0, None)], -1)
+        active = valid & (since > 0) & (since < 240)
+        t = since[active] / 50.0
+        values[active] += rises[index[active]] * t * np.exp(1 - t)
+
+    # Nhiễu cảm biến AR(1)
+    noise = rng.normal(0, 4, len(minutes))
+    noise = np.frompyfunc(lambda previous, current: 0.8 * previous + current, 2, 1).accumulate(noise).astype(np.float64)
+    values = np.clip(values + noise, 40, 400).round(1)
+
+    # Nhãn bữa ăn: sau ăn trong 2 giờ, trước ăn 1 giờ, đêm khuya/sáng sớm là fasting, tối muộn là before bed
+    prev_meal = meal_minutes[np.clip(nxt - 1, 0, None)]
+    next_meal = meal_minutes[np.clip(nxt, None, len(meal_minutes) - 1)]
+    labels = np.full(len(minutes), MEALS[0], dtype=object)
+    labels[(minute_of_day < 6 * 60) | (minute_of_day >= 23 * 60)] = MEALS[2]
+    labels[(minute_of_day >= 21 * 60) & (minute_of_day < 23 * 60)] = MEALS[3]
+    labels[(next_meal - minutes > 0) & (next_meal - minutes <= 60)] = MEALS[0]
+    labels[(nxt > 0) & (minutes - prev_meal >= 0) & (minutes - prev_meal <= 120)] = MEALS[1]
+
+    timestamps = np.datetime64(start, 'ms') + minutes.astype('timedelta64[m]')
+    return timestamps, values, labels
+
+
+def pressure_series(seed, user_index, start, days):
+    """
+    Synthetic twice-daily blood pressure readings of one user.
+
+    Returns:
+        tuple: ``(timestamps, systolic, diastolic)`` arrays.
+    """
+    rng = _rng(seed, user_index, PRESSURE_STREAM)
+    baseline = rng.normal(128, 14)
+    minutes, systolic = [], []
+    for mean, spread in PRESSURE_TIMES:
+        minutes.append(np.arange(days) * 24 * 60 + rng.normal(mean, spread, days))
+        surge = 6 if mean < 12 * 60 else 0
+        systolic.append(baseline + surge + rng.normal(0, 8, days))
+    order = np.argsort(np.concatenate(minutes))
+    minutes = np.concatenate(minutes)[order].astype(np.int64)
+    systolic = np.clip(np.concatenate(systolic)[order], 85, 220).round()
+    diastolic = np.clip(0.6 * systolic + rng.normal(5, 5, len(systolic)), 50, 130).round()
+
+    timestamps = np.datetime64(start, 'ms') + minutes.astype('timedelta64[m]')
+    return timestamps, systolic.astype(np.int64), diastolic.astype(np.int64)
+
+
+def glucose_documents(seed, user_index, user_id, start, days, interval_minutes=5):
+    """Raw BloodGlucose documents of one user, ready for ``insert_many``."""
+    timestamps, values, meals = glucose_series(seed, user_index, start, days, interval_minutes)
+    timestamps = timestamps.tolist()
+    return [{
+        'user_id': user_id,
+        'blood_glucose': value,
+        'unit': 'mg/dL',
+        'timestamp': timestamp,
+        'meal': meal,
+        'updated_at': timestamp,
+    } for timestamp, value, meal in zip(timestamps, values.tolist(), meals.tolist())]
+
+
+def pressure_documents(seed, user_index, user_id, start, days):
+    """Raw BloodPressure documents of one user, ready for ``insert_many``."""
+    timestamps, systolic, diastolic = pressure_series(seed, user_index, start, days)
+    timestamps = timestamps.tolist()
+    return [{
+        'user_id': user_id,
+        'systolic': s,
+        'diastolic': d,
+        'timestamp': timestamp,
+        'unit': 'mm Hg',
+        'updated_at': timestamp,
+    } for timestamp, s, d in zip(timestamps, systolic.tolist(), diastolic.tolist())]
+
+
+def phone_number(index, prefix='08'):
+    """Số điện thoại hợp lệ (theo User.phone_regex) và duy nhất cho user thứ ``index``."""
+    return f"{prefix}{index:08d}"
+
+
+def workload_start(days, now=None):
+    """Nửa đêm (UTC, naive) của ngày đầu tiên, sao cho dữ liệu kết thúc hôm nay."""
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def load_rate_profile(path):
+    """
+    Read a recorded ingestion rate.
+
+    The file is a CSV of ``offset_seconds,requests_per_second`` rows (header optional).
+    Each rate holds until the next offset. The last row only marks the end.
+
+    Returns:
+        list: ``(offset_seconds, requests_per_second)`` sorted by offset.
+    """
+    steps = []
+    with open(path) as f:
+        for line in f:
+            parts = [part.strip() for part in line.split(',')]
+            if len(parts) < 2:
+                continue
+            try:
+                steps.append((float(parts[0]), float(parts[1])))
+            except ValueError:
+                continue  # dòng tiêu đề
+    if len(steps) < 2:
+        raise ValueError(f"{path}: a rate profile needs at least two rows")
+    return sorted(steps)
+
+
+def _request(url, payload=None, token=None, timeout=10):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, method='POST' if data else 'GET')
+    request.add_header('Content-Type', 'application/json')
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def login(base_url, phone, password):
+    status, body = _request(f"{base_url}/login/", {'phone_number': phone, 'password': password})
+    if status != 200:
+        raise RuntimeError(f"Login failed for {phone}: HTTP {status}")
+    return json.loads(body)['access']
+
+
+def reading_payload(rng, kind):
+    if kind == 'glucose':
+        return {
+            'blood_glucose': round(rng.gauss(130, 35), 1),
+            'unit': 'mg/dL',
+            'meal': rng.choice(MEALS),
+        }
+    systolic = round(rng.gauss(128, 14))
+    return {'systolic': systolic, 'diastolic': round(0.6 * systolic + rng.gauss(5, 5))}
+
+
+class ReplayStats:
+    """Thread-safe latency and status counters of a replay run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.statuses = {}
+
+    def record(self, status, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self, elapsed):
+        latencies = np.asarray(self.latencies) * 1000
+        p50, p95, p99 = np.percentile(latencies, (50, 95, 99)) if len(latencies) else (0, 0, 0)
+        return {
+            'requests': len(latencies),
+            'elapsed_seconds': round(elapsed, 1),
+            'achieved_rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+            'latency_ms': {'p50': round(float(p50), 1), 'p95': round(float(p95), 1), 'p99': round(float(p99), 1)},
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+        }
+
+
+def replay(base_url, tokens, profile, speedup=1.0, threads=32, pressure_share=0.2, seed=42, on_progress=None):
+    """
+    Send reading POSTs to the API following a recorded rate profile.
+
+    Requests are scheduled open-loop (at the profile's rate whatever the latency), spread
+    over the logged-in users, and sent from a thread pool.
+
+    Args:
+        base_url (str): API root, e.g. ``http://localhost:8000/api``.
+        tokens (list): Access tokens of the users to write as.
+        profile (list): Output of ``load_rate_profile``.
+        speedup (float): Play the profile this many times faster.
+        threads (int): Concurrent connections.
+        pressure_share (float): Fraction of requests that are blood pressure readings.
+
+    Returns:
+        dict: Request count, achieved rate, latency percentiles and status counts.
+    """
+    rng = random.Random(seed)
+    stats = ReplayStats()
+    lock = threading.Lock()
+
+    def send(kind, token):
+        with lock:
+            payload = reading_payload(rng, kind)
+        started = time.perf_counter()
+        try:
+            status, _ = _request(f"{base_url}/{kind}/", payload, token)
+        except OSError:
+            status = 'connection_error'
+        stats.record(status, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for (offset, rate), (next_offset, _) in zip(profile, profile[1:]):
+            step_start = started + (offset - profile[0][0]) / speedup
+            step_end = started + (next_offset - profile[0][0]) / speedup
+            interval = 1.0 / (rate * speedup) if rate > 0 else None
+            at = step_start
+            while interval is not None and at < step_end:
+                delay = at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                kind = 'pressure' if rng.random() < pressure_share else 'glucose'
+                pool.submit(send, kind, rng.choice(tokens))
+                at += interval
+            delay = step_end - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if on_progress:
+                on_progress(offset, rate, len(stats.latencies))
+    return stats.summary(time.perf_counter() - started)
+
+
+def insert_user_readings(users, seed, start, days, interval_minutes=5, kinds=('glucose', 'pressure'), batch_size=20000):
+    """
+    Generate and insert the readings of ``users`` (a list of ``(user_index, user_id)``).
+
+    Users that already have readings of a kind are skipped for that kind, so an
+    interrupted run can simply be started again.
+
+    Returns:
+        dict: Number of readings inserted per kind.
+    """
+    from .models import BloodGlucose, BloodPressure
+    from .storage import storage_for
+
+    builders = {
+        'glucose': (BloodGlucose, lambda index, user_id: glucose_documents(seed, index, user_id, start, days, interval_minutes)),
+        'pressure': (BloodPressure, lambda index, user_id: pressure_documents(seed, index, user_id, start, days)),
+    }
+    inserted = {}
+    for kind in kinds:
+        document_cls, build = builders[kind]
+        storage = storage_for(document_cls)
+        existing = storage.distinct('user_id', {'user_id': {'$in': [user_id for _, user_id in users]}})
+        inserted[kind] = 0
+        batch = []
+        for index, user_id in users:
+            if user_id in existing:
+                continue
+            batch.extend(build(index, user_id))
+            while len(batch) >= batch_size:
+                inserted[kind] += storage.insert_many(batch[:batch_size])[0]
+                batch = batch[batch_size:]
+        if batch:
+            inserted[kind] += storage.insert_many(batch)[0]
+    return inserted
+
+
+def probe_ingestion(rate, duration, batch_size=10, users=10, timeout=30.0, seed=42, poll_interval=0.05):
+    """
+    Measure ingestion latency through the Celery ``ingestion`` queue.
+
+    Sends ``process_blood_glucose`` batches at ``rate`` batches per second for ``duration``
+    seconds and polls MongoDB for each batch: its latency is the time from ``apply_async``
+    until its last reading is readable. The batches belong to ``users`` probe user ids above
+    ``PROBE_USER_BASE``; call ``cleanup_probe`` afterwards.
+
+    Returns:
+        dict: Like ``replay``: batch count, latency percentiles and status counts
+        (``ok``, or ``timeout`` when a batch is not written within ``timeout`` seconds).
+    """
+    from .models import BloodGlucose
+    from .storage import storage_for
+    from .tasks import process_blood_glucose
+
+    rng = random.Random(seed)
+    user_ids = [PROBE_USER_BASE + index for index in range(users)]
+    run = uuid.uuid4().hex[:8]
+    stats = ReplayStats()
+    pending = {}  # client_id của dòng cuối batch -> thời điểm gửi
+    lock = threading.Lock()
+    sending = threading.Event()
+    sending.set()
+
+    def poll():
+        storage = storage_for(BloodGlucose)
+        while sending.is_set() or pending:
+            with lock:
+                waiting = dict(pending)
+            if waiting:
+                found = {doc['client_id'] for doc in storage.find(
+                    {'user_id': {'$in': user_ids}, 'client_id': {'$in': list(waiting)}}, {'client_id': 1},
+                )}
+                now = time.perf_counter()
+                with lock:
+                    for client_id, sent_at in waiting.items():
+                        if client_id in found:
+                            stats.record('ok', now - sent_at)
+                        elif now - sent_at > timeout:
+                            stats.record('timeout', now - sent_at)
+                        else:
+                            continue
+                        del pending[client_id]
+            time.sleep(poll_interval)
+
+    poller = threading.Thread(target=poll, name='probe-poller', daemon=True)
+    poller.start()
+    started = time.perf_counter()
+    sent = 0
+    try:
+        while sent / rate < duration:
+            delay = started + sent / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            batch = [
+                dict(reading_payload(rng, 'glucose'), user_id=rng.choice(user_ids), client_id=f"probe:{run}:{sent}:{row}")
+                for row in range(batch_size)
+            ]
+            with lock:
+                pending[batch[-1]['client_id']] = time.perf_counter()
+            process_blood_glucose.apply_async(args=[batch])
+            sent += 1
+    finally:
+        sending.clear()
+        poller.join()
+    return stats.summary(time.perf_counter() - started)
+
+
+def cleanup_probe(users=10):
+    """Xóa bản ghi, series và trạng thái dự báo của các user id mà probe_ingestion đã dùng."""
+    from .models import BloodGlucose, GlucoseForecast
+    from .series import invalidate_series
+    from .storage import storage_for
+
+    user_ids = [PROBE_USER_BASE + index for index in range(users)]
+    deleted = storage_for(BloodGlucose).delete_many({'user_id': {'$in': user_ids}})
+    GlucoseForecast._get_collection().delete_many({'user_id': {'$in': user_ids}})
+    for user_id in user_ids:
+        invalidate_series('glucose', user_id)
+    return deleted
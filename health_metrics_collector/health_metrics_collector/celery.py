@@ -1,9 +1,14 @@
 import os
 from celery import Celery
+from celery.signals import worker_init
+from django.conf import settings
 
 # Cấu hình Celery với Django settings
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "health_metrics_collector.settings")
 
+from api import codec  # noqa: E402,F401  (đăng ký serializer health-msgpack với kombu)
+from api.queues import declare_topology, task_queues, task_routes  # noqa: E402
+
 app = Celery("health_metrics_collector")
 
 # Nạp config từ settings.py, dùng biến có tiền tố "CELERY_"
@@ -16,5 +21,27 @@ app.conf.update(
     task_acks_late=True,  # Đảm bảo chỉ ACK sau khi xử lý xong
     worker_prefetch_multiplier=1,  # Mỗi worker chỉ lấy 1 task để tránh overload
     task_reject_on_worker_lost=True,  # Trả lại task nếu worker bị mất kết nối
-    broker_heartbeat=10  # Kiểm tra kết nối với RabbitMQ mỗi 10s
+    broker_heartbeat=10,  # Kiểm tra kết nối với RabbitMQ mỗi 10s
 )
+
+
+def queue_config():
+    """Queue và route của task (xem api/queues.py): đọc Django settings nên chỉ được gọi khi Celery nạp config."""
+    return {
+        # Mỗi loại task chạy trên queue riêng, có pool worker riêng
+        "task_queues": task_queues(),
+        "task_routes": task_routes(),
+        "task_queue_max_priority": settings.TASK_MAX_PRIORITY,
+        "task_default_priority": settings.TASK_QUEUE_SETTINGS["celery"]["priority"],
+    }
+
+
+# celery.py được import từ __init__ của project, trước khi settings nạp xong: cấu hình queue lúc cần
+app.add_defaults(queue_config)
+
+
+@worker_init.connect
+def declare_queues(sender=None, **kwargs):
+    """Khai báo delay queue và dead-letter queue trước khi worker nhận task."""
+    with app.connection_for_write() as connection:
+        declare_topology(connection)
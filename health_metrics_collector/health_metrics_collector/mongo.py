@@ -0,0 +1,65 @@
+"""
+Lazy MongoDB connection management.
+
+The connection settings are registered when Django starts, but the MongoClient is only
+created by mongoengine on the first query. Processes that never touch MongoDB (most
+``manage.py`` commands) don't pay for it. A forked child (gunicorn/Celery prefork) drops the
+client inherited from its parent and opens its own on first use.
+"""
+import os
+
+import mongoengine
+from django.conf import settings
+from mongoengine import connection as mongo_connection
+from mongoengine.base.common import _get_documents_by_db
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+_registered = False
+
+
+def connection_options():
+    """Tham số MongoClient lấy từ settings (pool, timeout, read preference)."""
+    return {
+        'host': settings.MONGO_URI,
+        'maxPoolSize': settings.MONGO_MAX_POOL_SIZE,
+        'minPoolSize': settings.MONGO_MIN_POOL_SIZE,
+        'maxIdleTimeMS': settings.MONGO_MAX_IDLE_TIME_MS,
+        'serverSelectionTimeoutMS': settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'connectTimeoutMS': settings.MONGO_CONNECT_TIMEOUT_MS,
+        'socketTimeoutMS': settings.MONGO_SOCKET_TIMEOUT_MS,
+        # register_connection có read_preference mặc định là Primary(), key kiểu URI
+        # 'readPreference' bị nó ghi đè: phải truyền đối tượng read preference
+        'read_preference': make_read_preference(read_pref_mode_from_name(settings.MONGO_READ_PREFERENCE), None),
+        'connect': False,
+    }
+
+
+def register(alias=mongo_connection.DEFAULT_CONNECTION_NAME):
+    """Register the connection settings without connecting. Safe to call more than once."""
+    global _registered
+    if _registered:
+        return
+    mongoengine.register_connection(alias, **connection_options())
+    os.register_at_fork(after_in_child=_reset_after_fork)
+    _registered = True
+
+
+def _reset_after_fork():
+    # Không close() client kế thừa từ process cha (socket đang dùng chung),
+    # chỉ bỏ tham chiếu để process con tự tạo client mới ở lần truy vấn đầu tiên
+    for alias in list(mongo_connection._connections):
+        mongo_connection._connections.pop(alias, None)
+        if mongo_connection._dbs.pop(alias, None) is not None:
+            for document_cls in _get_documents_by_db(alias, mongo_connection.DEFAULT_CONNECTION_NAME):
+                if issubclass(document_cls, mongoengine.Document):
+                    document_cls._disconnect()
+
+
+def get_db(alias=mongo_connection.DEFAULT_CONNECTION_NAME):
+    register(alias)
+    return mongo_connection.get_db(alias)
+
+
+def ping(alias=mongo_connection.DEFAULT_CONNECTION_NAME):
+    """Run a ``ping`` against the server. Raises if MongoDB is unreachable."""
+    return get_db(alias).command('ping')